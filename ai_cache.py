@@ -0,0 +1,244 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two hex-encoded perceptual hashes."""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+class _SQLiteCache:
+    """Shared plumbing of the on-disk AI result caches."""
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _should_prune(self):
+        with self._lock:
+            self._writes += 1
+            return self._writes % 20 == 1
+
+    @staticmethod
+    def _evict_to_size(conn, table, key_column, max_bytes):
+        """Deletes least recently used rows of `table` until its entries total at most `max_bytes`."""
+        excess = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0] - max_bytes
+        if excess <= 0:
+            return
+        doomed = []
+        for key, size in conn.execute(f"SELECT {key_column}, size FROM {table} ORDER BY last_used_at"):
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+        conn.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", doomed)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class ParseResultCache(_SQLiteCache):
+    """
+    Content-addressed, on-disk cache of AI parse results.
+
+    Entries are keyed by a SHA-256 of the model name and the normalised prompt
+    input, so the same page parsed by different users (or re-scraped later)
+    is answered from disk. Backed by a local SQLite file: safe to share
+    between threads and between gunicorn workers on one host, and usable
+    without a Flask app context. Entries expire after `ttl_seconds` and the
+    least recently used ones are evicted once the file holds more than
+    `max_bytes` of responses.
+    """
+    def __init__(self, path, ttl_seconds, max_bytes):
+        super().__init__(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS parse_cache ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " response TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_parse_cache_last_used ON parse_cache (last_used_at)")
+
+    @staticmethod
+    def make_key(model, *parts):
+        """Hash of the model and prompt parts with whitespace runs collapsed."""
+        digest = hashlib.sha256(model.encode('utf-8'))
+        for part in parts:
+            normalised = re.sub(r'\s+', ' ', part or '').strip()
+            digest.update(b'\x00' + normalised.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT response, created_at FROM parse_cache WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+                    row = None
+                if row:
+                    conn.execute("UPDATE parse_cache SET last_used_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"AI parse cache read failed: {e}")
+            row = None
+
+        self._count(bool(row))
+        return row[0] if row else None
+
+    def put(self, key, model, response):
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO parse_cache (key, model, response, size, created_at, last_used_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, size, now, now)
+                )
+            if self._should_prune():
+                self.prune()
+        except sqlite3.Error as e:
+            print(f"AI parse cache write failed: {e}")
+
+    def prune(self):
+        """Drops expired entries, then least recently used ones until under `max_bytes`."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM parse_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._evict_to_size(conn, 'parse_cache', 'key', self.max_bytes)
+
+
+class VisionResultCache(_SQLiteCache):
+    """
+    Near-duplicate cache of vision model results, keyed by perceptual hashes.
+
+    Each entry holds the dHash of every image in an upload, a hash of the
+    user's text prompt and the extracted Markdown. An upload matches an
+    entry when it has the same prompt and the same number of images and
+    every image is within `max_distance` bits of a distinct image of the entry,
+    so a re-photographed cookbook page is answered without calling the model.
+    Entries expire after `ttl_seconds`; least recently used ones are evicted
+    beyond `max_bytes`.
+    """
+    def __init__(self, path, ttl_seconds, max_bytes, max_distance=6):
+        super().__init__(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_distance = max_distance
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS vision_cache ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " image_count INTEGER NOT NULL,"
+                " prompt_key TEXT NOT NULL,"
+                " hashes TEXT NOT NULL,"
+                " response TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_vision_cache_lookup ON vision_cache (prompt_key, image_count)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_vision_cache_last_used ON vision_cache (last_used_at)")
+
+    @staticmethod
+    def _prompt_key(text_prompt):
+        return hashlib.sha256(re.sub(r'\s+', ' ', text_prompt or '').strip().lower().encode('utf-8')).hexdigest()
+
+    def _matches(self, hashes, stored):
+        unused = list(stored)
+        for image_hash in hashes:
+            match = next((candidate for candidate in unused
+                          if hamming_distance(image_hash, candidate) <= self.max_distance), None)
+            if match is None:
+                return False
+            unused.remove(match)
+        return True
+
+    def lookup(self, hashes, text_prompt=''):
+        """The cached Markdown for a near-duplicate of this upload, or None."""
+        if not hashes:
+            return None
+        now = time.time()
+        response = None
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, hashes, response FROM vision_cache"
+                    " WHERE prompt_key = ? AND image_count = ? AND created_at >= ?"
+                    " ORDER BY last_used_at DESC",
+                    (self._prompt_key(text_prompt), len(hashes), now - self.ttl_seconds)
+                )
+                for entry_id, stored, cached in rows.fetchall():
+                    if self._matches(hashes, stored.split(',')):
+                        conn.execute("UPDATE vision_cache SET last_used_at = ? WHERE id = ?", (now, entry_id))
+                        response = cached
+                        break
+        except sqlite3.Error as e:
+            print(f"Vision cache read failed: {e}")
+
+        self._count(response is not None)
+        return response
+
+    def put(self, hashes, text_prompt, response):
+        if not hashes:
+            return
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO vision_cache (image_count, prompt_key, hashes, response, size, created_at, last_used_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (len(hashes), self._prompt_key(text_prompt), ','.join(hashes), response, size, now, now)
+                )
+            if self._should_prune():
+                self.prune()
+        except sqlite3.Error as e:
+            print(f"Vision cache write failed: {e}")
+
+    def prune(self):
+        """Drops expired entries, then least recently used ones until under `max_bytes`."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM vision_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._evict_to_size(conn, 'vision_cache', 'id', self.max_bytes)
@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from sqlalchemy.exc import IntegrityError
+from models import AnalyticsEvent, AnalyticsRollup, db
+from ingredients import PANTRY_STAPLES, parse_recipe_ingredients
+
+ROLLUP_PERIODS = ('hour', 'day')
+MAX_TAGS_PER_RECIPE = 5
+_YOUTUBE_DOMAINS = ('youtube.com', 'm.youtube.com', 'youtu.be')
+
+
+def source_domain(url):
+    """'https://www.bbcgoodfood.com/recipes/x' -> 'bbcgoodfood.com' (as stored in Recipe.source)."""
+    return urlparse(url or '').netloc.lower().replace('www.', '') or None
+
+
+def source_type(source):
+    """Classifies a Recipe.source value: website, youtube, image (vision upload) or manual."""
+    if not source:
+        return 'manual'
+    if source == 'vision':
+        return 'image'
+    if source in _YOUTUBE_DOMAINS:
+        return 'youtube'
+    return 'website'
+
+
+def recipe_tags(content):
+    """
+    Tags for a recipe: its first few ingredients that are not pantry staples,
+    as canonical names ('chicken thigh', 'rice'). Recipes list their main
+    ingredients first, so these describe what the dish is made of.
+    """
+    tags = []
+    for item in parse_recipe_ingredients(content):
+        if item['name'] not in PANTRY_STAPLES:
+            tags.append(item['name'])
+        if len(tags) >= MAX_TAGS_PER_RECIPE:
+            break
+    return tags
+
+
+def bucket_start(moment, period):
+    if period == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class UsageAnalytics:
+    """
+    Records scrape and save events in the append-only `analytics_event`
+    table and, in the same transaction, adds each one to the hourly and
+    daily `analytics_rollup` rows of every dimension it touches (overall
+    total, source domain, source type, tags). Dashboard queries read only
+    rollup rows, so their cost depends on the time range and the number
+    of distinct values, not on how many recipes or events exist.
+    """
+    def __init__(self, database=db):
+        self.db = database
+
+    def record(self, kind, user_id=None, source=None, status='success', latency_ms=None, tokens=None, tags=()):
+        """Appends one event and updates its rollups. Commits; failures are logged, not raised."""
+        now = datetime.utcnow()
+        kind_of_source = source_type(source)
+        tags = [tag[:100] for tag in tags or ()]
+        failed = 1 if status != 'success' else 0
+        dimensions = [('total', ''), ('type', kind_of_source)]
+        if source:
+            dimensions.append(('source', source[:100]))
+        dimensions.extend(('tag', tag) for tag in tags)
+        try:
+            self.db.session.add(AnalyticsEvent(
+                kind=kind,
+                user_id=int(user_id) if user_id is not None else None,
+                source=source[:100] if source else None,
+                source_type=kind_of_source,
+                status=status,
+                latency_ms=int(latency_ms) if latency_ms is not None else None,
+                tokens=int(tokens) if tokens is not None else None,
+                tags=','.join(tags)[:300] or None,
+                created_at=now
+            ))
+            for period in ROLLUP_PERIODS:
+                for dimension, value in dimensions:
+                    self._bump(period, bucket_start(now, period), kind, dimension, value,
+                               failed, latency_ms, tokens)
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            print(f"Failed to record {kind} analytics event: {e}")
+
+    def _bump(self, period, bucket, kind, dimension, value, failed, latency_ms, tokens):
+        """Adds one event to a rollup row inside the caller's transaction, creating the row if needed."""
+        values = {
+            'count': AnalyticsRollup.count + 1,
+            'failures': AnalyticsRollup.failures + failed,
+            'latency_ms_total': AnalyticsRollup.latency_ms_total + int(latency_ms or 0),
+            'latency_samples': AnalyticsRollup.latency_samples + (1 if latency_ms is not None else 0),
+            'tokens_total': AnalyticsRollup.tokens_total + int(tokens or 0)
+        }
+        row = AnalyticsRollup.query.filter_by(period=period, bucket=bucket, kind=kind,
+                                              dimension=dimension, value=value)
+        if row.update(values, synchronize_session=False):
+            return
+        try:
+            with self.db.session.begin_nested():
+                self.db.session.add(AnalyticsRollup(
+                    period=period, bucket=bucket, kind=kind, dimension=dimension, value=value,
+                    count=1, failures=failed, latency_ms_total=int(latency_ms or 0),
+                    latency_samples=1 if latency_ms is not None else 0, tokens_total=int(tokens or 0)
+                ))
+        except IntegrityError:
+            # Another transaction created the row first
+            row.update(values, synchronize_session=False)
+
+    def _rollups(self, kind, dimension, period, since=None):
+        query = AnalyticsRollup.query.filter(AnalyticsRollup.period == period,
+                                             AnalyticsRollup.kind == kind,
+                                             AnalyticsRollup.dimension == dimension)
+        if since is not None:
+            query = query.filter(AnalyticsRollup.bucket >= bucket_start(since, period))
+        return query
+
+    def totals(self, kind, days=30):
+        """{"count", "failures", "avg_latency_ms", "tokens"} for `kind` over the last `days` days."""
+        row = (self._rollups(kind, 'total', 'day', datetime.utcnow() - timedelta(days=days))
+               .with_entities(db.func.sum(AnalyticsRollup.count),
+                              db.func.sum(AnalyticsRollup.failures),
+                              db.func.sum(AnalyticsRollup.latency_ms_total),
+                              db.func.sum(AnalyticsRollup.latency_samples),
+                              db.func.sum(AnalyticsRollup.tokens_total))
+               .one())
+        count, failures, latency_total, latency_samples, tokens = (value or 0 for value in row)
+        return {
+            'count': count,
+            'failures': failures,
+            'avg_latency_ms': round(latency_total / latency_samples) if latency_samples else None,
+            'tokens': tokens
+        }
+
+    def breakdown(self, kind, dimension, days=30, limit=None):
+        """[(value, count), ...] most frequent first, over the last `days` days (None = all time)."""
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        total = db.func.sum(AnalyticsRollup.count)
+        query = (self._rollups(kind, dimension, 'day', since)
+                 .with_entities(AnalyticsRollup.value, total)
+                 .group_by(AnalyticsRollup.value)
+                 .order_by(total.desc(), AnalyticsRollup.value))
+        if limit:
+            query = query.limit(limit)
+        return [(value, count) for value, count in query]
+
+    def series(self, kind, period='hour', buckets=24):
+        """Per-bucket totals for charts, oldest first: [{"bucket", "count", "failures", "avg_latency_ms", "tokens"}]."""
+        step = timedelta(hours=1) if period == 'hour' else timedelta(days=1)
+        since = bucket_start(datetime.utcnow(), period) - step * (buckets - 1)
+        rows = {row.bucket: row for row in self._rollups(kind, 'total', period, since)}
+        points = []
+        for i in range(buckets):
+            bucket = since + step * i
+            row = rows.get(bucket)
+            points.append({
+                'bucket': bucket.isoformat(),
+                'count': row.count if row else 0,
+                'failures': row.failures if row else 0,
+                'avg_latency_ms': round(row.latency_ms_total / row.latency_samples) if row and row.latency_samples else None,
+                'tokens': row.tokens_total if row else 0
+            })
+        return points
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compares the HTML extraction paths on saved recipe pages.
+
+Usage:
+    python benchmarks/html_extract.py page1.html [page2.html ...] [--repeat 20]
+
+Save pages with e.g. `curl -L -o page.html <recipe url>`. For each installed
+parser it reports the median time per page, peak Python memory, and whether
+JSON-LD and text came out the same as the html.parser baseline.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from html_extract import extract_page, available_parsers
+
+
+def measure(parser, pages, repeat):
+    timings = []
+    peak = 0
+    for html_bytes in pages:
+        per_page = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            extract_page(html_bytes, parser=parser)
+            per_page.append(time.perf_counter() - start)
+        timings.append(statistics.median(per_page))
+
+        tracemalloc.start()
+        extract_page(html_bytes, parser=parser)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return timings, peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('pages', nargs='+', help='Saved HTML files')
+    arg_parser.add_argument('--repeat', type=int, default=20)
+    args = arg_parser.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    total_kb = sum(len(page) for page in pages) / 1024
+    print(f"{len(pages)} page(s), {total_kb:.0f} KB total, {args.repeat} runs each\n")
+
+    baseline = [extract_page(page, parser='html.parser') for page in pages]
+    print(f"{'parser':<12} {'median ms/page':>15} {'total ms':>10} {'peak MB':>9}  same output")
+    for parser in reversed(available_parsers()):
+        timings, peak = measure(parser, pages, args.repeat)
+        results = [extract_page(page, parser=parser) for page in pages]
+        same_jsonld = all(r['jsonld'] == b['jsonld'] for r, b in zip(results, baseline))
+        same_text = sum(r['text'] == b['text'] for r, b in zip(results, baseline))
+        print(f"{parser:<12} {statistics.median(timings) * 1000:>15.1f} {sum(timings) * 1000:>10.1f} "
+              f"{peak / 1024 / 1024:>9.1f}  json-ld: {'yes' if same_jsonld else 'no'}, "
+              f"text: {same_text}/{len(pages)}")
+
+
+if __name__ == '__main__':
+    main()
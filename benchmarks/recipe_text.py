@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the section classifier and the VTT tokenizer.
+
+Usage:
+    python benchmarks/recipe_text.py [corpus files or directories ...] [--repeat 50]
+
+The corpus is saved pages (.html), page text (.txt) and subtitle files
+(.vtt), e.g. fetched with `curl -L -o page.html <url>` and
+`yt-dlp --skip-download --write-auto-subs --sub-langs en <url>`.
+Without arguments a synthetic 30-minute rolling auto-caption transcript
+and a long recipe page are used. Each file is timed against the previous
+line-by-line implementations kept below as the baseline.
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recipe_text import extract_recipe_sections, parse_vtt
+
+
+def legacy_parse_vtt(vtt_content):
+    text_lines = []
+    for line in vtt_content.split('\n'):
+        line = line.strip()
+        if (not line or line.startswith('WEBVTT') or line.startswith('NOTE') or
+                '-->' in line or re.match(r'^\d+$', line)):
+            continue
+        line = re.sub(r'<[^>]+>', '', line)
+        line = re.sub(r'&\w+;', '', line)
+        if line:
+            text_lines.append(line)
+    return ' '.join(text_lines)
+
+
+def legacy_extract_recipe_sections(content):
+    ingredients_section = []
+    instructions_section = []
+    in_ingredients = False
+    in_instructions = False
+    for line in content.split('\n'):
+        line = line.strip()
+        if re.search(r'\bingredients?\b', line, re.IGNORECASE) and len(line) < 100:
+            in_ingredients, in_instructions = True, False
+            continue
+        if re.search(r'\b(instructions?|method|directions?|steps?)\b', line, re.IGNORECASE) and len(line) < 100:
+            in_instructions, in_ingredients = True, False
+            continue
+        if in_ingredients:
+            if re.search(r'\b(method|instructions?|directions?|steps?|nutrition|notes)\b', line, re.IGNORECASE):
+                in_ingredients = False
+                in_instructions = 'instructions' in line.lower() or 'method' in line.lower()
+                continue
+            if line and not line.startswith(('▢', '•', '-', '*')):
+                if any(i in line.lower() for i in ['g ', 'ml', 'tbsp', 'tsp', 'cup', 'oz', 'lb', 'clove', 'onion', 'garlic']):
+                    ingredients_section.append(line)
+            elif line.startswith(('▢', '•', '-', '*')):
+                ingredients_section.append(line[1:].strip())
+        if in_instructions:
+            if re.search(r'\b(nutrition|notes|tips|faq)\b', line, re.IGNORECASE):
+                in_instructions = False
+                continue
+            if line:
+                if (re.match(r'^\d+\.?\s+', line) or line.lower().startswith('step') or
+                        any(a in line.lower() for a in ['cook', 'add', 'heat', 'stir', 'mix', 'drain', 'serve', 'fry', 'bake'])):
+                    instructions_section.append(line)
+    return {'ingredients': ingredients_section, 'instructions': instructions_section}
+
+
+def synthetic_vtt(minutes=30):
+    """Rolling auto-captions: every cue repeats the previous line, then adds words."""
+    words = ("now add the garlic and stir it through the onions for about two minutes "
+             "until it smells lovely then pour in the tomatoes").split()
+    blocks = ["WEBVTT\nKind: captions\nLanguage: en\n"]
+    previous = ''
+    for second in range(0, minutes * 60, 2):
+        line = ' '.join(words[(second * 3 + i) % len(words)] for i in range(6))
+        tagged = '<00:00:00.500><c> '.join(line.split(' ', 1))
+        start = f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}.000"
+        end = f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}.010"
+        blocks.append(f"{start} --> {end} align:start position:0%\n{previous}\n \n")
+        blocks.append(f"{end} --> {end} align:start position:0%\n{previous}\n{tagged}</c>\n")
+        previous = line
+    return '\n'.join(blocks)
+
+
+def synthetic_page(repeats=40):
+    section = ("Jump to recipe\nIngredients\n• 200g plain flour\n- 2 cloves garlic\n1 onion, diced\n"
+               "Method\n1. Heat the oven to 180C\nStir in the flour\nStep 3 bake for 20 minutes\n"
+               "Notes\nThis is a long story about my grandmother's kitchen and the summer of 1998.\n")
+    return section * repeats
+
+
+def load_corpus(paths):
+    corpus = []
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)))
+        else:
+            files.append(path)
+    for path in files:
+        ext = os.path.splitext(path)[1].lower()
+        with open(path, 'rb') as f:
+            raw = f.read()
+        if ext == '.vtt':
+            corpus.append((os.path.basename(path), 'vtt', raw.decode('utf-8', 'replace')))
+        elif ext in ('.html', '.htm'):
+            from html_extract import extract_page
+            corpus.append((os.path.basename(path), 'page', extract_page(raw)['text']))
+        elif ext == '.txt':
+            corpus.append((os.path.basename(path), 'page', raw.decode('utf-8', 'replace')))
+    return corpus
+
+
+def timed(func, arg, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', help='Corpus files or directories')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.paths) if args.paths else [
+        ('synthetic-30min.vtt', 'vtt', synthetic_vtt()),
+        ('synthetic-page.txt', 'page', synthetic_page()),
+    ]
+    if not corpus:
+        sys.exit("No .vtt, .html or .txt files found")
+
+    print(f"{'file':<28} {'lines':>7} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}  output")
+    for name, kind, text in corpus:
+        if kind == 'vtt':
+            legacy, new = legacy_parse_vtt, parse_vtt
+        else:
+            legacy, new = legacy_extract_recipe_sections, extract_recipe_sections
+        before = timed(legacy, text, args.repeat)
+        after = timed(new, text, args.repeat)
+        if kind == 'vtt':
+            output = f"{len(legacy(text).split())} -> {len(new(text).split())} words"
+        else:
+            output = 'identical' if legacy(text) == new(text) else 'DIFFERENT'
+        print(f"{name[:28]:<28} {text.count(chr(10)) + 1:>7} {before * 1000:>10.2f} {after * 1000:>8.2f} "
+              f"{before / after if after else 0:>7.1f}x  {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: how long a fresh worker process takes to import the
+app and run load_app(), and which imports dominate.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--top 12] [--budget 1.0]
+
+Each run is a new interpreter started with `python -X importtime`, as a
+gunicorn worker or `flask` command would be. Settings missing from the
+environment default to in-memory storage, an in-memory SQLite database
+and a placeholder GROQ_API_KEY, so no network or credentials are needed.
+Exits non-zero if the median start-up exceeds --budget seconds or if any
+module that should load on first use (yt-dlp, Gemini, OpenAI, boto3 or
+botocore, PIL, BeautifulSoup) was imported during start-up.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Imported lazily by the app; none of them may appear in sys.modules after start-up
+DEFERRED_MODULES = ('yt_dlp', 'google.genai', 'openai', 'boto3', 'botocore', 'PIL', 'bs4')
+
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+import recipe_scraper_s3
+imported = time.perf_counter()
+recipe_scraper_s3.load_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'load_app': created - imported,
+    'loaded': [name for name in %r if name in sys.modules]
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def parse_importtime(stderr):
+    """{top-level module: cumulative microseconds} from `-X importtime` output."""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|', 2)
+        if not cumulative.strip().isdigit() or name.startswith('  '):
+            continue  # header line, or a nested import already counted in its parent
+        totals[name.strip()] = int(cumulative)
+    return totals
+
+
+def run_once(env):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Start-up failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['imports'] = parse_importtime(result.stderr)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=12, help='Slowest top-level imports to list')
+    parser.add_argument('--budget', type=float, default=1.0, help='Maximum median start-up, in seconds')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('STORAGE_BACKEND', 'memory')
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    env.setdefault('GROQ_API_KEY', 'benchmark')
+
+    reports = [run_once(env) for _ in range(max(1, args.runs))]
+    import_times = [report['import'] for report in reports]
+    load_times = [report['load_app'] for report in reports]
+    total = statistics.median(a + b for a, b in zip(import_times, load_times))
+
+    print(f"{'run':>4} {'import ms':>10} {'load_app ms':>12}")
+    for i, (imported, created) in enumerate(zip(import_times, load_times), 1):
+        print(f"{i:>4} {imported * 1000:>10.1f} {created * 1000:>12.1f}")
+    print(f"median start-up: {total * 1000:.1f} ms (budget {args.budget * 1000:.0f} ms)")
+
+    imports = {}
+    for report in reports:
+        for name, micros in report['imports'].items():
+            imports.setdefault(name, []).append(micros)
+    print(f"\n{'top-level import':<32} {'median ms':>10}")
+    slowest = sorted(((statistics.median(times), name) for name, times in imports.items()), reverse=True)
+    for micros, name in slowest[:args.top]:
+        print(f"{name[:32]:<32} {micros / 1000:>10.1f}")
+
+    loaded = sorted({name for report in reports for name in report['loaded']})
+    if loaded:
+        print(f"\nImported at start-up but should load on first use: {', '.join(loaded)}")
+    if loaded or total > args.budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import time
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class DomainThrottle:
+    """
+    Per-domain politeness limits: at most `max_concurrent` requests in flight
+    per domain, and request starts spaced at least `min_interval` seconds apart.
+    """
+    def __init__(self, max_concurrent=2, min_interval=1.0):
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+
+    def __call__(self, url):
+        return _ThrottledRequest(self, urlparse(url).netloc.lower().replace('www.', ''))
+
+    def _acquire(self, domain):
+        with self._lock:
+            semaphore = self._semaphores.setdefault(domain, threading.BoundedSemaphore(self.max_concurrent))
+        semaphore.acquire()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(domain, now))
+            self._next_slot[domain] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _release(self, domain):
+        self._semaphores[domain].release()
+
+
+class _ThrottledRequest:
+    def __init__(self, throttle, domain):
+        self.throttle = throttle
+        self.domain = domain
+
+    def __enter__(self):
+        self.throttle._acquire(self.domain)
+
+    def __exit__(self, *exc):
+        self.throttle._release(self.domain)
+
+
+class BulkImporter:
+    """
+    Imports many recipe URLs for one user as a three-stage pipeline:
+    pages are fetched concurrently (throttled per domain), each fetched page is
+    handed to a separate pool for AI parsing as soon as it arrives, and each
+    parsed recipe is saved as soon as it is ready. Saving happens on the
+    calling thread, which owns the app context and database session.
+    """
+    def __init__(self, scraper, fetch_workers=8, ai_workers=4, per_domain=2, domain_interval=1.0):
+        self.scraper = scraper
+        self.fetch_workers = fetch_workers
+        self.ai_workers = ai_workers
+        self.throttle = DomainThrottle(per_domain, domain_interval)
+
+    def _fetch(self, url):
+        with self.throttle(url):
+            return self.scraper.scrape_url(url)
+
+    def run(self, urls, user_id, report=None, previous=None):
+        """
+        Imports `urls` and returns the summary dict. `report(summary)` is called
+        whenever an item changes state so callers can publish incremental status.
+        `previous` is the last summary reported by an interrupted run of the
+        same import: URLs it already saved are not imported again, and URLs
+        it was saving when it stopped are marked failed rather than risk a
+        duplicate recipe.
+        """
+        items = {url: {'url': url, 'status': 'fetching'} for url in urls}
+        for item in (previous or {}).get('items', []):
+            if item.get('url') not in items:
+                continue
+            if item.get('status') == 'succeeded':
+                items[item['url']] = item
+            elif item.get('status') == 'saving':
+                items[item['url']] = {'url': item['url'], 'status': 'failed',
+                                      'error': 'Import was interrupted while saving; check your recipes before retrying'}
+        report = report or (lambda summary: None)
+
+        def summary():
+            ordered = [items[url] for url in urls]
+            return {
+                'status': 'completed' if all(i['status'] in ('succeeded', 'failed') for i in ordered) else 'running',
+                'total': len(ordered),
+                'succeeded': sum(1 for i in ordered if i['status'] == 'succeeded'),
+                'failed': sum(1 for i in ordered if i['status'] == 'failed'),
+                'items': ordered
+            }
+
+        def fail(url, error):
+            items[url].update(status='failed', error=error)
+
+        report(summary())
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as fetch_pool, \
+                ThreadPoolExecutor(max_workers=self.ai_workers) as ai_pool:
+            pending = {fetch_pool.submit(self._fetch, url): ('fetch', url)
+                       for url in urls if items[url]['status'] == 'fetching'}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, url = pending.pop(future)
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        fail(url, f"Unexpected error: {e}")
+                        continue
+
+                    if stage == 'fetch':
+                        if not outcome or not outcome.get('content'):
+                            self.scraper.record_scrape(url, user_id, 'failed', outcome)
+                            fail(url, "Failed to scrape URL")
+                        else:
+                            items[url]['status'] = 'parsing'
+                            pending[ai_pool.submit(self.scraper.build_recipe, outcome)] = ('parse', url)
+                        continue
+
+                    if outcome.get('status') == 'failed':
+                        self.scraper.record_scrape(url, user_id, 'failed')
+                        fail(url, outcome.get('error'))
+                        continue
+                    items[url]['status'] = 'saving'
+                    # Published before the save so a retry knows this URL may already be stored
+                    report(summary())
+                    saved = self.scraper.save_built_recipe(outcome, user_id)
+                    if saved.get('status') == 'failed':
+                        fail(url, saved.get('error'))
+                    else:
+                        items[url].update(status='succeeded', filename=saved['filename'],
+                                          recipe_name=saved['recipe_name'])
+                report(summary())
+
+        return summary()
@@ -0,0 +1,134 @@
+import os
+from importlib.util import find_spec
+from metrics import external_timer
+
+# Optional fast parsers. Both are C libraries; whichever is installed is used
+# by the 'auto' parser choice, falling back to BeautifulSoup's html.parser.
+# Parser modules are imported with the first page, not when the app starts.
+HAS_SELECTOLAX = find_spec('selectolax') is not None
+HAS_LXML = find_spec('lxml') is not None
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+SCRAPE_MAX_BYTES = int(os.getenv('SCRAPE_MAX_BYTES', str(3 * 1024 * 1024)))
+HTML_PARSER = os.getenv('HTML_PARSER', 'auto').strip().lower()
+
+# Page furniture that never holds recipe text
+NOISE_TAGS = ('script', 'style', 'nav', 'header', 'footer', 'noscript', 'svg', 'iframe')
+
+
+class PageRejected(Exception):
+    """The response is not an HTML page we are willing to parse."""
+
+
+def fetch_html(session, url, max_bytes=SCRAPE_MAX_BYTES, timeout=10, cache=None):
+    """
+    Downloads a page as a stream and returns at most `max_bytes` of its body.
+    Raises PageRejected before reading the body when the Content-Type is not
+    HTML or the declared Content-Length is over the cap. Pages without a
+    Content-Length are cut off at the cap; the recipe is nearly always
+    within the first few megabytes.
+
+    With an HttpCache, the request is made conditional on the stored ETag /
+    Last-Modified and a 304 Not Modified is answered from the cache.
+    """
+    headers = cache.validators(url) if cache else {}
+    with external_timer('website', 'get'), \
+            session.get(url, timeout=timeout, stream=True, headers=headers) as response:
+        if response.status_code == 304 and headers:
+            body = cache.body(url)
+            if body is not None:
+                return body
+            # Evicted between the lookup and the 304; fetch it unconditionally
+            return fetch_html(session, url, max_bytes, timeout)
+        response.raise_for_status()
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and content_type not in HTML_CONTENT_TYPES:
+            raise PageRejected(f"Unsupported content type: {content_type}")
+
+        declared = response.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise PageRejected(f"Page too large: {declared} bytes")
+
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= max_bytes:
+                print(f"Truncated {url} at {max_bytes} bytes")
+                break
+        body = b''.join(chunks)[:max_bytes]
+        if cache:
+            cache.put(url, response.headers, body)
+        return body
+
+
+def _tidy_text(text):
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def _extract_with_selectolax(html_bytes):
+    from selectolax.parser import HTMLParser as SelectolaxParser
+    tree = SelectolaxParser(html_bytes)
+    jsonld = [node.text() for node in tree.css('script[type="application/ld+json"]')]
+    title_node = tree.css_first('title')
+    title = title_node.text().strip() if title_node else ""
+    tree.strip_tags(list(NOISE_TAGS))
+    root = tree.body or tree.root
+    text = root.text(separator='\n') if root else ""
+    return title, jsonld, text
+
+
+def _extract_with_lxml(html_bytes):
+    import lxml.html as lxml_html
+    doc = lxml_html.fromstring(html_bytes)
+    jsonld = doc.xpath('//script[@type="application/ld+json"]/text()')
+    title = (doc.findtext('.//title') or "").strip()
+    for element in doc.xpath('|'.join(f'//{tag}' for tag in NOISE_TAGS)):
+        element.drop_tree()
+    text = '\n'.join(doc.itertext())
+    return title, [str(item) for item in jsonld], text
+
+
+def _extract_with_bs4(html_bytes):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_bytes, 'html.parser')
+    jsonld = [script.string or '' for script in soup.find_all('script', type='application/ld+json')]
+    title = soup.find('title')
+    title = title.get_text().strip() if title else ""
+    for element in soup(list(NOISE_TAGS)):
+        element.decompose()
+    return title, jsonld, soup.get_text()
+
+
+EXTRACTORS = {
+    'selectolax': _extract_with_selectolax,
+    'lxml': _extract_with_lxml,
+    'html.parser': _extract_with_bs4,
+}
+
+
+def available_parsers():
+    """Parser names usable in this environment, fastest first."""
+    names = []
+    if HAS_SELECTOLAX:
+        names.append('selectolax')
+    if HAS_LXML:
+        names.append('lxml')
+    names.append('html.parser')
+    return names
+
+
+def extract_page(html_bytes, parser=None):
+    """
+    Pulls the title, raw JSON-LD blocks and visible text out of an HTML page.
+    Returns {"title", "jsonld": [str, ...], "text", "parser"}. `parser` is
+    'auto' (fastest installed), 'selectolax', 'lxml' or 'html.parser'.
+    """
+    parser = parser or HTML_PARSER
+    if parser == 'auto' or parser not in available_parsers():
+        parser = available_parsers()[0]
+    title, jsonld, text = EXTRACTORS[parser](html_bytes)
+    return {"title": title, "jsonld": jsonld, "text": _tidy_text(text), "parser": parser}
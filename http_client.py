@@ -0,0 +1,183 @@
+import os
+import glob
+import time
+import zlib
+import sqlite3
+import threading
+import http.cookiejar
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+# Site cookies exported from a browser, named "<domain>_cookies.txt"
+# (e.g. www.bbcgoodfood.com_cookies.txt)
+COOKIE_FILE_PATTERN = '*.*_cookies.txt'
+
+
+def create_session(pool_connections=32, pool_maxsize=8, retries=3, backoff=0.5):
+    """
+    Builds the scraper's requests session. The adapter keeps one keep-alive
+    connection pool per host (up to `pool_connections` hosts, `pool_maxsize`
+    connections each) and retries connection errors and 429/5xx responses
+    to GET/HEAD with exponential backoff, honouring Retry-After.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': USER_AGENT})
+    return session
+
+
+def load_cookie_jars(session, directory='.'):
+    """
+    Loads every "<domain>_cookies.txt" (Netscape format) in `directory` into
+    the session once. Each cookie keeps its own domain, so it is only sent
+    to that site.
+    """
+    loaded = []
+    for path in sorted(glob.glob(os.path.join(directory, COOKIE_FILE_PATTERN))):
+        try:
+            cookie_jar = http.cookiejar.MozillaCookieJar(path)
+            cookie_jar.load(ignore_discard=True, ignore_expires=True)
+            for cookie in cookie_jar:
+                session.cookies.set_cookie(cookie)
+            loaded.append(os.path.basename(path)[:-len('_cookies.txt')])
+        except Exception as e:
+            print(f"Warning: Failed to load cookies from {path}. Error: {e}")
+    if loaded:
+        print(f"Loaded cookies for {', '.join(loaded)} into the scraper session.")
+    return loaded
+
+
+class HttpCache:
+    """
+    On-disk cache of fetched pages and their validators (ETag and
+    Last-Modified), so a re-scrape can send a conditional GET and reuse the
+    stored body when the site answers 304 Not Modified. Bodies are
+    zlib-compressed in a local SQLite file; the least recently used pages
+    are dropped once the file holds more than `max_bytes`.
+    """
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.revalidated = 0
+        self.refetched = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS http_cache ("
+                " url TEXT PRIMARY KEY,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " body BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_http_cache_last_used ON http_cache (last_used_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def validators(self, url):
+        """Conditional request headers for `url`, or {} when nothing is cached."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"HTTP cache read failed: {e}")
+            return {}
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def body(self, url):
+        """The stored body after a 304, or None if it has gone missing."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT body FROM http_cache WHERE url = ?", (url,)).fetchone()
+                if row:
+                    conn.execute("UPDATE http_cache SET last_used_at = ? WHERE url = ?", (time.time(), url))
+        except sqlite3.Error as e:
+            print(f"HTTP cache read failed: {e}")
+            return None
+        with self._lock:
+            if row:
+                self.revalidated += 1
+        return zlib.decompress(row[0]) if row else None
+
+    def put(self, url, headers, body):
+        """Stores a 200 response if it carries a validator; otherwise forgets the URL."""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        with self._lock:
+            self.refetched += 1
+        try:
+            if not etag and not last_modified:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+                return
+            compressed = zlib.compress(body)
+            if len(compressed) > self.max_bytes:
+                return
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body, size, last_used_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, etag, last_modified, compressed, len(compressed), time.time())
+                )
+            with self._lock:
+                self._writes += 1
+                should_prune = self._writes % 20 == 1
+            if should_prune:
+                self.prune()
+        except sqlite3.Error as e:
+            print(f"HTTP cache write failed: {e}")
+
+    def prune(self):
+        """Drops least recently used pages until the cache is under `max_bytes`."""
+        with self._connect() as conn:
+            excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0] - self.max_bytes
+            if excess <= 0:
+                return
+            doomed = []
+            for url, size in conn.execute("SELECT url, size FROM http_cache ORDER BY last_used_at"):
+                if excess <= 0:
+                    break
+                doomed.append((url,))
+                excess -= size
+            conn.executemany("DELETE FROM http_cache WHERE url = ?", doomed)
+
+    def stats(self):
+        with self._lock:
+            fetches = self.revalidated + self.refetched
+            return {
+                'not_modified': self.revalidated,
+                'downloaded': self.refetched,
+                'not_modified_ratio': round(self.revalidated / fetches, 4) if fetches else 0.0
+            }
@@ -0,0 +1,161 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+# Long side the vision model gets. Gemini tiles images at 768px, so this
+# keeps small print legible while dropping most of a phone photo's pixels.
+DEFAULT_MAX_SIDE = 2048
+DEFAULT_JPEG_QUALITY = 90
+
+
+def source_size(source):
+    """Size in bytes of an image given as bytes, a file path or a seekable file."""
+    if isinstance(source, bytes):
+        return len(source)
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def dhash(img, hash_size=8):
+    """
+    Difference hash: the image shrunk to (hash_size + 1) x hash_size greyscale,
+    one bit per horizontally adjacent pixel pair (left brighter than right).
+    Re-photographed or re-compressed copies of a page differ in only a few bits.
+    Returned as a hex string.
+    """
+    from PIL import Image
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def normalize_image(source, max_side=DEFAULT_MAX_SIDE, quality=DEFAULT_JPEG_QUALITY):
+    """
+    Decodes an uploaded image (any format PIL reads) from bytes, a file path
+    or an open file, so large uploads can be read straight from disk. Fixes its EXIF
+    orientation, downscales it to fit `max_side` and re-encodes it as an RGB
+    JPEG. JPEGs are decoded at a reduced scale via Image.draft, which skips
+    most of the IDCT work for large photos. Returns (jpeg_bytes, dhash).
+    PIL is imported on first use (in the pool worker when there is one).
+    """
+    from PIL import Image, ImageOps
+    img = Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+    if img.format == 'JPEG':
+        # Picks the largest 1/2, 1/4 or 1/8 scale that is still >= max_side
+        img.draft('RGB', (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue(), dhash(img)
+
+
+class ImagePipeline:
+    """
+    Normalises uploaded images for the vision model on a process pool, so a
+    batch of multi-megapixel photos is decoded in parallel and off the request
+    thread. Sources given as file paths are opened by the pool worker itself:
+    the raw upload never passes through the web worker's memory, and each
+    pool process holds one decoded image at a time. With `workers` set to 0
+    images are processed inline, one at a time. Keeps running totals of bytes
+    received and bytes sent on.
+    """
+    def __init__(self, workers=2, max_side=DEFAULT_MAX_SIDE, quality=DEFAULT_JPEG_QUALITY):
+        self.workers = workers
+        self.max_side = max_side
+        self.quality = quality
+        self._pool = None
+        self._lock = threading.Lock()
+        self.images = 0
+        self.original_bytes = 0
+        self.processed_bytes = 0
+
+    def _executor(self):
+        # Created on first use. The web and job processes are multithreaded, so
+        # pool workers are started by a forkserver (spawn where there is none):
+        # a plain fork could copy a lock another thread holds and deadlock.
+        with self._lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                atexit.register(self.shutdown)
+            return self._pool
+
+    def shutdown(self):
+        """Stops the pool's worker processes; a later call to process() starts a new pool."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            atexit.unregister(self.shutdown)
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def process(self, sources):
+        """
+        Normalises images given as bytes, file paths or open files (the latter
+        are processed inline) and returns (jpeg_bytes_list, report). Images
+        that cannot be decoded are skipped. report is {"images",
+        "original_bytes", "processed_bytes", "bytes_saved", "hashes"}, with
+        the dHash of each returned image in order.
+        """
+        sources = [source for source in sources if source and source_size(source)]
+        picklable = all(isinstance(source, (bytes, str)) for source in sources)
+        if self.workers > 0 and picklable and sources:
+            pool = self._executor()
+            futures = [pool.submit(normalize_image, source, self.max_side, self.quality)
+                       for source in sources]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    print(f"Error processing uploaded image file in PIL: {e}")
+                    outcomes.append(None)
+        else:
+            outcomes = []
+            for source in sources:
+                try:
+                    outcomes.append(normalize_image(source, self.max_side, self.quality))
+                except Exception as e:
+                    print(f"Error processing uploaded image file in PIL: {e}")
+                    outcomes.append(None)
+
+        processed = [outcome[0] for outcome in outcomes if outcome]
+        hashes = [outcome[1] for outcome in outcomes if outcome]
+        original_size = sum(source_size(source) for source, outcome in zip(sources, outcomes) if outcome)
+        processed_size = sum(len(jpeg) for jpeg in processed)
+        with self._lock:
+            self.images += len(processed)
+            self.original_bytes += original_size
+            self.processed_bytes += processed_size
+        return processed, {
+            'images': len(processed),
+            'original_bytes': original_size,
+            'processed_bytes': processed_size,
+            'bytes_saved': original_size - processed_size,
+            'hashes': hashes
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'images': self.images,
+                'original_bytes': self.original_bytes,
+                'processed_bytes': self.processed_bytes,
+                'bytes_saved': self.original_bytes - self.processed_bytes
+            }
@@ -0,0 +1,175 @@
+import re
+from models import Recipe, RecipeIngredient, db
+from search import split_recipe_markdown
+from units import INGREDIENT_RE, canonical_unit, normalise_fractions, parse_quantity_range
+
+# Assumed to be in every kitchen unless the caller says otherwise
+PANTRY_STAPLES = ('salt', 'pepper', 'black pepper', 'water', 'oil', 'olive oil', 'vegetable oil', 'sunflower oil')
+
+# Preparation and quality words that do not change what the ingredient is
+_DESCRIPTORS = frozenset((
+    'fresh', 'freshly', 'large', 'small', 'medium', 'big', 'chopped', 'finely', 'roughly', 'coarsely',
+    'diced', 'minced', 'sliced', 'thinly', 'grated', 'crushed', 'ground', 'peeled', 'deseeded', 'halved',
+    'boneless', 'skinless', 'ripe', 'dried', 'frozen', 'cooked', 'raw', 'whole', 'extra', 'virgin',
+    'unsalted', 'softened', 'melted', 'beaten', 'optional', 'good', 'quality', 'organic', 'heaped',
+    'level', 'plus', 'about', 'approx', 'approximately', 'some', 'few', 'handful', 'x', 'of', 'a', 'an'
+))
+_IRREGULAR_PLURALS = {'leaves': 'leaf', 'halves': 'half', 'loaves': 'loaf', 'knives': 'knife'}
+_CLAUSE_RE = re.compile(r',| - | – | for | to serve| to taste| or ')
+_PARENTHESES_RE = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+_NON_WORD_RE = re.compile(r"[^a-zà-ÿ\s-]")
+_BULLET_RE = re.compile(r'^\s*(?:[•▢*-]|\d+[.)])\s*')
+
+
+def singular(word):
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def canonical_names(text):
+    """
+    Canonical ingredient name(s) from the part of a line after the quantity:
+    '2 ripe tomatoes, diced' -> ['tomato'], 'extra virgin olive oil' ->
+    ['olive oil'], 'salt and pepper' -> ['salt', 'pepper'].
+    """
+    text = _PARENTHESES_RE.sub(' ', text.lower())
+    text = _CLAUSE_RE.split(text, 1)[0]
+    words = [word for word in _NON_WORD_RE.sub(' ', text).split() if word not in _DESCRIPTORS]
+    # Stray unit words ('1 x 400g tin tomatoes'), unless the unit is the ingredient ('ground cloves')
+    words = [word for word in words if not canonical_unit(word)] or words
+    if not words:
+        return []
+    if 'and' in words:
+        left, right = words[:words.index('and')], words[words.index('and') + 1:]
+        if 0 < len(left) <= 2 and 0 < len(right) <= 2:
+            return [' '.join(left[:-1] + [singular(left[-1])]),
+                    ' '.join(right[:-1] + [singular(right[-1])])]
+    words = [word for word in words if word != 'and'][-4:]
+    return [' '.join(words[:-1] + [singular(words[-1])])[:100]]
+
+
+def parse_ingredient(line):
+    """
+    Splits an ingredient line into [{"name", "quantity", "unit", "raw"}, ...]
+    (several entries for lines such as 'salt and pepper'). Quantity is the
+    lower bound of a range; quantity and unit are None when absent.
+    """
+    raw = _BULLET_RE.sub('', line).strip()
+    text = normalise_fractions(raw)
+    quantity, unit = None, None
+    match = INGREDIENT_RE.match(text)
+    if match:
+        quantity = parse_quantity_range(match.group('qty'))[0]
+        unit = canonical_unit(match.group('unit'))
+        text = match.group('rest')
+    return [{'name': name, 'quantity': quantity, 'unit': unit, 'raw': raw[:300]}
+            for name in canonical_names(text)]
+
+
+def parse_recipe_ingredients(content):
+    """Parsed, de-duplicated ingredients from the **Ingredients:** list of recipe Markdown."""
+    _, ingredients_text, _ = split_recipe_markdown(content)
+    parsed = {}
+    for line in ingredients_text.splitlines():
+        if line.strip():
+            for item in parse_ingredient(line):
+                parsed.setdefault(item['name'], item)
+    return list(parsed.values())
+
+
+class IngredientIndex:
+    """
+    Inverted index from canonical ingredient name to recipe, stored in the
+    `recipe_ingredient` table (one row per distinct ingredient of a recipe,
+    indexed by name), so pantry queries never read recipe bodies.
+    """
+    def __init__(self, database=db):
+        self.db = database
+
+    def update(self, recipe_id, content):
+        """Re-parses one recipe's ingredients. Commits; failures are logged, not raised."""
+        try:
+            RecipeIngredient.query.filter_by(recipe_id=recipe_id).delete()
+            for item in parse_recipe_ingredients(content):
+                self.db.session.add(RecipeIngredient(recipe_id=recipe_id, **item))
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            print(f"Failed to update the ingredient index for recipe {recipe_id}: {e}")
+
+    def remove(self, recipe_id, commit=True):
+        """
+        Drops one recipe's ingredients. With commit=False the delete joins the
+        caller's transaction and failures are raised instead of logged.
+        """
+        try:
+            RecipeIngredient.query.filter_by(recipe_id=recipe_id).delete()
+            if commit:
+                self.db.session.commit()
+        except Exception as e:
+            if not commit:
+                raise
+            self.db.session.rollback()
+            print(f"Failed to remove recipe {recipe_id} from the ingredient index: {e}")
+
+    def expand(self, pantry):
+        """
+        Known ingredient names covered by the pantry items: the item itself,
+        and names it starts or ends as a whole word ('chicken' covers
+        'chicken thigh', 'tomato' covers 'cherry tomato').
+        """
+        terms = {name for item in pantry for name in canonical_names(item)}
+        if not terms:
+            return set()
+        conditions = []
+        for term in terms:
+            conditions.extend((RecipeIngredient.name == term,
+                               RecipeIngredient.name.like(f'{term} %'),
+                               RecipeIngredient.name.like(f'% {term}')))
+        rows = self.db.session.query(RecipeIngredient.name).filter(db.or_(*conditions)).distinct()
+        return {name for (name,) in rows}
+
+    def rank_by_coverage(self, pantry, user_ids=None, limit=20, include_staples=True):
+        """
+        Recipes that use at least one pantry item, ordered by the share of
+        their ingredients the pantry covers, then by fewest missing.
+        Returns [(Recipe, matched_names, missing_names), ...].
+        """
+        pantry_names = self.expand(pantry)
+        if not pantry_names:
+            return []
+        covered = pantry_names | set(PANTRY_STAPLES) if include_staples else pantry_names
+
+        matched = db.func.sum(db.case((RecipeIngredient.name.in_(sorted(covered)), 1), else_=0))
+        total = db.func.count(RecipeIngredient.id)
+        candidates = db.select(RecipeIngredient.recipe_id).where(RecipeIngredient.name.in_(sorted(pantry_names)))
+        query = (self.db.session.query(RecipeIngredient.recipe_id)
+                 .filter(RecipeIngredient.recipe_id.in_(candidates))
+                 .group_by(RecipeIngredient.recipe_id))
+        if user_ids is not None:
+            query = (query.join(Recipe, Recipe.id == RecipeIngredient.recipe_id)
+                     .filter(Recipe.user_id.in_([int(uid) for uid in user_ids])))
+        ranked = [recipe_id for (recipe_id,) in query
+                  .order_by((matched * 1.0 / total).desc(), (total - matched).asc(), RecipeIngredient.recipe_id.desc())
+                  .limit(limit)]
+        if not ranked:
+            return []
+
+        names = {}
+        for recipe_id, name in (self.db.session.query(RecipeIngredient.recipe_id, RecipeIngredient.name)
+                                .filter(RecipeIngredient.recipe_id.in_(ranked))):
+            names.setdefault(recipe_id, []).append(name)
+        recipes = {recipe.id: recipe for recipe in Recipe.query.filter(Recipe.id.in_(ranked))}
+        return [(recipes[recipe_id],
+                 sorted(name for name in names[recipe_id] if name in covered),
+                 sorted(name for name in names[recipe_id] if name not in covered))
+                for recipe_id in ranked if recipe_id in recipes]
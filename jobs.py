@@ -0,0 +1,230 @@
+import json
+import time
+import uuid
+import threading
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from models import Job, db
+
+TERMINAL_STATUSES = ('succeeded', 'failed')
+
+
+class JobQueue:
+    """
+    Database-backed job queue with an in-process worker pool.
+
+    Jobs are rows in the `job` table. Any number of worker threads, in any
+    number of processes, can poll the same table: a job is claimed by bumping
+    its `attempts` counter with a conditional UPDATE, so only one worker wins.
+    Jobs left 'running' by a worker that died are picked up again once their
+    heartbeat is older than `stale_after` seconds, up to `max_attempts` tries.
+    Recurring system jobs are enqueued by the workers themselves (see `schedule`).
+    """
+    def __init__(self, app, worker_count=2, poll_interval=1.0, stale_after=600, max_attempts=3):
+        self.app = app
+        self.worker_count = worker_count
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.handlers = {}
+        self.schedules = {}  # {kind: [interval_seconds, payload, next_check]}
+        self._schedule_lock = threading.Lock()
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def register(self, kind, handler):
+        """
+        Registers `handler(job, payload, progress)` for jobs of `kind`.
+        `progress(message, result=None)` records the current stage and,
+        optionally, a partial result clients can read while the job runs.
+        The handler returns a JSON-serialisable result dict; a result with
+        status 'failed' (or an exception) marks the job failed.
+        """
+        self.handlers[kind] = handler
+
+    def schedule(self, kind, interval, payload=None):
+        """
+        Runs a system job (no user) of `kind` every `interval` seconds.
+        Each run is tied to a slot, `kind` plus the interval-sized time bucket
+        it falls in, that is unique in the job table, so when several worker
+        processes sharing the database find it due only the first insert wins.
+        """
+        self.schedules[kind] = [interval, payload or {}, 0.0]
+
+    def enqueue(self, kind, user_id, payload, schedule_slot=None):
+        """
+        Adds a queued job. With `schedule_slot`, returns None instead if a job
+        already holds that slot.
+        """
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            user_id=int(user_id) if user_id is not None else None,
+            payload=json.dumps(payload),
+            status='queued',
+            attempts=0,
+            schedule_slot=schedule_slot
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(job)
+        except IntegrityError:
+            return None
+        db.session.commit()
+        self._wake.set()
+        return job
+
+    def get(self, job_id):
+        return Job.query.get(job_id)
+
+    def prune(self, older_than):
+        """Deletes succeeded and failed jobs that finished more than `older_than` (a timedelta) ago."""
+        cutoff = datetime.utcnow() - older_than
+        deleted = (Job.query
+                   .filter(Job.status.in_(TERMINAL_STATUSES), Job.finished_at < cutoff)
+                   .delete(synchronize_session=False))
+        db.session.commit()
+        return {'deleted': deleted}
+
+    # --- Worker side ---
+
+    def ensure_started(self):
+        """Starts the worker threads once per process (no-op when worker_count is 0)."""
+        if self._threads or self.worker_count <= 0:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.worker_count):
+                thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            print(f"Started {self.worker_count} background job worker(s).")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run_forever(self):
+        """Blocks, processing jobs on `worker_count` threads (for a dedicated worker process)."""
+        self.worker_count = max(1, self.worker_count)
+        self.ensure_started()
+        try:
+            while not self._stop.is_set():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def _enqueue_due(self):
+        """Enqueues scheduled jobs whose time bucket has started (checked once per bucket)."""
+        now = time.monotonic()
+        wall = time.time()
+        due = []
+        with self._schedule_lock:
+            for kind, entry in self.schedules.items():
+                if entry[2] <= now:
+                    interval = entry[0]
+                    # Check again when the next bucket starts
+                    entry[2] = now + max(interval - wall % interval, self.poll_interval)
+                    due.append((kind, f"{kind}:{int(wall // interval)}", entry[1]))
+        for kind, slot, payload in due:
+            # Returns None when another worker already enqueued this bucket's run
+            self.enqueue(kind, None, payload, schedule_slot=slot)
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            job_id = None
+            try:
+                with self.app.app_context():
+                    if self.schedules:
+                        self._enqueue_due()
+                    job_id = self._claim_next()
+                    if job_id:
+                        self._run(job_id)
+            except Exception as e:
+                print(f"Job worker error: {e}")
+                traceback.print_exc()
+            if not job_id:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _claim_next(self):
+        now = datetime.utcnow()
+        claimable = db.or_(
+            Job.status == 'queued',
+            db.and_(Job.status == 'running',
+                    db.func.coalesce(Job.updated_at, Job.started_at) < now - timedelta(seconds=self.stale_after))
+        )
+        # Jobs out of attempts are failed in one statement, keeping any partial result
+        abandoned = (Job.query
+                     .filter(claimable, Job.attempts >= self.max_attempts)
+                     .update({
+                         'status': 'failed',
+                         'error': 'Job abandoned after repeated worker failures',
+                         'finished_at': now,
+                         'updated_at': now
+                     }, synchronize_session=False))
+        if abandoned:
+            db.session.commit()
+        candidates = (Job.query
+                      .filter(claimable, Job.attempts < self.max_attempts)
+                      .order_by(Job.created_at)
+                      .limit(5)
+                      .all())
+        for candidate in candidates:
+            claimed = (Job.query
+                       .filter(Job.id == candidate.id, Job.attempts == candidate.attempts)
+                       .update({
+                           'status': 'running',
+                           'attempts': candidate.attempts + 1,
+                           'started_at': datetime.utcnow(),
+                           'updated_at': datetime.utcnow()
+                       }, synchronize_session=False))
+            db.session.commit()
+            if claimed == 1:
+                return candidate.id
+        return None
+
+    def _set_progress(self, job_id, message, result=None):
+        values = {'progress': message[:200], 'updated_at': datetime.utcnow()}
+        if result is not None:
+            values['result'] = json.dumps(result)
+        Job.query.filter_by(id=job_id).update(values, synchronize_session=False)
+        db.session.commit()
+
+    def _finish(self, job_id, status, result=None, error=None):
+        values = {
+            'status': status,
+            'error': error,
+            'finished_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow()
+        }
+        # Without a final result, the last partial one published through progress stays
+        if result is not None:
+            values['result'] = json.dumps(result)
+        Job.query.filter_by(id=job_id).update(values, synchronize_session=False)
+        db.session.commit()
+
+    def _run(self, job_id):
+        job = Job.query.get(job_id)
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            self._finish(job_id, 'failed', error=f"No handler registered for job kind '{job.kind}'")
+            return
+
+        try:
+            result = handler(job, json.loads(job.payload),
+                             lambda message, result=None: self._set_progress(job_id, message, result))
+        except Exception as e:
+            db.session.rollback()
+            traceback.print_exc()
+            self._finish(job_id, 'failed', error=str(e))
+            return
+
+        if result and result.get('status') == 'failed':
+            self._finish(job_id, 'failed', result=result, error=result.get('error'))
+        else:
+            self._finish(job_id, 'succeeded', result=result)
@@ -9,8 +9,8 @@ import sys
 import subprocess
 import webbrowser
 import time
+from importlib.util import find_spec
 from pathlib import Path
-from recipe_scraper_s3 import app
 
 def check_dependencies():
     """Check if required packages are installed"""
@@ -30,10 +30,9 @@ def check_dependencies():
     
     missing_packages = []
     
+    # Located without importing them; the app imports the heavy ones on first use
     for package, import_name in package_imports.items():
-        try:
-            __import__(import_name)
-        except ImportError:
+        if find_spec(import_name) is None:
             missing_packages.append(package)
     
     if missing_packages:
@@ -88,6 +87,13 @@ def start_flask_app():
     """Start the Flask application"""
     try:
         
+        from recipe_scraper_s3 import load_app, init_database
+        app = load_app()
+
+        print("🗄️  Preparing database...")
+        with app.app_context():
+            print(init_database())
+
         print("🍳 Starting Recipe Scraper UI...")
         print("📺 Supports YouTube videos, web recipes, and image uploads!")
         print("🌐 Opening browser to: http://localhost:5000")
@@ -108,6 +114,9 @@ def start_flask_app():
         print("❌ Could not import Flask app")
         print("💡 Make sure 'recipe_scraper_s3.py' is in the same directory")
         sys.exit(1)
+    except ValueError as e:
+        print(f"❌ Configuration error: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"❌ Error starting application: {e}")
         sys.exit(1)
@@ -0,0 +1,179 @@
+import math
+import time
+import threading
+from collections import deque
+from contextlib import ContextDecorator
+
+QUANTILES = (0.5, 0.95, 0.99)
+# Latest observations kept per series for quantiles; count and sum cover the whole process lifetime
+WINDOW_SIZE = 2048
+
+
+def quantile(sorted_values, q):
+    """Nearest-rank quantile of an already sorted, non-empty list."""
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _with_label(labels, name, value):
+    return tuple(labels) + ((name, value),)
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def _recreate_cm(self):
+        # A fresh timer per decorated call, so concurrent calls don't share a start time
+        return _Timer(self.registry, self.name, self.labels)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    In-process metrics: latency summaries (p50/p95/p99 over the latest
+    WINDOW_SIZE observations, plus lifetime count and sum) and counters,
+    rendered in the Prometheus text format. Values are per process; with
+    several gunicorn workers each one reports its own.
+
+    Gauges such as cache hit ratios are not stored here: `add_collector`
+    registers a callable that is asked for current values at render time.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._summaries = {}  # {(name, labels): [window, count, sum]}
+        self._counters = {}  # {(name, labels): value}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._summaries.get(key)
+            if series is None:
+                series = self._summaries[key] = [deque(maxlen=WINDOW_SIZE), 0, 0.0]
+            series[0].append(seconds)
+            series[1] += 1
+            series[2] += seconds
+
+    def timer(self, name, **labels):
+        """Context manager / decorator that observes the elapsed wall time in seconds."""
+        return _Timer(self, name, labels)
+
+    def inc(self, name, amount=1, **labels):
+        if not amount:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, collector):
+        """
+        Registers `collector()` -> [(name, labels_dict, value), ...], called on
+        every render to report values owned by other objects (cache hit
+        ratios, byte counts). Names ending in _total are typed as counters,
+        everything else as gauges.
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        """{"summaries": [...], "counters": [...]} with quantiles in seconds, for JSON consumers."""
+        with self._lock:
+            summaries = [(name, labels, sorted(window), count, total)
+                         for (name, labels), (window, count, total) in self._summaries.items()]
+            counters = list(self._counters.items())
+        return {
+            'summaries': [
+                {'name': name, 'labels': dict(labels), 'count': count, 'sum': round(total, 6),
+                 **{f'p{int(q * 100)}': round(quantile(window, q), 6) for q in QUANTILES if window}}
+                for name, labels, window, count, total in sorted(summaries)
+            ],
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in sorted(counters)]
+        }
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            summaries = sorted((name, labels, sorted(window), count, total)
+                               for (name, labels), (window, count, total) in self._summaries.items())
+            counters = sorted(self._counters.items())
+
+        gauges = []
+        for collector in self._collectors:
+            try:
+                gauges.extend((name, tuple(sorted(labels.items())), value) for name, labels, value in collector())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for name, labels, window, count, total in summaries:
+            declare(name, 'summary')
+            for q in QUANTILES if window else ():
+                lines.append(f"{name}{_label_text(_with_label(labels, 'quantile', q))} {quantile(window, q):.6f}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for name, labels, value in sorted(gauges, key=lambda gauge: gauge[:2]):
+            declare(name, 'counter' if name.endswith('_total') else 'gauge')
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry shared by the app and the storage, fetch and YouTube modules
+REGISTRY = MetricsRegistry()
+REGISTRY.describe('recipe_stage_seconds', 'Time spent in each stage of the recipe pipeline.')
+REGISTRY.describe('external_call_seconds', 'Latency of calls to external services (AI models, S3, websites, YouTube).')
+REGISTRY.describe('ai_tokens_total', 'Tokens consumed by AI model calls.')
+REGISTRY.describe('cache_hit_ratio', 'Share of lookups answered from cache since the process started.')
+REGISTRY.describe('cache_lookups_total', 'Cache lookups since the process started, by result.')
+
+
+def timer(name, **labels):
+    return REGISTRY.timer(name, **labels)
+
+
+def stage_timer(stage):
+    """Times one stage of the recipe pipeline (fetch, youtube, ai_parse, markdown, save...)."""
+    return REGISTRY.timer('recipe_stage_seconds', stage=stage)
+
+
+def external_timer(service, operation):
+    """Times one call to an external service (groq, gemini, s3, website, youtube)."""
+    return REGISTRY.timer('external_call_seconds', service=service, operation=operation)
+
+
+def count_tokens(provider, tokens):
+    if tokens:
+        REGISTRY.inc('ai_tokens_total', int(tokens), provider=provider)
@@ -0,0 +1,26 @@
+"""Index recipe catalog by owner and creation time
+
+Revision ID: 5b1e7c2d9a40
+Revises: 0c293fecef29
+Create Date: 2025-11-02 10:14:27.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c2d9a40'
+down_revision = '0c293fecef29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.create_index('ix_recipe_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.drop_index('ix_recipe_user_id_created_at')
@@ -0,0 +1,26 @@
+"""Add updated_at row version to recipe
+
+Revision ID: 8d3f0a6b7c21
+Revises: 5b1e7c2d9a40
+Create Date: 2025-11-04 18:42:09.530671
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3f0a6b7c21'
+down_revision = '5b1e7c2d9a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
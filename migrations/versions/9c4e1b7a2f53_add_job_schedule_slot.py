@@ -0,0 +1,28 @@
+"""Add unique schedule_slot to job
+
+Revision ID: 9c4e1b7a2f53
+Revises: d15a7f2c6e38
+Create Date: 2025-11-18 10:22:09.514637
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e1b7a2f53'
+down_revision = 'd15a7f2c6e38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('schedule_slot', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_job_schedule_slot', ['schedule_slot'])
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_job_schedule_slot', type_='unique')
+        batch_op.drop_column('schedule_slot')
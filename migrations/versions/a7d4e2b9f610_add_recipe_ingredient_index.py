@@ -0,0 +1,40 @@
+"""Add recipe_ingredient inverted index
+
+Revision ID: a7d4e2b9f610
+Revises: f3b9d6a1c8e2
+Create Date: 2025-11-13 09:47:52.180664
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d4e2b9f610'
+down_revision = 'f3b9d6a1c8e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recipe_ingredient',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('recipe_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=True),
+    sa.Column('unit', sa.String(length=20), nullable=True),
+    sa.Column('raw', sa.String(length=300), nullable=True),
+    sa.ForeignKeyConstraint(['recipe_id'], ['recipe.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('recipe_ingredient', schema=None) as batch_op:
+        batch_op.create_index('ix_recipe_ingredient_name_recipe_id', ['name', 'recipe_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_recipe_ingredient_recipe_id'), ['recipe_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recipe_ingredient', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recipe_ingredient_recipe_id'))
+        batch_op.drop_index('ix_recipe_ingredient_name_recipe_id')
+
+    op.drop_table('recipe_ingredient')
@@ -0,0 +1,43 @@
+"""Add per-user recipe counters and allow system jobs
+
+Revision ID: b82f5c3e1d94
+Revises: a7d4e2b9f610
+Create Date: 2025-11-14 10:22:08.417352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b82f5c3e1d94'
+down_revision = 'a7d4e2b9f610'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_recipe_count',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('recipe_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Seed the counters from the catalog; the reconcile job corrects them against storage
+    op.execute(
+        "INSERT INTO user_recipe_count (user_id, recipe_count, updated_at)"
+        " SELECT user_id, COUNT(id), CURRENT_TIMESTAMP FROM recipe GROUP BY user_id"
+    )
+
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade():
+    op.execute("DELETE FROM job WHERE user_id IS NULL")
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+
+    op.drop_table('user_recipe_count')
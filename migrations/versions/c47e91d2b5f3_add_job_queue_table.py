@@ -0,0 +1,46 @@
+"""Add job table used as the background scrape queue
+
+Revision ID: c47e91d2b5f3
+Revises: 8d3f0a6b7c21
+Create Date: 2025-11-07 09:26:51.804412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e91d2b5f3'
+down_revision = '8d3f0a6b7c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('kind', sa.String(length=30), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('progress', sa.String(length=200), nullable=True),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.create_index('ix_job_status_created_at', ['status', 'created_at'], unique=False)
+        batch_op.create_index('ix_job_user_id', ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_user_id')
+        batch_op.drop_index('ix_job_status_created_at')
+
+    op.drop_table('job')
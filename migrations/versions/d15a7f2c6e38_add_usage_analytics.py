@@ -0,0 +1,94 @@
+"""Add analytics events and hourly/daily rollups
+
+Revision ID: d15a7f2c6e38
+Revises: b82f5c3e1d94
+Create Date: 2025-11-15 16:05:41.902137
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd15a7f2c6e38'
+down_revision = 'b82f5c3e1d94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analytics_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('source', sa.String(length=100), nullable=True),
+    sa.Column('source_type', sa.String(length=20), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('latency_ms', sa.Integer(), nullable=True),
+    sa.Column('tokens', sa.Integer(), nullable=True),
+    sa.Column('tags', sa.String(length=300), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analytics_event', schema=None) as batch_op:
+        batch_op.create_index('ix_analytics_event_kind_created_at', ['kind', 'created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_analytics_event_user_id'), ['user_id'], unique=False)
+
+    rollup = op.create_table('analytics_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=5), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('dimension', sa.String(length=20), nullable=False),
+    sa.Column('value', sa.String(length=100), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('failures', sa.Integer(), nullable=False),
+    sa.Column('latency_ms_total', sa.BigInteger(), nullable=False),
+    sa.Column('latency_samples', sa.Integer(), nullable=False),
+    sa.Column('tokens_total', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('period', 'bucket', 'kind', 'dimension', 'value', name='uq_analytics_rollup_key')
+    )
+    with op.batch_alter_table('analytics_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_analytics_rollup_lookup', ['period', 'kind', 'dimension', 'bucket'], unique=False)
+
+    # Seed 'save' rollups from the recipes already in the catalog, so the
+    # charts cover history (tags need the recipe bodies and start empty)
+    recipe = sa.table('recipe', sa.column('created_at', sa.DateTime()), sa.column('source', sa.String()))
+    totals = {}
+    for created_at, source in op.get_bind().execute(sa.select(recipe.c.created_at, recipe.c.source)):
+        if created_at is None:
+            continue
+        if not source:
+            kind_of_source = 'manual'
+        elif source == 'vision':
+            kind_of_source = 'image'
+        elif source in ('youtube.com', 'm.youtube.com', 'youtu.be'):
+            kind_of_source = 'youtube'
+        else:
+            kind_of_source = 'website'
+        buckets = (('hour', created_at.replace(minute=0, second=0, microsecond=0)),
+                   ('day', created_at.replace(hour=0, minute=0, second=0, microsecond=0)))
+        dimensions = [('total', ''), ('type', kind_of_source)] + ([('source', source[:100])] if source else [])
+        for period, bucket in buckets:
+            for dimension, value in dimensions:
+                key = (period, bucket, dimension, value)
+                totals[key] = totals.get(key, 0) + 1
+    if totals:
+        op.bulk_insert(rollup, [
+            {'period': period, 'bucket': bucket, 'kind': 'save', 'dimension': dimension, 'value': value,
+             'count': count, 'failures': 0, 'latency_ms_total': 0, 'latency_samples': 0, 'tokens_total': 0}
+            for (period, bucket, dimension, value), count in totals.items()
+        ])
+
+
+def downgrade():
+    with op.batch_alter_table('analytics_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_analytics_rollup_lookup')
+
+    op.drop_table('analytics_rollup')
+    with op.batch_alter_table('analytics_event', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_analytics_event_user_id'))
+        batch_op.drop_index('ix_analytics_event_kind_created_at')
+
+    op.drop_table('analytics_event')
@@ -0,0 +1,26 @@
+"""Add updated_at heartbeat to job
+
+Revision ID: e5a2c8f41d07
+Revises: c47e91d2b5f3
+Create Date: 2025-11-09 14:03:37.226190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a2c8f41d07'
+down_revision = 'c47e91d2b5f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,38 @@
+"""Add full-text recipe search index
+
+Revision ID: f3b9d6a1c8e2
+Revises: e5a2c8f41d07
+Create Date: 2025-11-12 10:21:08.514302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d6a1c8e2'
+down_revision = 'e5a2c8f41d07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Not an ORM model: FTS5 and tsvector/GIN are dialect-specific.
+    # Populate it afterwards with `flask reindex-search`.
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5("
+            "title, ingredients, method, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS recipe_search ("
+            " recipe_id INTEGER PRIMARY KEY REFERENCES recipe (id) ON DELETE CASCADE,"
+            " document tsvector NOT NULL)"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_recipe_search_document ON recipe_search USING GIN (document)")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS recipe_search")
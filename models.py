@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+import json
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -12,10 +13,149 @@ class User(db.Model, UserMixin):
     recipes = db.relationship('Recipe', backref='user', lazy=True)
 
 class Recipe(db.Model):
+    # The catalog row is the authoritative index of what lives in storage;
+    # listing endpoints read from here and never touch S3.
+    __table_args__ = (
+        db.Index('ix_recipe_user_id_created_at', 'user_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
-    s3_key = db.Column(db.String(300), nullable=False)
+    s3_key = db.Column(db.String(300), unique=True, nullable=False)
     source = db.Column(db.String(100), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Row version: bumped whenever the catalog entry changes, used for listing ETags
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+
+    @property
+    def filename(self):
+        return self.s3_key.rsplit('/', 1)[-1]
+
+    def to_dict(self):
+        return {
+            'filename': self.filename,
+            'name': self.title,
+            'created': self.created_at.isoformat() if self.created_at else '',
+            'updated': (self.updated_at or self.created_at).isoformat() if (self.updated_at or self.created_at) else '',
+            'source': self.source,
+            'user_id': str(self.user_id)
+        }
+
+
+class UserRecipeCount(db.Model):
+    """
+    Per-user recipe counter, adjusted in the same transaction as every
+    catalog insert and delete so admin pages read counts in O(users).
+    Periodically reset from storage by the 'reconcile-counts' job.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    recipe_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reconciled_at = db.Column(db.DateTime, nullable=True)
+
+
+class AnalyticsEvent(db.Model):
+    """
+    Append-only log of scrape and save events; never updated. Aggregates are
+    read from AnalyticsRollup, which is maintained alongside each insert.
+    user_id is not a foreign key so history survives user deletion.
+    """
+    __table_args__ = (
+        db.Index('ix_analytics_event_kind_created_at', 'kind', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # scrape, save
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    source = db.Column(db.String(100), nullable=True)  # domain, 'vision' or None for manual saves
+    source_type = db.Column(db.String(20), nullable=True)  # website, youtube, image, manual
+    status = db.Column(db.String(20), nullable=False, default='success')
+    latency_ms = db.Column(db.Integer, nullable=True)
+    tokens = db.Column(db.Integer, nullable=True)
+    tags = db.Column(db.String(300), nullable=True)  # comma-separated
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AnalyticsRollup(db.Model):
+    """
+    Running totals of AnalyticsEvent per hour or day bucket, event kind and
+    dimension value (e.g. dimension 'source', value 'bbcgoodfood.com').
+    Dimension 'total' with an empty value holds the bucket's overall totals.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('period', 'bucket', 'kind', 'dimension', 'value', name='uq_analytics_rollup_key'),
+        db.Index('ix_analytics_rollup_lookup', 'period', 'kind', 'dimension', 'bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(5), nullable=False)  # hour, day
+    bucket = db.Column(db.DateTime, nullable=False)  # start of the hour or day (UTC)
+    kind = db.Column(db.String(20), nullable=False)
+    dimension = db.Column(db.String(20), nullable=False)  # total, source, type, tag
+    value = db.Column(db.String(100), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    latency_ms_total = db.Column(db.BigInteger, nullable=False, default=0)
+    latency_samples = db.Column(db.Integer, nullable=False, default=0)
+    tokens_total = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class RecipeIngredient(db.Model):
+    """
+    One parsed ingredient of a recipe (inverted index: canonical name -> recipe).
+    Rebuilt from the recipe's Markdown on every save; see ingredients.py.
+    """
+    __table_args__ = (
+        db.Index('ix_recipe_ingredient_name_recipe_id', 'name', 'recipe_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    quantity = db.Column(db.Float, nullable=True)
+    unit = db.Column(db.String(20), nullable=True)
+    raw = db.Column(db.String(300), nullable=True)
+
+
+class Job(db.Model):
+    """
+    A unit of background work (e.g. scraping one URL). The table doubles as
+    the queue: workers claim 'queued' rows with a compare-and-swap on
+    `attempts`, so no external broker is needed.
+    """
+    __table_args__ = (
+        db.Index('ix_job_status_created_at', 'status', 'created_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(30), nullable=False)
+    # None for system jobs enqueued by a schedule rather than a user
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    progress = db.Column(db.String(200), nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # "<kind>:<time bucket>" for scheduled jobs; unique so only one worker enqueues each run
+    schedule_slot = db.Column(db.String(64), nullable=True, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Heartbeat: refreshed on every progress update so long jobs aren't mistaken for stale ones
+    updated_at = db.Column(db.DateTime, nullable=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
\ No newline at end of file
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created': self.created_at.isoformat() if self.created_at else None,
+            'started': self.started_at.isoformat() if self.started_at else None,
+            'finished': self.finished_at.isoformat() if self.finished_at else None
+        }
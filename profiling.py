@@ -0,0 +1,386 @@
+import os
+import sys
+import glob
+import json
+import time
+import uuid
+import random
+import pstats
+import shutil
+import cProfile
+import threading
+from werkzeug.exceptions import HTTPException
+
+PROFILE_MODES = ('cprofile', 'sample')
+DEFAULT_SAMPLE_INTERVAL_MS = 5
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+def _collapsed_stack(frame):
+    """Root-first 'a;b;c' stack of `frame`, as used by flamegraph.pl and speedscope."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class RequestProfiler:
+    """
+    On-demand profiler for a Flask app running in one or more worker
+    processes on a host.
+
+    An admin starts a session (routes, sample rate, mode, duration); the
+    settings are written to a control file under `directory`, which a
+    watcher thread in every worker polls. While a session is active the
+    worker wraps `app.wsgi_app` and profiles the chosen fraction of
+    matching requests, either with cProfile (one request at a time per
+    process) or with a stack sampler thread. Per-route results are
+    aggregated in memory and flushed to per-process files that downloads
+    merge. With no active session the WSGI app is the original one, so
+    requests pay nothing.
+
+    Only the view call is profiled; the body of a streamed response is
+    produced after it returns and is not included. Starting a session
+    deletes all but the `keep_sessions` most recent session directories.
+
+    From Python 3.12 cProfile records every thread of the process (it is
+    built on sys.monitoring), so in a threaded worker the calls of concurrent
+    requests would be charged to the profiled one. Such workers (the WSGI
+    server sets `wsgi.multithread`) sample instead when a 'cprofile' session
+    is started.
+    """
+    def __init__(self, app, directory, poll_interval=2.0, keep_sessions=5):
+        self.app = app
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.keep_sessions = max(1, keep_sessions)
+        self.control_path = os.path.join(directory, 'control.json')
+        self.config = None
+        self._control_mtime = None
+        self._original_wsgi_app = None
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()
+        self._watcher = None
+        self._sampler = None
+        self._dirty = False
+        self.threaded = False  # set from wsgi.multithread by the first profiled request
+        self._reset()
+
+    def _reset(self):
+        self._profiles = {}  # {route: pstats.Stats}
+        self._stacks = {}  # {route: {stack: samples}}
+        self._requests = {}  # {route: [count, seconds]}
+        self._active = {}  # {thread id: route} of requests being sampled
+
+    # --- Control (any worker) ---
+
+    def start(self, routes=None, sample_rate=1.0, mode='cprofile', duration=600,
+              interval_ms=DEFAULT_SAMPLE_INTERVAL_MS):
+        """
+        Starts a new session for every worker. `routes` are endpoint names or
+        URL rules ('get_recipes', '/dashboard'); None profiles every route.
+        Raises ValueError for invalid settings.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        if duration <= 0:
+            raise ValueError("duration must be positive")
+        config = {
+            'session': uuid.uuid4().hex[:12],
+            'enabled': True,
+            'routes': sorted(set(routes)) if routes else None,
+            'sample_rate': sample_rate,
+            'mode': mode,
+            'interval_ms': max(1, int(interval_ms)),
+            'started_at': time.time(),
+            'expires_at': time.time() + duration
+        }
+        self._write_control(config)
+        self._prune_sessions(config['session'])
+        return config
+
+    def stop(self):
+        """Ends the active session; its results stay available for download."""
+        config = self._read_control()
+        if config:
+            config['enabled'] = False
+            config['expires_at'] = min(config['expires_at'], time.time())
+            self._write_control(config)
+        return config
+
+    def _write_control(self, config):
+        os.makedirs(os.path.join(self.directory, config['session']), exist_ok=True)
+        _write_atomic(self.control_path, json.dumps(config).encode('utf-8'))
+        self._apply(config)
+
+    def _prune_sessions(self, current):
+        """Removes the oldest session directories beyond `keep_sessions` (never `current`)."""
+        sessions = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name != current and os.path.isdir(path):
+                try:
+                    sessions.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    continue
+        for _, path in sorted(sessions, reverse=True)[self.keep_sessions - 1:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _read_control(self):
+        try:
+            with open(self.control_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def is_active(config):
+        return bool(config and config.get('enabled') and config['expires_at'] > time.time())
+
+    def mode(self, config):
+        """The mode this worker profiles `config`'s session in (see the class docstring)."""
+        if config['mode'] == 'cprofile' and self.threaded and sys.version_info >= (3, 12):
+            return 'sample'
+        return config['mode']
+
+    # --- Worker side ---
+
+    def ensure_watching(self):
+        """Starts this process's control-file watcher once (after the fork, on the first request)."""
+        if self._watcher:
+            return
+        with self._lock:
+            if self._watcher:
+                return
+            self._watcher = threading.Thread(target=self._watch, name='profiler-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"Profiler watcher error: {e}")
+            time.sleep(self.poll_interval)
+
+    def _poll(self):
+        try:
+            mtime = os.stat(self.control_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._control_mtime:
+            self._control_mtime = mtime
+            self._apply(self._read_control())
+        elif self.config and self._original_wsgi_app and not self.is_active(self.config):
+            self._apply(self.config)  # expired
+        self._ensure_sampler()
+        if self._dirty:
+            self.flush()
+
+    def _ensure_sampler(self):
+        with self._lock:
+            config = self.config
+            if (self.is_active(config) and self.mode(config) == 'sample'
+                    and not (self._sampler and self._sampler.is_alive())):
+                self._sampler = threading.Thread(target=self._sample_loop, name='profiler-sampler', daemon=True)
+                self._sampler.start()
+
+    def _apply(self, config):
+        with self._lock:
+            if config and (not self.config or config['session'] != self.config['session']):
+                self._reset()
+            self.config = config
+            active = self.is_active(config)
+            if active and self._original_wsgi_app is None:
+                self._original_wsgi_app = self.app.wsgi_app
+                self.app.wsgi_app = self._profiled_wsgi_app
+            elif not active and self._original_wsgi_app is not None:
+                self.app.wsgi_app = self._original_wsgi_app
+                self._original_wsgi_app = None
+        self._ensure_sampler()
+        self._dirty = True
+
+    def _route_for(self, environ):
+        try:
+            rule, _ = self.app.url_map.bind_to_environ(environ).match(return_rule=True)
+        except HTTPException:
+            return None
+        routes = self.config['routes']
+        if routes is None or rule.endpoint in routes or rule.rule in routes:
+            return rule.endpoint
+        return None
+
+    def _profiled_wsgi_app(self, environ, start_response):
+        original, config = self._original_wsgi_app, self.config
+        if original is None:
+            return self.app.wsgi_app(environ, start_response)
+        route = self._route_for(environ) if random.random() < config['sample_rate'] else None
+        if route is None:
+            return original(environ, start_response)
+        if environ.get('wsgi.multithread') and not self.threaded:
+            self.threaded = True
+            self._ensure_sampler()
+
+        started = time.perf_counter()
+        if self.mode(config) == 'sample':
+            thread_id = threading.get_ident()
+            self._active[thread_id] = route
+            try:
+                return original(environ, start_response)
+            finally:
+                self._active.pop(thread_id, None)
+                self._count(route, started)
+
+        # cProfile traces one request at a time per process; others pass through unprofiled
+        if not self._cprofile_lock.acquire(blocking=False):
+            return original(environ, start_response)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                return original(environ, start_response)
+            finally:
+                profile.disable()
+        finally:
+            self._cprofile_lock.release()
+            with self._lock:
+                if route in self._profiles:
+                    self._profiles[route].add(profile)
+                else:
+                    self._profiles[route] = pstats.Stats(profile)
+            self._count(route, started)
+
+    def _count(self, route, started):
+        with self._lock:
+            entry = self._requests.setdefault(route, [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - started
+        self._dirty = True
+
+    def _sample_loop(self):
+        # The watcher may replace or clear self.config at any time; read it once per pass
+        config = self.config
+        if not config:
+            return
+        session, interval = config['session'], config['interval_ms'] / 1000
+        while True:
+            config = self.config
+            if not (self.is_active(config) and config['session'] == session and self.mode(config) == 'sample'):
+                return
+            if self._active:
+                frames = sys._current_frames()
+                with self._lock:
+                    for thread_id, route in self._active.copy().items():
+                        frame = frames.get(thread_id)
+                        if frame is not None:
+                            stacks = self._stacks.setdefault(route, {})
+                            stack = _collapsed_stack(frame)
+                            stacks[stack] = stacks.get(stack, 0) + 1
+            time.sleep(interval)
+
+    def flush(self):
+        """Writes this process's aggregates for the current session to disk."""
+        with self._lock:
+            if not self.config:
+                return
+            self._dirty = False
+            session_dir = os.path.join(self.directory, self.config['session'])
+            prefix = os.path.join(session_dir, f"{os.getpid()}")
+            os.makedirs(session_dir, exist_ok=True)
+            for index, (route, stats) in enumerate(sorted(self._profiles.items())):
+                stats.dump_stats(f"{prefix}-{index}.prof.tmp")
+                os.replace(f"{prefix}-{index}.prof.tmp", f"{prefix}-{index}.prof")
+            summary = {
+                'routes': {route: {'requests': count, 'seconds': round(seconds, 6)}
+                           for route, (count, seconds) in self._requests.items()},
+                'profiles': {route: index for index, route in enumerate(sorted(self._profiles))},
+                'stacks': self._stacks
+            }
+            _write_atomic(f"{prefix}.json", json.dumps(summary).encode('utf-8'))
+
+    # --- Results (any worker) ---
+
+    def _summaries(self, session):
+        summaries = []
+        for path in sorted(glob.glob(os.path.join(self.directory, session, '*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    summaries.append((path[:-len('.json')], json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return summaries
+
+    def status(self):
+        """The current (or last) session's settings and per-route request totals over all workers."""
+        self.flush()
+        config = self._read_control()
+        if not config:
+            return {'active': False, 'session': None, 'routes': {}}
+        routes = {}
+        workers = self._summaries(config['session'])
+        for _, summary in workers:
+            for route, totals in summary['routes'].items():
+                merged = routes.setdefault(route, {'requests': 0, 'seconds': 0.0})
+                merged['requests'] += totals['requests']
+                merged['seconds'] = round(merged['seconds'] + totals['seconds'], 6)
+        return {**config, 'active': self.is_active(config), 'workers': len(workers), 'routes': routes}
+
+    def export_pstats(self, route=None):
+        """
+        cProfile results of every worker (for one route, or all) merged into
+        one pstats file, returned as bytes; None if nothing was profiled.
+        """
+        self.flush()
+        config = self._read_control()
+        if not config:
+            return None
+        files = []
+        for prefix, summary in self._summaries(config['session']):
+            for profiled_route, index in summary['profiles'].items():
+                if route is None or profiled_route == route:
+                    files.append(f"{prefix}-{index}.prof")
+        files = [path for path in files if os.path.exists(path)]
+        if not files:
+            return None
+        merged_path = os.path.join(self.directory, config['session'], f"merged-{uuid.uuid4().hex}.prof")
+        try:
+            pstats.Stats(*files).dump_stats(merged_path)
+            with open(merged_path, 'rb') as f:
+                return f.read()
+        finally:
+            if os.path.exists(merged_path):
+                os.remove(merged_path)
+
+    def export_collapsed(self, route=None):
+        """
+        Folded stacks of a 'sample' session ("route;frame;...;frame count" per
+        line, root first) merged across workers, for flamegraph.pl or
+        speedscope. Returns '' if nothing was sampled.
+        """
+        self.flush()
+        config = self._read_control()
+        if not config:
+            return ''
+        totals = {}
+        for _, summary in self._summaries(config['session']):
+            for profiled_route, stacks in summary['stacks'].items():
+                if route is None or profiled_route == route:
+                    for stack, count in stacks.items():
+                        key = f"{profiled_route};{stack}"
+                        totals[key] = totals.get(key, 0) + count
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(totals.items()))
@@ -8,43 +8,75 @@ import sys
 import subprocess
 import webbrowser
 import json
-import boto3
 import http.cookiejar
-from datetime import datetime
+from datetime import datetime, timedelta
 import base64 
-from flask import Flask, redirect, render_template, render_template_string, jsonify, request, session, url_for
+import hashlib
+import hmac
+import time
+import tempfile
+import threading
+from flask import Request, Flask, redirect, render_template, render_template_string, jsonify, request, session, url_for, stream_with_context
 from flask_cors import CORS
 import requests
-from bs4 import BeautifulSoup
 import re
+import html
+from types import SimpleNamespace
 from urllib.parse import urlparse
-import openai
-import yt_dlp
 from dotenv import load_dotenv
-from botocore.exceptions import ClientError, NoCredentialsError
-from PIL import Image, ImageOps
 # Pytesseract is no longer used by the backend
 # import pytesseract 
 import traceback
 from auth import auth_bp
-from models import User, Recipe, db
+from models import User, Recipe, UserRecipeCount, Job, db
+from jobs import JobQueue, TERMINAL_STATUSES
+from bulk_import import BulkImporter
+from ai_cache import ParseResultCache, VisionResultCache
+from units import ingredient_to_metric, fahrenheit_to_celsius
+from html_extract import fetch_html, extract_page, PageRejected
+from recipe_text import extract_recipe_sections, parse_vtt
+from youtube import YouTubeTranscriber
+from http_client import create_session, load_cookie_jars, HttpCache
+from images import ImagePipeline
+from search import RecipeSearchIndex
+from ingredients import IngredientIndex
+from analytics import UsageAnalytics, source_domain, source_type, recipe_tags
+from metrics import REGISTRY as metrics_registry, stage_timer, external_timer, count_tokens
+from profiling import RequestProfiler
+from storage import create_storage, CachedStorage, NOT_MODIFIED, RECIPE_PAGE_SIZE, MAX_RECIPE_PAGE_SIZE
 # from admin import admin_bp
 from flask_migrate import Migrate
 from flask_login import LoginManager, current_user, login_user, logout_user, login_required
 from flask_sqlalchemy import SQLAlchemy
-from google import genai
-from google.genai import types
+from sqlalchemy.exc import IntegrityError
+from werkzeug.local import LocalProxy
+# openai, google.genai, yt_dlp, boto3, PIL and bs4 are imported where they are
+# first used, so starting a worker does not pay for them
 
 
 
 
 load_dotenv()
 
+
+class SpooledUploadRequest(Request):
+    """
+    Writes every uploaded file straight to a named temporary file (Werkzeug
+    keeps small ones in memory and larger ones in anonymous files), so image
+    workers can open uploads by path. The files are removed when the request ends.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.NamedTemporaryFile('wb+', prefix='upload-', dir=os.getenv('UPLOAD_TMP_DIR') or None)
+
+
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 # CORS(app)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Whole-request cap; larger uploads are rejected with 413 before they are read
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_BYTES', str(40 * 1024 * 1024)))
 
 app.secret_key = os.getenv("SECRET_KEY", "default_secret")
 
@@ -61,431 +93,551 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login' 
 
-with app.app_context():
-    db.create_all()
-
 
 def get_s3_recipe_counts():
-    """Fetches recipe counts from S3 for all users."""
+    """Fetches per-user recipe counts from the counters table (one row per user)."""
     try:
-        # list_all_recipes_admin returns a list of recipes and the user_recipe_counts dict
-        _, user_recipe_counts = storage.list_all_recipes_admin() 
-        return user_recipe_counts
+        return catalog.recipe_counts()
     except Exception as e:
-        print(f"Error fetching S3 counts: {e}")
+        print(f"Error fetching recipe counts: {e}")
         return {}
 
-class S3Storage:
-    def __init__(self):
-        self.bucket_name = os.getenv('AWS_S3_BUCKET')
-        if not self.bucket_name:
-            raise ValueError("AWS_S3_BUCKET environment variable is required")
-        
-        try:
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-                region_name=os.getenv('AWS_REGION', 'us-east-1')
-            )
-            # Test connection
-            self.s3_client.head_bucket(Bucket=self.bucket_name)
-        except (NoCredentialsError, ClientError) as e:
-            raise ValueError(f"AWS S3 configuration error: {str(e)}")
-    
-# In class S3Storage:
-    def save_recipe(self, filename, content, recipe_name, user_id):
-        try:
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=f"recipes/{user_id}/{filename}",  # <--- Uses user_id
-                Body=content.encode('utf-8'),
-                ContentType='text/markdown',
-                Metadata={
-                    'created': datetime.now().isoformat(),
-                    'type': 'recipe',
-                    'recipe-name': recipe_name
-                }
-            )
-            return True
-        except ClientError:
+
+def encode_cursor(created_at, recipe_id):
+    """Opaque pagination cursor pointing just after (created_at, id)."""
+    raw = f"{created_at.isoformat()}|{recipe_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created, recipe_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created), int(recipe_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+class RecipeCatalog:
+    """
+    Database-backed index of every stored recipe.
+    Writes go to storage first and are then recorded in the `Recipe` table;
+    all listing and counting is served from indexed SQL queries so no
+    endpoint has to walk the bucket. Per-user counts live in `UserRecipeCount`,
+    adjusted in the same transaction as each insert and delete, and are
+    periodically reconciled against storage. Recipe bodies are also fed to the
+    full-text `search_index` and the pantry `ingredient_index` on every
+    save and delete, and each new recipe is logged to `analytics`.
+    """
+    def __init__(self, storage, search_index=None, ingredient_index=None, analytics=None):
+        self.storage = storage
+        self.search_index = search_index
+        self.ingredient_index = ingredient_index
+        self.analytics = analytics
+
+    @staticmethod
+    def _s3_key(user_id, filename):
+        return f"recipes/{user_id}/{filename}"
+
+    def save_recipe(self, filename, content, recipe_name, user_id, source=None):
+        if not self.storage.save_recipe(filename, content, recipe_name, user_id, source=source):
             return False
-        
-        
-    def get_recipe(self, filename, user_id):
-        try:
-            response = self.s3_client.get_object(
-                Bucket=self.bucket_name,
-                Key=f"recipes/{user_id}/{filename}"  # <--- Uses user_id
-            )
-            return response['Body'].read().decode('utf-8')
-        except ClientError:
-            return None
-        
-    def get_recipe_metadata(self, key):
+        return self.record_save(filename, recipe_name, user_id, source=source, content=content)
+
+    def record_save(self, filename, recipe_name, user_id, source=None, created_at=None, content=None):
         """
-        Helper function to get just the metadata and last-modified time of an S3 object.
-        This uses a fast HEAD request instead of downloading the whole file.
+        Inserts or updates the catalog row for a recipe that is already in storage,
+        and (re)indexes `content` for search and pantry queries when it is given.
+        New recipes saved with `content` (not backfilled ones) are logged as
+        'save' analytics events.
         """
         try:
-            response = self.s3_client.head_object(
-                Bucket=self.bucket_name,
-                Key=key
-            )
-            # S3 metadata keys are auto-lowercased, so 'recipe-name' is correct
-            return response.get('Metadata', {}), response.get('LastModified')
-        except ClientError:
-            return None, None
-        
+            s3_key = self._s3_key(user_id, filename)
+            recipe = Recipe.query.filter_by(s3_key=s3_key).first()
+            created = recipe is None
+            if created:
+                recipe = Recipe(s3_key=s3_key, user_id=int(user_id), created_at=created_at or datetime.utcnow())
+                db.session.add(recipe)
+                self._adjust_count(int(user_id), 1)
+            recipe.title = (recipe_name or 'Unknown Recipe')[:150]
+            if source:
+                recipe.source = source[:100]
+            if content is not None:
+                # A content edit usually leaves the title as it was, so no UPDATE
+                # would run; bump the row version the listing ETag is built from
+                recipe.updated_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to index recipe {filename} for user {user_id}: {e}")
+            return False
+        if content is not None:
+            with stage_timer('index'):
+                if self.search_index:
+                    self.search_index.update(recipe.id, content)
+                if self.ingredient_index:
+                    self.ingredient_index.update(recipe.id, content)
+        if created and content is not None and self.analytics:
+            self.analytics.record('save', user_id, source=source, tags=recipe_tags(content))
+        return True
 
-    
-# In class S3Storage:
-    def list_recipes(self, user_id):
+    def delete_recipe(self, filename, user_id):
+        """
+        Removes the catalog row, its index rows and one from the owner's count,
+        deletes the stored object, then commits. Returns False, with nothing
+        committed, if any step fails.
+        """
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=f"recipes/{user_id}/recipe_"  # <--- Uses user_id
-            )
-            
-            recipes = []
-            for obj in response.get('Contents', []):
-                filename = obj['Key'].replace(f'recipes/{user_id}/', '') 
-                if not filename.endswith('.md'):
-                    continue
-                        
-                try:
-                    metadata, last_modified = self.get_recipe_metadata(obj['Key'])
-                    
-                    if metadata and 'recipe-name' in metadata:
-                        recipe_name = metadata.get('recipe-name', 'Unknown Recipe')
-                        created = metadata.get('created', last_modified.isoformat() if last_modified else datetime.now().isoformat())
-                    else:
-                        content = self.get_recipe(filename, user_id) 
-                        if content and content.startswith('# '):
-                            recipe_name = content.split('\n')[0][2:].strip()
-                        else:
-                            recipe_name = "Unknown Recipe"
-                        created = obj['LastModified'].isoformat()
-
-                    recipes.append({
-                        'filename': filename,
-                        'name': recipe_name,
-                        'created': created
-                    })
-                except Exception as e:
-                    print(f"Failed to process {filename}: {e}")
-                    continue
-            
-            return sorted(recipes, key=lambda x: x['created'], reverse=True)
-        except ClientError:
+            recipe = Recipe.query.filter_by(s3_key=self._s3_key(user_id, filename)).first()
+            if recipe is not None:
+                # Index rows, the recipe row and the owner's count go in one commit
+                if self.search_index:
+                    self.search_index.remove(recipe.id, commit=False)
+                if self.ingredient_index:
+                    self.ingredient_index.remove(recipe.id, commit=False)
+                db.session.delete(recipe)
+                self._adjust_count(recipe.user_id, -1)
+                db.session.flush()
+            # Storage goes last so a catalog failure never leaves rows pointing at a deleted object
+            if not self.storage.delete_recipe(filename, user_id):
+                db.session.rollback()
+                return False
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to remove {filename} from the recipe catalog: {e}")
+            return False
+        return True
+
+    def get_recipe(self, filename, user_id):
+        return self.storage.get_recipe(filename, user_id)
+
+    def list_recipes(self, user_ids):
+        """Returns the recipes owned by any of `user_ids`, newest first."""
+        user_ids = [int(uid) for uid in user_ids]
+        if not user_ids:
             return []
-        
+        rows = (Recipe.query
+                .filter(Recipe.user_id.in_(user_ids))
+                .order_by(Recipe.created_at.desc())
+                .all())
+        return [row.to_dict() for row in rows]
 
-    # In class S3Storage:
+    def list_recipes_page(self, user_ids=None, limit=RECIPE_PAGE_SIZE, cursor=None):
+        """
+        Keyset-paginated listing, newest first.
+        `user_ids=None` lists every user's recipes (admin view).
+        Returns (recipes, next_cursor); next_cursor is None on the last page.
+        Raises ValueError for a malformed cursor.
+        """
+        query = Recipe.query
+        if user_ids is not None:
+            query = query.filter(Recipe.user_id.in_([int(uid) for uid in user_ids]))
+        if cursor:
+            created_at, recipe_id = decode_cursor(cursor)
+            query = query.filter(db.or_(
+                Recipe.created_at < created_at,
+                db.and_(Recipe.created_at == created_at, Recipe.id < recipe_id)
+            ))
+        rows = (query
+                .order_by(Recipe.created_at.desc(), Recipe.id.desc())
+                .limit(limit + 1)
+                .all())
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return [row.to_dict() for row in rows], next_cursor
 
     def list_all_recipes_admin(self):
+        rows = Recipe.query.order_by(Recipe.created_at.desc()).all()
+        return [row.to_dict() for row in rows], self.recipe_counts()
+
+    def search(self, query, user_ids=None, limit=20):
+        """Ranked full-text search; returns recipe dicts with a 'score', best first."""
+        if not self.search_index:
+            return []
+        results = []
+        for recipe, score in self.search_index.search(query, user_ids, limit):
+            item = recipe.to_dict()
+            item['score'] = round(score, 4)
+            results.append(item)
+        return results
+
+    def cook_with(self, pantry, user_ids=None, limit=20, include_staples=True):
+        """
+        Recipes makeable from the `pantry` ingredient names, best coverage first.
+        Each recipe dict gains 'coverage' (share of its ingredients on hand),
+        'matched' and 'missing' ingredient names.
+        """
+        if not self.ingredient_index:
+            return []
+        results = []
+        for recipe, matched, missing in self.ingredient_index.rank_by_coverage(
+                pantry, user_ids, limit, include_staples):
+            item = recipe.to_dict()
+            item['coverage'] = round(len(matched) / ((len(matched) + len(missing)) or 1), 4)
+            item['matched'] = matched
+            item['missing'] = missing
+            results.append(item)
+        return results
+
+    def reindex_search(self):
         """
-        Admin-only function to list all recipes from all users.
+        Rebuilds the search and ingredient indexes from the bodies in storage.
+        Returns (indexed, skipped).
         """
+        indexed, skipped = 0, 0
+        for recipe in Recipe.query.order_by(Recipe.id).all():
+            content = self.storage.get_recipe(recipe.filename, recipe.user_id)
+            if content is None:
+                skipped += 1
+                continue
+            if self.search_index:
+                self.search_index.update(recipe.id, content)
+            if self.ingredient_index:
+                self.ingredient_index.update(recipe.id, content)
+            indexed += 1
+        return indexed, skipped
+
+    @staticmethod
+    def _adjust_count(user_id, delta):
+        """
+        Adds `delta` to a user's counter inside the caller's transaction.
+        A user without a counter row gets one seeded from the catalog rows
+        (which already include the pending change).
+        """
+        values = {'recipe_count': UserRecipeCount.recipe_count + delta, 'updated_at': datetime.utcnow()}
+        if UserRecipeCount.query.filter_by(user_id=user_id).update(values, synchronize_session=False):
+            return
         try:
-            paginator = self.s3_client.get_paginator('list_objects_v2')
-            pages = paginator.paginate(
-                Bucket=self.bucket_name,
-                Prefix="recipes/"
-            )
-            
-            recipes = []
-            # This dict will store counts like {'user_id_1': 10, 'user_id_2': 5}
-            user_recipe_counts = {} 
-
-            for page in pages:
-                for obj in page.get('Contents', []):
-                    key = obj['Key']
-                    # Path is "recipes/USER_ID/FILENAME"
-                    # We must ignore the "folder" itself
-                    if key.endswith('/'):
-                        continue
-
-                    parts = key.split('/')
-                    # Ensure the path is valid (recipes/user_id/filename)
-                    if len(parts) != 3 or not parts[2].startswith('recipe_'):
-                        continue 
-
-                    user_id = parts[1]
-                    filename = parts[2]
-
-                    try:
-                        # Update this user's recipe count
-                        user_recipe_counts[user_id] = user_recipe_counts.get(user_id, 0) + 1
-
-                        # Get metadata (fast)
-                        metadata, last_modified = self.get_recipe_metadata(obj['Key'])
-                        
-                        if metadata and 'recipe-name' in metadata:
-                            recipe_name = metadata.get('recipe-name', 'Unknown Recipe')
-                            created = metadata.get('created', last_modified.isoformat() if last_modified else datetime.now().isoformat())
-                        else:
-                            # Slow fallback for old files (should be rare)
-                            content = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)['Body'].read().decode('utf-8')
-                            if content and content.startswith('# '):
-                                recipe_name = content.split('\n')[0][2:].strip()
-                            else:
-                                recipe_name = "Unknown Recipe"
-                            created = obj['LastModified'].isoformat()
-
-                        recipes.append({
-                            'filename': filename,
-                            'name': recipe_name,
-                            'created': created,
-                            'user_id': user_id  # Add user_id for the admin view
-                        })
-                    except Exception as e:
-                        print(f"Failed to process admin recipe {filename}: {e}")
-                        continue
-            
-            sorted_recipes = sorted(recipes, key=lambda x: x['created'], reverse=True)
-            # Return both the list and the counts dictionary
-            return sorted_recipes, user_recipe_counts
+            with db.session.begin_nested():
+                db.session.add(UserRecipeCount(
+                    user_id=user_id,
+                    recipe_count=Recipe.query.filter_by(user_id=user_id).count(),
+                    updated_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Another transaction created the row first
+            UserRecipeCount.query.filter_by(user_id=user_id).update(values, synchronize_session=False)
+
+    def recipe_counts(self):
+        """Returns {'user_id': count} for every user that owns at least one recipe."""
+        rows = (db.session.query(UserRecipeCount.user_id, UserRecipeCount.recipe_count)
+                .filter(UserRecipeCount.recipe_count > 0)
+                .all())
+        return {str(user_id): count for user_id, count in rows}
+
+    def recipe_count(self, user_id):
+        counter = UserRecipeCount.query.get(int(user_id))
+        return counter.recipe_count if counter else 0
+
+    def reconcile_counts(self):
+        """
+        Resets each user's counter to the number of recipes actually in
+        storage. A counter is only overwritten if it has not changed since
+        it was read before listing storage (compare-and-swap), so saves and
+        deletes made during the listing are never lost; such users are
+        picked up by the next run. Returns {"users", "corrected", "skipped",
+        "drift"} with drift as {'user_id': stored - counted}, or a failed
+        status if storage could not be listed.
+        """
+        counters = {str(user_id): count for user_id, count in
+                    db.session.query(UserRecipeCount.user_id, UserRecipeCount.recipe_count)}
+        db.session.commit()
+        stored = self.storage.count_recipes()
+        if stored is None:
+            return {"status": "failed", "error": "Could not list recipes in storage"}
+
+        now = datetime.utcnow()
+        drift, skipped = {}, 0
+        user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+        for user_id in user_ids:
+            actual = stored.get(str(user_id), 0)
+            counted = counters.get(str(user_id))
+            if counted is None:
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(UserRecipeCount(user_id=user_id, recipe_count=actual,
+                                                       updated_at=now, reconciled_at=now))
+                    if actual:
+                        drift[str(user_id)] = actual
+                except IntegrityError:
+                    skipped += 1
+                continue
+            values = {'reconciled_at': now}
+            if counted != actual:
+                values.update(recipe_count=actual, updated_at=now)
+            swapped = (UserRecipeCount.query
+                       .filter_by(user_id=user_id, recipe_count=counted)
+                       .update(values, synchronize_session=False))
+            if not swapped:
+                skipped += 1
+            elif counted != actual:
+                drift[str(user_id)] = actual - counted
+        db.session.commit()
+
+        orphaned = set(stored) - {str(user_id) for user_id in user_ids}
+        if orphaned:
+            print(f"Recipe count reconcile: storage holds recipes for unknown user ids {sorted(orphaned)}")
+        if drift:
+            print(f"Recipe count reconcile corrected {len(drift)} user(s): {drift}")
+        return {"users": len(user_ids), "corrected": len(drift), "skipped": skipped, "drift": drift}
+
+    def backfill(self):
+        """
+        One-shot import of every object already in storage into the catalog.
+        Safe to re-run: existing rows are updated in place.
+        """
+        recipes, _ = self.storage.list_all_recipes_admin()
+        known_users = {u.id for u in User.query.all()}
+        imported, skipped = 0, 0
+        for item in recipes:
+            try:
+                user_id = int(item['user_id'])
+            except (TypeError, ValueError):
+                user_id = None
+            if user_id not in known_users:
+                skipped += 1
+                continue
+            try:
+                created_at = datetime.fromisoformat(item['created']).replace(tzinfo=None)
+            except (TypeError, ValueError):
+                created_at = None
+            if self.record_save(item['filename'], item['name'], user_id,
+                                source=item.get('source'), created_at=created_at):
+                imported += 1
+            else:
+                skipped += 1
+        return imported, skipped
 
-        except ClientError as e:
-            print(f"Admin recipe list failed: {e}")
-            return [], {}
 
-    def delete_recipe(self, filename, user_id):
-        try:
-            self.s3_client.delete_object(
-                Bucket=self.bucket_name,
-                Key=f"recipes/{user_id}/{filename}"  # <--- Uses user_id
-            )
-            return True
-        except ClientError:
-            return False
 class RecipeScraper:
-    def __init__(self, storage):
+    def __init__(self, storage, parse_cache=None, http_cache=None, image_pipeline=None, vision_cache=None,
+                 analytics=None):
         self.cookie_file_path = 'browser_cookies.txt'
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        # One pooled, retrying session for every page, caption and image fetch
+        self.session = create_session(
+            pool_maxsize=int(os.getenv('HTTP_POOL_SIZE', '8')),
+            retries=int(os.getenv('HTTP_RETRIES', '3'))
+        )
+        load_cookie_jars(self.session)
+        self.http_cache = http_cache
         
         # --- Client for Groq (Text) ---
-        groq_api_key = os.getenv('GROQ_API_KEY')
-        if not groq_api_key:
+        self.groq_api_key = os.getenv('GROQ_API_KEY')
+        if not self.groq_api_key:
             raise ValueError("GROQ_API_KEY environment variable is required")
         
-        self.ai_client = openai.OpenAI(
-            api_key=groq_api_key,
-            base_url="https://api.groq.com/openai/v1"
-        )
-        
-        # --- Client for OpenAI (Vision) ---
-        gemini_api_key = os.getenv('GEMINI_API_KEY')
-        if not gemini_api_key:
+        # --- Client for Gemini (Vision) ---
+        self.gemini_api_key = os.getenv('GEMINI_API_KEY')
+        if not self.gemini_api_key:
             # We don't raise an error here because the text scraping is still functional
             print("Warning: GEMINI_API_KEY environment variable not found. Vision model functionality will be disabled.")
-            self.vision_client = None
-        else:
-            self.vision_client = genai.Client(api_key=gemini_api_key)
-        
-        bbc_cookie_file = 'www.bbcgoodfood.com_cookies.txt'
-        try:
-            if os.path.exists(bbc_cookie_file):
-                cookie_jar = http.cookiejar.MozillaCookieJar(bbc_cookie_file)
-                cookie_jar.load(ignore_discard=True, ignore_expires=True)
-                self.session.cookies.update(cookie_jar)
-                print(f"Successfully loaded cookies from {bbc_cookie_file} for requests session.")
-            else:
-                print(f"Warning: BBC cookie file not found at {bbc_cookie_file}. Scraping may fail.")
-        except Exception as e:
-            print(f"Warning: Failed to load cookies from {bbc_cookie_file}. Error: {e}")
-        
+
+        # Both clients are created on first use (see ai_client / vision_client)
+        self._ai_client = None
+        self._vision_client = None
+        self._client_lock = threading.Lock()
         
         self.storage = storage
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.parse_cache = parse_cache
+        self.image_pipeline = image_pipeline or ImagePipeline(workers=0)
+        self.vision_cache = vision_cache
+        self.analytics = analytics
+
+        # Transcripts are cached per video id; YOUTUBE_CACHE_TTL_SECONDS=0 disables reuse
+        self.youtube = YouTubeTranscriber(
+            self.session,
+            ttl_seconds=int(os.getenv('YOUTUBE_CACHE_TTL_SECONDS', str(6 * 3600))),
+            max_entries=int(os.getenv('YOUTUBE_CACHE_ENTRIES', '256')),
+            timeout=float(os.getenv('SUBTITLE_TIMEOUT_SECONDS', '10'))
+        )
+
+    @property
+    def ai_client(self):
+        """Groq client (OpenAI-compatible API), created with the first text parse."""
+        if self._ai_client is None:
+            with self._client_lock:
+                if self._ai_client is None:
+                    import openai
+                    self._ai_client = openai.OpenAI(
+                        api_key=self.groq_api_key,
+                        base_url="https://api.groq.com/openai/v1"
+                    )
+        return self._ai_client
+
+    @property
+    def vision_client(self):
+        """Gemini client, created with the first vision request; None without GEMINI_API_KEY."""
+        if self._vision_client is None and self.gemini_api_key:
+            with self._client_lock:
+                if self._vision_client is None:
+                    from google import genai
+                    self._vision_client = genai.Client(api_key=self.gemini_api_key)
+        return self._vision_client
     
  
     def is_youtube_url(self, url):
         youtube_patterns = [
-            r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/)',
+            r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/|youtube\.com/shorts/)',
             r'youtube\.com.*[?&]v=',
             r'youtu\.be/'
         ]
         return any(re.search(pattern, url, re.IGNORECASE) for pattern in youtube_patterns)
     
     def extract_youtube_transcript(self, url):
-        try:
-            cookie_file_path = 'youtube_cookies.txt'
-            ydl_opts = {
-                'writesubtitles': True,
-                'writeautomaticsub': True,
-                'subtitleslangs': ['en', 'en-US', 'en-GB'],
-                'skip_download': True,
-                'no_warnings': True,
-                'cookiefile': cookie_file_path
-            }
-            if not os.path.exists(cookie_file_path):
-                print(f"Warning: Cookie file not found at {cookie_file_path}. Authentication may fail.")
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                title = info.get('title', 'YouTube Recipe')
-                duration = info.get('duration', 0)
-                
-                subtitles = info.get('subtitles', {}) or info.get('automatic_captions', {})
-                transcript_text = ""
-                
-                for lang in ['en', 'en-US', 'en-GB', 'a.en']:
-                    if lang in subtitles:
-                        for subtitle in subtitles[lang]:
-                            if subtitle.get('ext') == 'vtt':
-                                try:
-                                    subtitle_response = requests.get(subtitle['url'])
-                                    vtt_content = subtitle_response.text
-                                    transcript_text = self.parse_vtt_content(vtt_content)
-                                    break
-                                except:
-                                    continue
-                            if transcript_text:
-                                break
-                
-                if not transcript_text:
-                    transcript_text = info.get('description', '')
-                
-                return {
-                    "url": url,
-                    "title": title,
-                    "duration": duration,
-                    "content": transcript_text,
-                    "type": "youtube_video",
-                    "scraped_at": datetime.now().isoformat()
-                }
-                
-        except Exception:
-            return None
+        return self.youtube.transcript(url)
     
     def parse_vtt_content(self, vtt_content):
-        lines = vtt_content.split('\n')
-        text_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if (not line or 
-                line.startswith('WEBVTT') or 
-                line.startswith('NOTE') or
-                '-->' in line or
-                re.match(r'^\d+$', line)):
-                continue
-            
-            line = re.sub(r'<[^>]+>', '', line)
-            line = re.sub(r'&\w+;', '', line)
-            
-            if line:
-                text_lines.append(line)
-        
-        return ' '.join(text_lines)
+        return parse_vtt(vtt_content)
     
     def extract_recipe_sections(self, content):
-        lines = content.split('\n')
-        ingredients_section = []
-        instructions_section = []
-        
-        in_ingredients = False
-        in_instructions = False
-        
-        for line in lines:
-            line = line.strip()
-            
-            if re.search(r'\bingredients?\b', line, re.IGNORECASE) and len(line) < 100:
-                in_ingredients = True
-                in_instructions = False
-                continue
-            
-            if re.search(r'\b(instructions?|method|directions?|steps?)\b', line, re.IGNORECASE) and len(line) < 100:
-                in_instructions = True
-                in_ingredients = False
-                continue
-            
-            if in_ingredients:
-                if re.search(r'\b(method|instructions?|directions?|steps?|nutrition|notes)\b', line, re.IGNORECASE):
-                    in_ingredients = False
-                    in_instructions = 'instructions' in line.lower() or 'method' in line.lower()
-                    continue
-                
-                if line and not line.startswith(('▢', '•', '-', '*')):
-                    if any(indicator in line.lower() for indicator in ['g ', 'ml', 'tbsp', 'tsp', 'cup', 'oz', 'lb', 'clove', 'onion', 'garlic']):
-                        ingredients_section.append(line)
-                elif line.startswith(('▢', '•', '-', '*')):
-                    ingredients_section.append(line[1:].strip())
-            
-            if in_instructions:
-                if re.search(r'\b(nutrition|notes|tips|faq)\b', line, re.IGNORECASE):
-                    in_instructions = False
-                    continue
-                
-                if line:
-                    if (re.match(r'^\d+\.?\s+', line) or 
-                        line.lower().startswith('step') or
-                        any(action in line.lower() for action in ['cook', 'add', 'heat', 'stir', 'mix', 'drain', 'serve', 'fry', 'bake'])):
-                        instructions_section.append(line)
-        
-        return {
-            'ingredients': ingredients_section,
-            'instructions': instructions_section
-        }
+        return extract_recipe_sections(content)
     
     def scrape_url(self, url):
+        """Fetches a page or video transcript; the result carries the time taken as 'fetch_ms'."""
+        started = time.monotonic()
+        with stage_timer('youtube' if self.is_youtube_url(url) else 'fetch'):
+            scraped_data = self._scrape_url(url)
+        if scraped_data:
+            scraped_data['fetch_ms'] = round((time.monotonic() - started) * 1000)
+        return scraped_data
+
+    def _scrape_url(self, url):
         if self.is_youtube_url(url):
             return self.extract_youtube_transcript(url)
         
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+            # Streamed and size-capped; non-HTML responses are refused before download
+            page = extract_page(fetch_html(self.session, url, cache=self.http_cache))
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            for element in soup(["script", "style", "nav", "header", "footer"]):
-                element.decompose()
-            
-            structured_recipe = self.extract_structured_data(soup)
-            
-            title = soup.find('title')
-            page_title = title.get_text().strip() if title else ""
-            
-            text_content = soup.get_text()
-            lines = (line.strip() for line in text_content.splitlines())
-            text_content = '\n'.join(line for line in lines if line)
+            structured_recipe = self.extract_structured_data_from_blocks(page['jsonld'])
+            text_content = page['text']
             
             recipe_sections = self.extract_recipe_sections(text_content)
             
             return {
                 "url": url,
-                "title": page_title,
+                "title": page['title'],
                 "content": text_content[:15000],
                 "structured_data": structured_recipe,
                 "recipe_sections": recipe_sections,
                 "scraped_at": datetime.now().isoformat()
             }
             
+        except PageRejected as e:
+            print(f"Skipping {url}: {e}")
+            return None
         except Exception:
             return None
     
     def extract_structured_data(self, soup):
         scripts = soup.find_all('script', type='application/ld+json')
-        for script in scripts:
+        return self.extract_structured_data_from_blocks(script.string for script in scripts)
+
+    def extract_structured_data_from_blocks(self, blocks):
+        """Returns the first schema.org Recipe found in raw JSON-LD script bodies."""
+        for block in blocks:
             try:
-                data = json.loads(script.string)
-                if isinstance(data, list):
-                    data = data[0]
-                if data.get('@type') == 'Recipe' or 'Recipe' in str(data.get('@type', '')):
-                    return data
+                recipe = self.find_jsonld_recipe(json.loads(block))
+                if recipe:
+                    return recipe
             except:
                 continue
         return None
 
-    def parse_with_ai(self, scraped_data):
+    def find_jsonld_recipe(self, data):
+        """Finds the schema.org Recipe node in JSON-LD, looking through lists and @graph."""
+        if isinstance(data, list):
+            for item in data:
+                found = self.find_jsonld_recipe(item)
+                if found:
+                    return found
+            return None
+        if not isinstance(data, dict):
+            return None
+        node_type = data.get('@type', '')
+        if node_type == 'Recipe' or (isinstance(node_type, list) and 'Recipe' in node_type):
+            return data
+        if '@graph' in data:
+            return self.find_jsonld_recipe(data['@graph'])
+        return None
+
+    def flatten_jsonld_instructions(self, instructions):
+        """
+        Flattens recipeInstructions into a list of step strings. Handles plain
+        strings, lists of strings, HowToStep objects and HowToSection objects
+        (whose itemListElement steps are inlined in order).
+        """
+        if not instructions:
+            return []
+        if isinstance(instructions, str):
+            text = html.unescape(re.sub(r'<[^>]+>', '\n', instructions))
+            return [line.strip() for line in text.split('\n') if line.strip()]
+        if isinstance(instructions, dict):
+            if instructions.get('@type') == 'HowToSection' or 'itemListElement' in instructions:
+                return self.flatten_jsonld_instructions(instructions.get('itemListElement'))
+            text = instructions.get('text') or instructions.get('name') or ''
+            return self.flatten_jsonld_instructions(text)
+        steps = []
+        for item in instructions:
+            steps.extend(self.flatten_jsonld_instructions(item))
+        return steps
+
+    def format_structured_recipe(self, scraped_data):
+        """
+        Deterministic fast path: builds the recipe Markdown straight from a
+        complete schema.org Recipe (name, ingredients and instructions), with
+        metric conversion. Returns None when the structured data is missing or
+        incomplete, in which case the caller falls back to the LLM.
+        """
+        structured = scraped_data.get('structured_data')
+        if not isinstance(structured, dict):
+            return None
+
+        name = html.unescape(str(structured.get('name') or '')).strip()
+        raw_ingredients = structured.get('recipeIngredient') or structured.get('ingredients') or []
+        if isinstance(raw_ingredients, str):
+            raw_ingredients = [raw_ingredients]
+        ingredients = [
+            ingredient_to_metric(html.unescape(re.sub(r'<[^>]+>', '', str(item))))
+            for item in raw_ingredients if str(item).strip()
+        ]
+        steps = [fahrenheit_to_celsius(step) for step in
+                 self.flatten_jsonld_instructions(structured.get('recipeInstructions'))]
+
+        # Anything less is likely a teaser or a broken schema; let the LLM read the page
+        if not name or len(ingredients) < 2 or not steps:
+            return None
+
+        formatted_ingredients = '\n'.join(f'• {ingredient}' for ingredient in ingredients)
+        formatted_steps = '\n'.join(f'{i + 1}. {step}' for i, step in enumerate(steps))
+        return f"""# {name}
+
+**Ingredients:**
+{formatted_ingredients}
+
+**Method:**
+{formatted_steps}"""
+
+    @staticmethod
+    def _total_tokens(usage):
+        if usage is None:
+            return None
+        if isinstance(usage, dict):
+            return usage.get('total_tokens')
+        return getattr(usage, 'total_tokens', None)
+
+    def parse_with_ai(self, scraped_data, on_token=None, usage=None, on_reset=None):
+        """
+        Extracts the recipe Markdown with the LLM. When `on_token(text)` is given
+        the completion is streamed and each chunk is passed to it as it arrives;
+        the full text is still returned once the stream ends. If the model call
+        fails, `on_reset()` is called to discard what was streamed and the
+        fallback text is streamed in its place. If a `usage` dict is given, the
+        model's token count is stored in it as 'tokens'.
+        """
         import json
 
         content_text = scraped_data.get('content', '').strip()
@@ -563,36 +715,84 @@ class RecipeScraper:
     {content_text}
     """
 
-        # Step 5: Call AI model (Groq)
-        try:
-            response = self.ai_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a recipe extraction expert specializing in converting cooking content into clean, minimalist, metric-based recipes. Your priority is capturing ALL cooking steps and ingredients without omission. Focus on thoroughness and accuracy."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0,
-                max_tokens=5000,
-                stream=False
+        model = "llama-3.3-70b-versatile"
+        system_prompt = "You are a recipe extraction expert specializing in converting cooking content into clean, minimalist, metric-based recipes. Your priority is capturing ALL cooking steps and ingredients without omission. Focus on thoroughness and accuracy."
+
+        # Step 5: Reuse an earlier parse of identical content (any user, any URL).
+        # The URL line is left out of the key; the model is told not to echo it.
+        cache_key = None
+        if self.parse_cache:
+            cache_key = self.parse_cache.make_key(
+                model, system_prompt, prompt.replace(f"URL: {scraped_data.get('url', 'N/A')}", '')
             )
-            ai_response = response.choices[0].message.content.strip()
+            cached = self.parse_cache.get(cache_key)
+            if cached:
+                print("AI parse cache hit")
+                if on_token:
+                    on_token(cached)
+                return cached
+
+        # Step 6: Call AI model (Groq); a streamed call is timed until its last chunk
+        try:
+            tokens = None
+            with external_timer('groq', 'chat_completion'):
+                response = self.ai_client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": system_prompt
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0,
+                    max_tokens=5000,
+                    stream=bool(on_token)
+                )
+                if on_token:
+                    chunks = []
+                    for chunk in response:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            chunks.append(delta)
+                            on_token(delta)
+                        # Groq reports usage on the final chunk, under x_groq
+                        x_groq = getattr(chunk, 'x_groq', None)
+                        chunk_usage = getattr(chunk, 'usage', None) or (
+                            x_groq.get('usage') if isinstance(x_groq, dict) else getattr(x_groq, 'usage', None))
+                        if chunk_usage:
+                            tokens = self._total_tokens(chunk_usage)
+                    ai_response = ''.join(chunks).strip()
+                else:
+                    ai_response = response.choices[0].message.content.strip()
+                    tokens = self._total_tokens(getattr(response, 'usage', None))
+            count_tokens('groq', tokens)
+            if usage is not None:
+                usage['tokens'] = tokens
+            if cache_key and ai_response and ai_response != "NO_RECIPE_FOUND":
+                self.parse_cache.put(cache_key, model, ai_response)
             return ai_response
 
         except Exception as e:
             print("AI parsing (text) failed:", str(e))
-            return self.fallback_parse(scraped_data)    
-
-    def parse_with_vision(self, image_bytes_list, text_prompt=""):
+            fallback = self.fallback_parse(scraped_data)
+            if on_token:
+                # The client may hold part of the failed completion; replace it with what is returned
+                if on_reset:
+                    on_reset()
+                if fallback:
+                    on_token(fallback)
+            return fallback
+
+    def parse_with_vision(self, image_sources, text_prompt="", usage=None):
         if not self.vision_client:
             return "NO_RECIPE_FOUND" # Vision is disabled due to missing key
 
         try:
+            from google.genai import types
             user_messages = []
             
             # 1. Build the prompt (text part)
@@ -627,61 +827,46 @@ EXTRACTION RULES:
             # 2. Prepare the multimodal content list: Process images first.
             content_parts = []
             
-            # Add the images first
-            for image_bytes in image_bytes_list:
-                if not image_bytes:
-                    continue
-                
-                # --- START: ROBUST IMAGE PROCESSING (Handles any format) ---
-                processed_image_bytes = None
-                mime_type = 'image/jpeg' 
-                
-                try:
-                    from io import BytesIO
-                    
-                    # Open the image (PIL handles PNG, JPEG, WebP, etc., automatically)
-                    img = Image.open(BytesIO(image_bytes))
-                    
-                    # Fix Orientation (Crucial for mobile photos)
-                    img = ImageOps.exif_transpose(img) 
-
-                    # Convert to RGB if necessary (Standardizes color space)
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                        
-                    # Re-save the image to a standardized format (JPEG)
-                    buffer = BytesIO()
-                    img.save(buffer, format='JPEG', quality=90) # Re-encode to clean JPEG
-                    processed_image_bytes = buffer.getvalue()
-                    
-                    # The image is now a clean JPEG in standard format
-                    
-                except Exception as e:
-                    # Log the specific image error but continue if possible
-                    print(f"Error processing uploaded image file in PIL: {e}")
-                    # If we can't process it, we must skip it.
-                    continue 
-                
-                if processed_image_bytes:
-                    content_parts.append(
-                        types.Part.from_bytes(data=processed_image_bytes, mime_type=mime_type)
-                    )
-                # --- END: ROBUST IMAGE PROCESSING ---
+            # Add the images first: decoded, orientation-fixed, downscaled and
+            # re-encoded as JPEG in parallel on the image process pool
+            with stage_timer('image_prepare'):
+                processed_images, report = self.image_pipeline.process(image_sources)
+            print(f"Prepared {report['images']} image(s) for the vision model: "
+                  f"{report['original_bytes']} -> {report['processed_bytes']} bytes "
+                  f"({report['bytes_saved']} saved)")
+            for processed_image_bytes in processed_images:
+                content_parts.append(
+                    types.Part.from_bytes(data=processed_image_bytes, mime_type='image/jpeg')
+                )
                 
             if not content_parts:
                  return "NO_RECIPE_FOUND" # No valid image files could be processed
+
+            # Near-duplicate photos of a page already extracted (by anyone) reuse that result
+            if self.vision_cache:
+                cached = self.vision_cache.lookup(report['hashes'], text_prompt)
+                if cached:
+                    print("Vision cache hit: near-duplicate upload")
+                    return cached
                  
             # Add the text prompt
             content_parts.append(main_prompt)
 
 
             # 3. Call the Gemini Vision Model
-            response = self.vision_client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=content_parts
-            )
+            with external_timer('gemini', 'generate_content'):
+                response = self.vision_client.models.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=content_parts
+                )
             
             ai_response = response.text.strip()
+            tokens = response.usage_metadata.total_token_count if getattr(response, 'usage_metadata', None) else None
+            count_tokens('gemini', tokens)
+            if usage is not None:
+                usage['tokens'] = tokens
+            if self.vision_cache and ai_response and ai_response != "NO_RECIPE_FOUND":
+                self.vision_cache.put(report['hashes'], text_prompt, ai_response)
             return ai_response
 
         except Exception as e:
@@ -748,15 +933,52 @@ EXTRACTION RULES:
 # In class RecipeScraper:
     # In class RecipeScraper:
     
-    def scrape_and_save(self, url, user_id):
+    def scrape_and_save(self, url, user_id, on_progress=None, on_token=None, on_reset=None):
+        # on_progress(message) lets a background job report which stage it is in;
+        # on_token/on_reset relay the Markdown as the model writes it (see build_recipe)
+        progress = on_progress or (lambda message: None)
+
+        progress("Fetching page")
         scraped_data = self.scrape_url(url)
         if not scraped_data or not scraped_data.get('content'):
+            self.record_scrape(url, user_id, 'failed', scraped_data)
             return {"status": "failed", "error": "Failed to scrape URL", "url": url}
 
+        progress("Extracting recipe with AI")
+        built = self.build_recipe(scraped_data, on_token=on_token, on_reset=on_reset)
+        if built.get("status") == "failed":
+            self.record_scrape(url, user_id, 'failed', scraped_data)
+            return built
+
+        progress("Saving recipe")
+        return self.save_built_recipe(built, user_id)
+
+    def build_recipe(self, scraped_data, on_token=None, on_reset=None):
+        """
+        AI stage of the pipeline: turns scraped data into the final Markdown.
+        Returns {"status": "built", "url", "content", "recipe_name"} or a failed result.
+        Touches neither storage nor the database, so it is safe to run on any thread.
+        `on_token(text)` receives the partial Markdown as the model streams it;
+        `on_reset()` means the text streamed so far is void (see parse_with_ai).
+        A built result also carries 'fetch_ms', 'parse_ms' and 'tokens' for analytics.
+        """
+        url = scraped_data.get('url')
         ai_response = None 
+        usage = {}
+        started = time.monotonic()
         try:
-            ai_response = self.parse_with_ai(scraped_data)
-            print("AI Response:", repr(ai_response))
+            # Complete JSON-LD needs no model call at all
+            with stage_timer('structured'):
+                ai_response = self.format_structured_recipe(scraped_data)
+            if ai_response:
+                print("Built recipe from structured data; skipping AI parsing")
+                if on_token:
+                    on_token(ai_response)
+            else:
+                with stage_timer('ai_parse'):
+                    ai_response = self.parse_with_ai(scraped_data, on_token=on_token, usage=usage,
+                                                     on_reset=on_reset)
+                print("AI Response:", repr(ai_response))
         except Exception as e:
             print(f"An error occurred during AI parsing: {str(e)}")
             traceback.print_exc()
@@ -765,7 +987,8 @@ EXTRACTION RULES:
         if not ai_response or ai_response.strip() == "NO_RECIPE_FOUND":
             return {"status": "failed", "error": "AI failed to extract recipe", "url": url}
 
-        markdown_content = self.create_markdown(ai_response, scraped_data)
+        with stage_timer('markdown'):
+            markdown_content = self.create_markdown(ai_response, scraped_data)
         if not markdown_content or len(markdown_content.strip()) < 10:
             return {"status": "failed", "error": "Failed to format recipe content", "url": url}
 
@@ -774,37 +997,423 @@ EXTRACTION RULES:
         if first_line.startswith('# '):
             recipe_name = first_line[2:].strip()
 
+        return {
+            "status": "built",
+            "url": url,
+            "content": markdown_content,
+            "recipe_name": recipe_name,
+            "fetch_ms": scraped_data.get('fetch_ms'),
+            "parse_ms": round((time.monotonic() - started) * 1000),
+            "tokens": usage.get('tokens')
+        }
+
+    def record_scrape(self, url, user_id, status, timings=None, source=None):
+        """
+        Logs one scrape (or vision extraction) as an analytics event. `timings`
+        is the scraped or built dict carrying 'fetch_ms', 'parse_ms' and 'tokens'.
+        """
+        if not self.analytics:
+            return
+        timings = timings or {}
+        stages = [timings[key] for key in ('fetch_ms', 'parse_ms') if timings.get(key) is not None]
+        self.analytics.record('scrape', user_id, source=source or source_domain(url), status=status,
+                              latency_ms=sum(stages) if stages else None, tokens=timings.get('tokens'))
+
+    def save_built_recipe(self, built, user_id):
+        """Storage stage of the pipeline: saves a `build_recipe` result for `user_id`."""
+        url = built['url']
         domain = urlparse(url).netloc.replace('www.', '').replace('/', '_')
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Microseconds keep filenames unique when several scrapes of one site finish together
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
         filename = f"recipe_{domain}_{timestamp}.md"
         print("Saving to S3:", filename, "for user:", user_id)
 
-        save_success = self.storage.save_recipe(
-            filename, 
-            markdown_content, 
-            recipe_name, 
-            user_id  # <--- Passes user_id
-        )
+        with stage_timer('save'):
+            save_success = self.storage.save_recipe(
+                filename, 
+                built['content'], 
+                built['recipe_name'], 
+                user_id,  # <--- Passes user_id
+                source=urlparse(url).netloc.replace('www.', '')
+            )
         
+        self.record_scrape(url, user_id, 'success' if save_success else 'failed', built)
         if not save_success:
             return {"status": "failed", "error": "Failed to save recipe to S3", "url": url}
 
         return {
             "status": "success",
             "filename": filename,
-            "recipe_name": recipe_name,
+            "recipe_name": built['recipe_name'],
             "url": url,
-            "content": markdown_content,
+            "content": built['content'],
             "created": datetime.now().isoformat()
         }
     
 
-try:
-    storage = S3Storage()
-    scraper = RecipeScraper(storage)
-except ValueError as e:
-    print(f"Configuration error: {e}")
-    exit(1)
+def build_services():
+    """
+    Builds storage, the catalog and its indexes, the caches and the scraper
+    from the environment. Nothing here contacts S3, the AI providers or the
+    database: clients connect on first use. Raises ValueError for a missing
+    or invalid setting.
+    """
+    storage = create_storage()
+    # Read-through cache for recipe bodies; RECIPE_CACHE_MAX_BYTES=0 disables it
+    recipe_cache_bytes = int(os.getenv('RECIPE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    if recipe_cache_bytes > 0:
+        storage = CachedStorage(
+            storage,
+            max_bytes=recipe_cache_bytes,
+            revalidate_after=int(os.getenv('RECIPE_CACHE_REVALIDATE_SECONDS', '0'))
+        )
+    search_index = RecipeSearchIndex(db)
+    usage_analytics = UsageAnalytics(db)
+    catalog = RecipeCatalog(storage, search_index=search_index, ingredient_index=IngredientIndex(db),
+                            analytics=usage_analytics)
+
+    # Content-addressed cache of Groq parse results; AI_CACHE_TTL_HOURS=0 disables it
+    parse_cache = None
+    ai_cache_ttl_hours = float(os.getenv('AI_CACHE_TTL_HOURS', '168'))
+    if ai_cache_ttl_hours > 0:
+        parse_cache = ParseResultCache(
+            os.getenv('AI_CACHE_PATH', os.path.join(app.instance_path, 'ai_parse_cache.sqlite3')),
+            ttl_seconds=ai_cache_ttl_hours * 3600,
+            max_bytes=int(os.getenv('AI_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        )
+
+    # Validators of fetched pages, for conditional re-scrapes; HTTP_CACHE_MAX_BYTES=0 disables it
+    http_cache = None
+    http_cache_bytes = int(os.getenv('HTTP_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+    if http_cache_bytes > 0:
+        http_cache = HttpCache(
+            os.getenv('HTTP_CACHE_PATH', os.path.join(app.instance_path, 'http_cache.sqlite3')),
+            max_bytes=http_cache_bytes
+        )
+
+    # Vision uploads are decoded and downscaled on a process pool; VISION_IMAGE_WORKERS=0 runs inline
+    image_pipeline = ImagePipeline(
+        workers=int(os.getenv('VISION_IMAGE_WORKERS', '2')),
+        max_side=int(os.getenv('VISION_IMAGE_MAX_SIDE', '2048'))
+    )
+
+    # Perceptual-hash cache of vision results; VISION_CACHE_TTL_HOURS=0 disables it
+    vision_cache = None
+    vision_cache_ttl_hours = float(os.getenv('VISION_CACHE_TTL_HOURS', '720'))
+    if vision_cache_ttl_hours > 0:
+        vision_cache = VisionResultCache(
+            os.getenv('VISION_CACHE_PATH', os.path.join(app.instance_path, 'vision_cache.sqlite3')),
+            ttl_seconds=vision_cache_ttl_hours * 3600,
+            max_bytes=int(os.getenv('VISION_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+            max_distance=int(os.getenv('VISION_CACHE_MAX_DISTANCE', '6'))
+        )
+
+    scraper = RecipeScraper(catalog, parse_cache=parse_cache, http_cache=http_cache,
+                            image_pipeline=image_pipeline, vision_cache=vision_cache,
+                            analytics=usage_analytics)
+    return SimpleNamespace(storage=storage, search_index=search_index, usage_analytics=usage_analytics,
+                           catalog=catalog, parse_cache=parse_cache, http_cache=http_cache,
+                           image_pipeline=image_pipeline, vision_cache=vision_cache, scraper=scraper)
+
+
+_services = None
+_services_lock = threading.Lock()
+
+
+def get_services():
+    """The process's services, built by the first caller (a request, job or CLI command)."""
+    global _services
+    if _services is None:
+        with _services_lock:
+            if _services is None:
+                _services = build_services()
+    return _services
+
+
+def _service(name):
+    return LocalProxy(lambda: getattr(get_services(), name))
+
+
+# Module-level names the routes use; each resolves to the shared service on first access
+storage = _service('storage')
+search_index = _service('search_index')
+usage_analytics = _service('usage_analytics')
+catalog = _service('catalog')
+parse_cache = _service('parse_cache')
+http_cache = _service('http_cache')
+image_pipeline = _service('image_pipeline')
+vision_cache = _service('vision_cache')
+scraper = _service('scraper')
+
+
+def collect_cache_metrics():
+    """Hit ratios and lookup counts of every cache, plus image pipeline byte totals, for /metrics."""
+    caches = []
+    if isinstance(storage, CachedStorage):
+        caches.append(('recipe_body', storage.stats()))
+    if parse_cache:
+        caches.append(('ai_parse', parse_cache.stats()))
+    if vision_cache:
+        caches.append(('vision', vision_cache.stats()))
+    caches.append(('youtube', scraper.youtube.stats()))
+    if http_cache:
+        http_stats = http_cache.stats()
+        # A 304 re-scrape is the HTTP cache's "hit"
+        caches.append(('http', {'hits': http_stats['not_modified'], 'misses': http_stats['downloaded'],
+                                'hit_ratio': http_stats['not_modified_ratio']}))
+
+    values = []
+    for name, stats in caches:
+        values.append(('cache_hit_ratio', {'cache': name}, stats['hit_ratio']))
+        values.append(('cache_lookups_total', {'cache': name, 'result': 'hit'}, stats['hits']))
+        values.append(('cache_lookups_total', {'cache': name, 'result': 'miss'}, stats['misses']))
+    image_stats = image_pipeline.stats()
+    values.append(('vision_images_total', {}, image_stats['images']))
+    values.append(('vision_image_bytes_total', {'stage': 'original'}, image_stats['original_bytes']))
+    values.append(('vision_image_bytes_total', {'stage': 'processed'}, image_stats['processed_bytes']))
+    return values
+
+
+def collect_job_metrics():
+    """Number of background jobs waiting and running (read from the job table's status index)."""
+    counts = dict(db.session.query(Job.status, db.func.count(Job.id))
+                  .filter(Job.status.in_(('queued', 'running')))
+                  .group_by(Job.status))
+    return [('background_jobs', {'status': status}, counts.get(status, 0)) for status in ('queued', 'running')]
+
+
+metrics_registry.add_collector(collect_cache_metrics)
+metrics_registry.add_collector(collect_job_metrics)
+
+# Shared by every worker on the host: sessions started on one worker are picked up by all of them
+request_profiler = RequestProfiler(
+    app,
+    os.getenv('PROFILER_DIR', os.path.join(app.instance_path, 'profiling')),
+    poll_interval=float(os.getenv('PROFILER_POLL_SECONDS', '2.0')),
+    keep_sessions=int(os.getenv('PROFILER_KEEP_SESSIONS', '5'))
+)
+
+
+job_queue = JobQueue(
+    app,
+    worker_count=int(os.getenv('SCRAPE_WORKERS', '2')),
+    poll_interval=float(os.getenv('JOB_POLL_SECONDS', '1.0'))
+)
+
+
+class DraftPublisher:
+    """
+    Publishes a scrape job's stage and the Markdown streamed so far as the
+    job's progress and partial result ({"draft", "resets"}), writing at most
+    once every `interval` seconds while tokens arrive.
+    /api/scrape/stream relays these to the browser.
+    """
+    def __init__(self, progress, interval=0.5):
+        self.progress = progress
+        self.interval = interval
+        self.message = 'Queued'
+        self.draft = ''
+        self.resets = 0
+        self.published = 0.0
+
+    def status(self, message):
+        self.message = message
+        self.publish(force=True)
+
+    def token(self, text):
+        self.draft += text
+        self.publish()
+
+    def reset(self):
+        self.draft = ''
+        self.resets += 1
+        self.publish(force=True)
+
+    def publish(self, force=False):
+        now = time.monotonic()
+        if force or now - self.published >= self.interval:
+            self.published = now
+            self.progress(self.message, {'draft': self.draft, 'resets': self.resets})
+
+
+def run_scrape_job(job, payload, progress):
+    if not payload.get('stream'):
+        return scraper.scrape_and_save(payload['url'], job.user_id, on_progress=progress)
+    draft = DraftPublisher(progress)
+    return scraper.scrape_and_save(payload['url'], job.user_id, on_progress=draft.status,
+                                   on_token=draft.token, on_reset=draft.reset)
+
+
+job_queue.register('scrape', run_scrape_job)
+
+bulk_importer = BulkImporter(
+    scraper,
+    fetch_workers=int(os.getenv('BULK_IMPORT_FETCH_WORKERS', '8')),
+    ai_workers=int(os.getenv('BULK_IMPORT_AI_WORKERS', '4')),
+    per_domain=int(os.getenv('BULK_IMPORT_PER_DOMAIN', '2')),
+    domain_interval=float(os.getenv('BULK_IMPORT_DOMAIN_INTERVAL', '1.0'))
+)
+job_queue.register('reconcile-counts', lambda job, payload, progress: catalog.reconcile_counts())
+# RECIPE_COUNT_RECONCILE_HOURS=0 disables the periodic check against storage
+recipe_count_reconcile_hours = float(os.getenv('RECIPE_COUNT_RECONCILE_HOURS', '6'))
+if recipe_count_reconcile_hours > 0:
+    job_queue.schedule('reconcile-counts', recipe_count_reconcile_hours * 3600)
+
+job_queue.register('prune-jobs',
+                   lambda job, payload, progress: job_queue.prune(timedelta(days=payload['days'])))
+# Finished jobs are deleted once they are JOB_RETENTION_DAYS old (0 keeps them forever)
+job_retention_days = float(os.getenv('JOB_RETENTION_DAYS', '7'))
+if job_retention_days > 0:
+    job_queue.schedule('prune-jobs', 24 * 3600, {'days': job_retention_days})
+
+job_queue.register(
+    'import',
+    lambda job, payload, progress: bulk_importer.run(
+        payload['urls'], job.user_id,
+        report=lambda summary: progress(
+            f"{summary['succeeded'] + summary['failed']}/{summary['total']} processed", summary),
+        # A job reclaimed from a dead worker resumes from the summary it last published
+        previous=json.loads(job.result) if job.result else None
+    )
+)
+
+
+_startup_checks = threading.Event()
+
+
+def run_startup_checks():
+    """
+    Checks that need the network or the database, run once per process in
+    the background after the first request instead of at import: the
+    search index schema (the migration normally creates it) and the
+    storage connection. Failures are logged; the affected feature reports
+    errors when used.
+    """
+    with app.app_context():
+        try:
+            search_index.ensure_schema()
+        except Exception as e:
+            print(f"Full-text search is unavailable: {e}")
+    try:
+        storage.check()
+    except ValueError as e:
+        print(f"Storage check failed: {e}")
+
+
+@app.before_request
+def start_job_workers():
+    # Workers start with the first request so CLI commands (db upgrade, backfill) don't spawn them
+    job_queue.ensure_started()
+    request_profiler.ensure_watching()
+    if not _startup_checks.is_set():
+        _startup_checks.set()
+        threading.Thread(target=run_startup_checks, name='startup-checks', daemon=True).start()
+
+
+@app.cli.command('scrape-worker')
+def scrape_worker_command():
+    """Runs background scrape workers in the foreground (use with SCRAPE_WORKERS=0 on the web process)."""
+    print(f"Processing background jobs with {max(1, job_queue.worker_count)} worker thread(s). Ctrl+C to stop.")
+    job_queue.run_forever()
+
+
+@app.cli.command('reindex-search')
+def reindex_search_command():
+    """Rebuilds the full-text search and ingredient indexes from the recipes in storage."""
+    indexed, skipped = catalog.reindex_search()
+    print(f"Search and ingredient indexes rebuilt: {indexed} recipes indexed, {skipped} missing from storage.")
+
+
+@app.cli.command('reconcile-counts')
+def reconcile_counts_command():
+    """Resets the per-user recipe counters from the recipes actually in storage."""
+    result = catalog.reconcile_counts()
+    if result.get('status') == 'failed':
+        print(f"Recipe count reconcile failed: {result['error']}")
+        return
+    print(f"Recipe counts reconciled for {result['users']} users: "
+          f"{result['corrected']} corrected, {result['skipped']} changed during the run.")
+
+
+def init_database():
+    """
+    Brings the schema up to date (inside an app context) and says what was
+    done. The early migrations assume tables the app used to create at
+    startup, so an empty database gets every table from the models and is
+    stamped at the latest revision; a database under migration control is
+    upgraded. Tables from before migrations were used, with no revision
+    recorded, only get the tables they are missing.
+    """
+    from flask_migrate import stamp, upgrade
+    from sqlalchemy import inspect
+    tables = set(inspect(db.engine).get_table_names())
+    if 'alembic_version' in tables:
+        upgrade()
+        return "Database upgraded to the latest migration."
+    db.create_all()
+    RecipeSearchIndex(db).ensure_schema()
+    if tables:
+        return ("Missing tables created. This database has no migration revision: run "
+                "`flask db stamp <revision>` for the schema it has, then `flask init-db` again.")
+    stamp()
+    return "Database created and stamped at the latest migration."
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Creates or upgrades the database schema; run before starting the app and after each deploy."""
+    print(init_database())
+
+
+@app.cli.command('backfill-recipes')
+def backfill_recipes_command():
+    """Imports every recipe already in S3 into the recipe catalog."""
+    imported, skipped = catalog.backfill()
+    print(f"Recipe catalog backfill complete: {imported} imported, {skipped} skipped.")
+
+
+def get_page_args():
+    """Reads ?limit= and ?cursor= from the query string, clamping the limit."""
+    try:
+        limit = int(request.args.get('limit', RECIPE_PAGE_SIZE))
+    except ValueError:
+        limit = RECIPE_PAGE_SIZE
+    limit = max(1, min(limit, MAX_RECIPE_PAGE_SIZE))
+    return limit, request.args.get('cursor') or None
+
+
+def listing_etag(items, next_cursor):
+    """Strong ETag for a listing page, derived from the catalog row versions it contains."""
+    digest = hashlib.sha1((next_cursor or '').encode('utf-8'))
+    for item in items:
+        digest.update(f"|{item['user_id']}/{item['filename']}@{item['updated']}#{item.get('owner_username', '')}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def not_modified_response(etag, headers=None):
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    for name, value in (headers or {}).items():
+        response.headers[name] = value
+    return response
+
+
+def paged_response(items, next_cursor):
+    """
+    JSON array response; the cursor for the next page travels in X-Next-Cursor.
+    Answers 304 when the client's If-None-Match still matches the page.
+    """
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+    etag = listing_etag(items, next_cursor)
+    if request.if_none_match.contains(etag):
+        return not_modified_response(etag, headers)
+    response = jsonify(items)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    for name, value in headers.items():
+        response.headers[name] = value
+    return response
 
 
 @login_manager.user_loader
@@ -823,21 +1432,30 @@ def dashboard():
     recipes = []
     user_recipe_counts = {}
 
+    limit, cursor = get_page_args()
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            # Stale or malformed ?cursor= — start again from the first page
+            return redirect(url_for('dashboard'))
+
     try:
+        next_cursor = None
         if role == 'admin':
-            # ADMIN: Fetch ALL recipes from S3 across ALL users
-            # storage.list_all_recipes_admin returns (recipes, user_recipe_counts)
-            recipes, user_recipe_counts = storage.list_all_recipes_admin()
+            # ADMIN: Render one page of ALL users' recipes; later pages follow ?cursor=
+            recipes, next_cursor = catalog.list_recipes_page(None, limit, cursor)
+            user_recipe_counts = catalog.recipe_counts()
         else:
-            # REGULAR USER: Fetch ONLY their recipes from S3
-            recipes = storage.list_recipes(current_user.id)
-            # For non-admins, their count is just the length of their list
-            user_recipe_counts[str(current_user.id)] = len(recipes)
+            # REGULAR USER: The role dashboards load their recipes via /api/recipes,
+            # so only the count is needed here
+            user_recipe_counts = {str(current_user.id): catalog.recipe_count(current_user.id)}
+        summary = analytics_summary() if role == 'admin' else {'top_source': 'N/A', 'popular_tags': []}
             
         # --- Metrics Calculation (Required by HTML) ---
         total_s3_recipes = sum(user_recipe_counts.values())
         avg_recipes = round(total_s3_recipes / len(users), 2) if users else 0
-        total_recipes = len(recipes)
+        total_recipes = total_s3_recipes
         active_users = User.query.filter_by(is_active=True).count()
         
         # NOTE: We iterate over users here to attach the S3-based count
@@ -850,10 +1468,11 @@ def dashboard():
             'total_recipes': total_recipes,
             'active_users': active_users,
             'last_sync_time': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
-            'top_source': 'youtube.com', 
-            'popular_tags': ['Chicken', 'Quick Meals'], 
+            'top_source': summary['top_source'],
+            'popular_tags': summary['popular_tags'],
             'avg_recipes': avg_recipes,
-            'recipes': recipes,         # <--- ENSURE THIS LIST CONTAINS ALL ADMIN RECIPES
+            'recipes': recipes,         # <--- ONE PAGE OF ADMIN RECIPES
+            'next_cursor': next_cursor,
             'users': users,
         }
 
@@ -867,7 +1486,7 @@ def dashboard():
             return render_template('user_dashboard.html', **context)
         else:
             return redirect(url_for('auth.login'))
-            
+
     except Exception as e:
         print(f"Error loading dashboard: {e}")
         traceback.print_exc()
@@ -934,7 +1553,7 @@ def update_role():
 
 @app.route('/api/dashboard-metrics')
 def dashboard_metrics():
-    total_recipes = Recipe.query.count()
+    total_recipes = sum(get_s3_recipe_counts().values())
     active_users = User.query.count()
     last_sync_time = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
     return jsonify({
@@ -943,33 +1562,51 @@ def dashboard_metrics():
         'last_sync_time': last_sync_time
     })
 
+def analytics_summary(days=30):
+    """Top sources and tags of recipes saved in the last `days` days, read from the daily rollups."""
+    top_sources = [(source, count) for source, count in usage_analytics.breakdown('save', 'source', days)
+                   if source_type(source) != 'image'][:5]
+    return {
+        'top_source': top_sources[0][0] if top_sources else 'N/A',
+        'top_sources': [{'source': source, 'count': count} for source, count in top_sources],
+        'popular_tags': [tag for tag, _ in usage_analytics.breakdown('save', 'tag', days, limit=5)]
+    }
+
+
 @app.route('/api/usage-analytics')
-def usage_analytics():
-    # Most scraped source
-    top_source = db.session.query(Recipe.source).group_by(Recipe.source).order_by(db.func.count().desc()).first()
+@login_required
+def get_usage_analytics():
+    """
+    Admin charts, answered from the analytics rollups and per-user counters
+    (never by scanning recipes). ?days= sets the window (default 30).
+    """
+    if current_user.role.strip().lower() != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    days = max(1, min(request.args.get('days', 30, type=int), 365))
 
     # Average recipes per user
     user_count = User.query.count()
-    recipe_count = Recipe.query.count()
+    recipe_count = sum(get_s3_recipe_counts().values())
     avg_recipes = round(recipe_count / user_count, 2) if user_count else 0
 
-    # Popular tags (placeholder logic)
-    popular_tags = ['quick', 'vegan', 'dessert']  # Replace with actual tag aggregation if available
-
-    # Breakdown for charting
-    scraped_count = Recipe.query.filter(Recipe.source != None).count()
-    manual_count = Recipe.query.filter(Recipe.source == None).count()
+    # Breakdown for charting: every recipe ever saved, by how it was created
+    saved_by_type = dict(usage_analytics.breakdown('save', 'type', days=None))
+    scraped_count = sum(count for kind, count in saved_by_type.items() if kind != 'manual')
+    manual_count = saved_by_type.get('manual', 0)
     favorites_count = 10  # Replace with actual logic if you track favorites
 
     return jsonify({
-        'top_source': top_source[0] if top_source else 'N/A',
+        **analytics_summary(days),
         'avg_recipes': avg_recipes,
-        'popular_tags': popular_tags,
         'scraped_count': scraped_count,
         'manual_count': manual_count,
         'favorites_count': favorites_count,
+        'saved_by_type': saved_by_type,
         'total_recipes': recipe_count,
-        'total_users': user_count
+        'total_users': user_count,
+        'scrapes': usage_analytics.totals('scrape', days),
+        'scrapes_by_hour': usage_analytics.series('scrape', 'hour', 24),
+        'saves_by_day': usage_analytics.series('save', 'day', days)
     })
 
 # Add this new route to your Flask application (app.py)
@@ -999,14 +1636,14 @@ def delete_user(user_id):
         
         # As a temporary measure, confirm the number of recipes before proceeding
         # The list_recipes method is a safe way to check
-        user_recipes = storage.list_recipes(user_id) 
-        
-        if user_recipes:
-            # OPTIONAL: You might add a loop here to delete each recipe one by one using storage.delete_recipe
-            # For simplicity, we assume this is handled by a separate admin process or a more robust S3 cleanup mechanism.
-            pass
-
-        # Step 2: Delete the user from the database
+        # The catalog knows every recipe the user owns, so remove them one by one
+        # (this also clears the catalog rows that reference the user).
+        for recipe in catalog.list_recipes([user_id]):
+            if not catalog.delete_recipe(recipe['filename'], user_id):
+                return jsonify({'error': f"Failed to delete recipe {recipe['filename']}; the user was kept."}), 500
+
+        # Step 2: Delete the user (and their recipe counter) from the database
+        UserRecipeCount.query.filter_by(user_id=user_id).delete()
         db.session.delete(user_to_delete)
         db.session.commit()
         
@@ -1017,6 +1654,112 @@ def delete_user(user_id):
         return jsonify({'error': f'Database error during deletion: {str(e)}'}), 500
 
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Per-stage and external-call latency summaries (p50/p95/p99), AI token
+    counts, cache hit ratios and job queue depth of this worker process, in
+    the Prometheus text format (?format=json for a JSON snapshot of the
+    latencies). With METRICS_TOKEN set, scrapers authenticate with
+    "Authorization: Bearer <token>"; otherwise an admin session is required.
+    """
+    token = os.getenv('METRICS_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({'error': 'Unauthorized'}), 401
+    elif not current_user.is_authenticated or current_user.role.strip().lower() != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    if request.args.get('format') == 'json':
+        return jsonify(metrics_registry.snapshot())
+    return app.response_class(metrics_registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/profiler')
+@login_required
+def profiler_status():
+    """Settings of the current (or last) profiling session and per-route request totals (admin only)."""
+    if current_user.role.strip().lower() != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(request_profiler.status())
+
+
+@app.route('/api/profiler', methods=['POST'])
+@login_required
+def start_profiler():
+    """
+    Starts profiling on every worker (admin only). JSON body, all optional:
+    routes (endpoint names or URL rules; default all), sample_rate (0-1,
+    default 0.1), mode ("cprofile" or "sample"), duration_seconds (default
+    300, at most 3600) and interval_ms (sampling interval, default 5).
+    """
+    if current_user.role.strip().lower() != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    data = request.get_json() or {}
+    routes = data.get('routes')
+    if isinstance(routes, str):
+        routes = [routes]
+    try:
+        config = request_profiler.start(
+            routes=routes,
+            sample_rate=float(data.get('sample_rate', 0.1)),
+            mode=data.get('mode', 'cprofile'),
+            duration=min(float(data.get('duration_seconds', 300)), 3600),
+            interval_ms=int(data.get('interval_ms', 5))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    print(f"Profiler session {config['session']} started by {current_user.username}: {config}")
+    return jsonify(config), 201
+
+
+@app.route('/api/profiler', methods=['DELETE'])
+@login_required
+def stop_profiler():
+    """Ends the profiling session early (admin only); its results stay downloadable."""
+    if current_user.role.strip().lower() != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    config = request_profiler.stop()
+    if not config:
+        return jsonify({'error': 'No profiling session'}), 404
+    return jsonify(request_profiler.status())
+
+
+@app.route('/api/profiler/download')
+@login_required
+def download_profile():
+    """
+    Results of the current (or last) session merged across workers (admin
+    only): ?format=pstats (default) for a cProfile session, to open with
+    snakeviz or `python -m pstats`, or ?format=collapsed for the folded
+    stacks of a "sample" session, for flamegraph.pl or speedscope.
+    ?route=<endpoint> limits the result to one route.
+    """
+    if current_user.role.strip().lower() != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    route = request.args.get('route') or None
+    if request.args.get('format', 'pstats') == 'collapsed':
+        body, mimetype, extension = request_profiler.export_collapsed(route), 'text/plain; charset=utf-8', 'folded'
+    else:
+        body, mimetype, extension = request_profiler.export_pstats(route), 'application/octet-stream', 'prof'
+    if not body:
+        return jsonify({'error': 'No profiling data for this session'}), 404
+    filename = f"profile-{route or 'all'}.{extension}"
+    return app.response_class(body, mimetype=mimetype,
+                              headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@app.route('/api/cache-stats')
+@login_required
+def cache_stats():
+    """Hit/miss counters of the recipe body cache (admin only)."""
+    if current_user.role.strip().lower() != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    if not isinstance(storage, CachedStorage):
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **storage.stats()})
+
+
 @app.route('/api/users')
 def get_users():
     # 1. Fetch all users from the database
@@ -1062,31 +1805,88 @@ def get_recipes():
             # 2. Otherwise, only fetch current user's ID
             user_ids_to_fetch = [str(current_user.id)]
 
-        all_recipes = []
-        for user_id in user_ids_to_fetch:
-            # list_recipes fetches recipes for the given user_id
-            recipes = storage.list_recipes(user_id)
-            
-            # Augment recipes with the owner's ID and Username for viewing shared recipes later
-            for recipe in recipes:
-                recipe['owner_id'] = user_id
-                # --- START: ADD USERNAME ---
-                recipe['owner_username'] = user_map.get(user_id, 'Unknown') # Add username here
-                # --- END: ADD USERNAME ---
-            
-            all_recipes.extend(recipes)
+        # One indexed, keyset-paginated query over the catalog, newest first
+        limit, cursor = get_page_args()
+        all_recipes, next_cursor = catalog.list_recipes_page(user_ids_to_fetch, limit, cursor)
 
-        # Re-sort the combined list by creation time
-        all_recipes.sort(key=lambda x: x['created'], reverse=True)
+        # Augment recipes with the owner's ID and Username for viewing shared recipes later
+        for recipe in all_recipes:
+            recipe['owner_id'] = recipe['user_id']
+            recipe['owner_username'] = user_map.get(recipe['user_id'], 'Unknown')
         
-        return jsonify(all_recipes)
+        return paged_response(all_recipes, next_cursor)
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Recipe listing failed: {str(e)}")
         traceback.print_exc() 
         return jsonify({'error': str(e)}), 500
     
 
+def searchable_user_ids():
+    """Owners whose recipes the current user may search; None means every user (admin)."""
+    role = current_user.role.strip().lower()
+    if role == 'admin':
+        return None
+    if role == 'family':
+        return [u.id for u in User.query.filter_by(role='family').all()]
+    return [current_user.id]
+
+
+@app.route('/api/recipes/search')
+@login_required
+def search_recipes():
+    """
+    Ranked full-text search over title, ingredients and method.
+    Each word of `q` matches as a prefix; all words must match.
+    Users search their own recipes, family members the family's, admins everyone's.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    try:
+        limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+        results = catalog.search(query, searchable_user_ids(), limit)
+
+        user_map = {str(u.id): u.username for u in User.query.all()}
+        for recipe in results:
+            recipe['owner_id'] = recipe['user_id']
+            recipe['owner_username'] = user_map.get(recipe['user_id'], 'Unknown')
+        return jsonify({'query': query, 'results': results})
+    except Exception as e:
+        print(f"Recipe search failed: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/recipes/pantry')
+@login_required
+def pantry_recipes():
+    """
+    "What can I cook with...": recipes ranked by how much of their ingredient
+    list the comma-separated `ingredients` cover. Salt, pepper, oil and water
+    count as on hand unless `staples=0`. Same visibility rules as search.
+    """
+    pantry = [item.strip() for item in request.args.get('ingredients', '').split(',') if item.strip()]
+    if not pantry:
+        return jsonify({'error': 'Query parameter ingredients is required'}), 400
+    try:
+        limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+        include_staples = request.args.get('staples', '1') != '0'
+        results = catalog.cook_with(pantry[:30], searchable_user_ids(), limit, include_staples)
+
+        user_map = {str(u.id): u.username for u in User.query.all()}
+        for recipe in results:
+            recipe['owner_id'] = recipe['user_id']
+            recipe['owner_username'] = user_map.get(recipe['user_id'], 'Unknown')
+        return jsonify({'ingredients': pantry, 'results': results})
+    except Exception as e:
+        print(f"Pantry search failed: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 # Insert this new route into your Flask application (app.py)
 
 @app.route('/api/recipes/private')
@@ -1097,15 +1897,18 @@ def get_private_recipes():
         current_user_id = str(current_user.id)
         current_username = current_user.username
         
-        # storage.list_recipes fetches recipes only from the current user's S3 folder
-        recipes = storage.list_recipes(current_user_id)
+        # catalog.list_recipes_page reads only the current user's rows from the catalog
+        limit, cursor = get_page_args()
+        recipes, next_cursor = catalog.list_recipes_page([current_user_id], limit, cursor)
         
         # Augment with owner info (for consistency, even though it's the current user)
         for recipe in recipes:
             recipe['owner_id'] = current_user_id
             recipe['owner_username'] = current_username
             
-        return jsonify(recipes)
+        return paged_response(recipes, next_cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Private recipe listing failed: {str(e)}")
         traceback.print_exc()
@@ -1133,7 +1936,7 @@ def save_recipe():
             recipe_name = content.split('\n')[0][2:].strip()
 
         # Call save_recipe ONCE with all correct arguments
-        if not storage.save_recipe(filename, content, recipe_name, user_id):
+        if not catalog.save_recipe(filename, content, recipe_name, user_id):
             return jsonify({'error': 'Failed to save recipe to S3'}), 500
         
         return jsonify({
@@ -1219,13 +2022,26 @@ def get_recipe_content(filename):
             if not is_authorized:
                 return jsonify({'error': 'Unauthorized access to this recipe.'}), 403
 
-        # Call get_recipe using the determined owner_id
-        content = storage.get_recipe(filename, owner_id) 
+        # Forward the client's ETag so an unchanged recipe is validated without
+        # downloading its body
+        client_tags = request.if_none_match.as_set()
+        client_etag = f'"{next(iter(client_tags))}"' if len(client_tags) == 1 else None
+
+        # Call fetch_recipe using the determined owner_id
+        content, storage_etag = storage.fetch_recipe(filename, owner_id, if_none_match=client_etag)
         
         if content is None:
             return jsonify({'error': 'Recipe not found'}), 404
+
+        etag = storage_etag.strip('"') if storage_etag else None
+        if content is NOT_MODIFIED or (etag and request.if_none_match.contains(etag)):
+            return not_modified_response(etag)
         
-        return jsonify({'content': content})
+        response = jsonify({'content': content})
+        if etag:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1237,8 +2053,8 @@ def delete_recipe(filename):
         if not filename.startswith('recipe_') or not filename.endswith('.md'):
             return jsonify({'error': 'Invalid filename'}), 400
         
-        if not storage.delete_recipe(filename, current_user.id): # <--- Pass user_id
-            return jsonify({'error': 'Failed to delete recipe from S3'}), 500
+        if not catalog.delete_recipe(filename, current_user.id): # <--- Pass user_id
+            return jsonify({'error': 'Failed to delete recipe'}), 500
         
         return jsonify({
             'success': True,
@@ -1270,20 +2086,27 @@ def process_vision_upload():
         # 2. Get optional text prompt
         text_prompt = request.form.get('text', '')
 
-        # 3. Read image bytes
-        image_bytes_list = []
+        # 3. Uploads are spooled to disk; hand the image pipeline their paths
+        # rather than reading every image into memory here
+        image_sources = []
         for file in images:
             if file:
-                image_bytes_list.append(file.read())
+                path = getattr(file.stream, 'name', None)
+                image_sources.append(path if isinstance(path, str) else file.stream)
 
-        if not image_bytes_list:
+        if not image_sources:
             return jsonify({'error': 'Failed to read image files'}), 400
 
         # 4. Call the new vision parser
-        print(f"Sending {len(image_bytes_list)} images to vision model...")
-        ai_response = scraper.parse_with_vision(image_bytes_list, text_prompt)
+        print(f"Sending {len(image_sources)} images to vision model...")
+        started = time.monotonic()
+        usage = {}
+        with stage_timer('vision'):
+            ai_response = scraper.parse_with_vision(image_sources, text_prompt, usage=usage)
+        usage['parse_ms'] = round((time.monotonic() - started) * 1000)
 
         if ai_response.strip() == "NO_RECIPE_FOUND":
+            scraper.record_scrape(None, user_id, 'failed', usage, source='vision')
             return jsonify({
                 'error': 'Could not extract a clear recipe from the image(s).'
             }), 400
@@ -1299,14 +2122,17 @@ def process_vision_upload():
         
         markdown_content = scraper.create_markdown(ai_response, scraped_data)
 
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
         filename = f"recipe_vision_{timestamp}.md"
 
         recipe_name = "Vision Recipe"
         if markdown_content.startswith('# '):
             recipe_name = markdown_content.split('\n')[0][2:].strip()
             
-        if not storage.save_recipe(filename, markdown_content, recipe_name, user_id):
+        with stage_timer('save'):
+            saved = catalog.save_recipe(filename, markdown_content, recipe_name, user_id, source='vision')
+        scraper.record_scrape(None, user_id, 'success' if saved else 'failed', usage, source='vision')
+        if not saved:
             return jsonify({'error': 'Failed to save recipe to S3'}), 500
 
         return jsonify({
@@ -1323,6 +2149,12 @@ def process_vision_upload():
 
 
 
+@app.errorhandler(413)
+def upload_too_large(e):
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'error': f'Upload too large. The limit is {limit_mb} MB per request.'}), 413
+
+
 @app.route('/api/scrape', methods=['POST'])
 @login_required 
 def scrape_recipe():
@@ -1337,18 +2169,187 @@ def scrape_recipe():
             url = 'https://' + url
 
         # --- LOGGED-IN USER ---
-        # User is logged in, so we scrape AND save to their account
-        result = scraper.scrape_and_save(url, current_user.id)
+        # Scraping takes 10-60s, so it runs on the background job queue.
+        # The client polls status_url (or streams events_url) for the result.
+        job = job_queue.enqueue('scrape', current_user.id, {'url': url})
 
-        if not result or result.get("status") == "failed":
-            return jsonify({'error': result.get("error", "Unknown scraping error.")}), 400
-        
-        # Return success response (it's saved)
-        return jsonify(result), 200
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'url': url,
+            'status_url': url_for('get_job', job_id=job.id),
+            'events_url': url_for('stream_job_events', job_id=job.id)
+        }), 202
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': f'Internal error: {str(e)}'}), 500
 
+
+@app.route('/api/scrape/stream', methods=['POST'])
+@login_required
+def scrape_recipe_stream():
+    """
+    Queues a scrape job like /api/scrape and relays it as Server-Sent Events:
+    a `job` event with its status_url, `status` events for each stage, `token`
+    events with Markdown chunks as the model produces them, a `reset` event if
+    the streamed text so far must be discarded (the model failed and a basic
+    extraction follows), then a single `done` (the saved recipe) or `error`.
+    The job worker saves the recipe whether or not the client stays connected;
+    a client that loses the stream can poll status_url for the result.
+    """
+    data = request.get_json() or {}
+    url = (data.get('url') or '').strip()
+    if not url:
+        return jsonify({'error': 'URL is required'}), 400
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    job_id = job_queue.enqueue('scrape', current_user.id, {'url': url, 'stream': True}).id
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    def generate():
+        yield sse('job', {'job_id': job_id, 'status_url': url_for('get_job', job_id=job_id)})
+        message, sent, resets = None, '', 0
+        idle_since = time.monotonic()
+        deadline = time.monotonic() + 600
+        while time.monotonic() < deadline:
+            db.session.expire_all()
+            job = job_queue.get(job_id)
+            result = json.loads(job.result) if job.result else None
+            if job.status in TERMINAL_STATUSES:
+                if job.status == 'succeeded':
+                    yield sse('done', result)
+                else:
+                    yield sse('error', result or {'error': job.error or 'Failed to scrape URL', 'url': url})
+                return
+            events = []
+            if job.progress and job.progress != message:
+                message = job.progress
+                events.append(sse('status', {'message': message}))
+            if result and 'draft' in result:
+                if result.get('resets', 0) != resets:
+                    resets, sent = result.get('resets', 0), ''
+                    events.append(sse('reset', {'message': 'AI extraction failed; using a basic extraction'}))
+                if len(result['draft']) > len(sent):
+                    events.append(sse('token', {'text': result['draft'][len(sent):]}))
+                    sent = result['draft']
+            if events:
+                idle_since = time.monotonic()
+                yield ''.join(events)
+            elif time.monotonic() - idle_since >= 15:
+                idle_since = time.monotonic()
+                yield ": keep-alive\n\n"
+            time.sleep(0.5)
+        # Still running: the client goes on polling status_url
+
+    return app.response_class(stream_with_context(generate()), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/import', methods=['POST'])
+@login_required
+def bulk_import_recipes():
+    """
+    Queues a batch import. Accepts {"urls": [...]} or {"text": "<one URL per line>"}.
+    Per-URL status is published on the job while it runs.
+    """
+    try:
+        data = request.get_json() or {}
+        raw_urls = data.get('urls')
+        if raw_urls is None:
+            raw_urls = (data.get('text') or '').split()
+        if not isinstance(raw_urls, list):
+            return jsonify({'error': 'urls must be a list'}), 400
+
+        urls = []
+        for raw in raw_urls:
+            url = str(raw).strip()
+            if not url:
+                continue
+            if not url.startswith(('http://', 'https://')):
+                url = 'https://' + url
+            if url not in urls:
+                urls.append(url)
+
+        if not urls:
+            return jsonify({'error': 'At least one URL is required'}), 400
+        max_urls = int(os.getenv('BULK_IMPORT_MAX_URLS', '100'))
+        if len(urls) > max_urls:
+            return jsonify({'error': f'A batch can contain at most {max_urls} URLs'}), 400
+
+        job = job_queue.enqueue('import', current_user.id, {'urls': urls})
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'total': len(urls),
+            'status_url': url_for('get_job', job_id=job.id),
+            'events_url': url_for('stream_job_events', job_id=job.id)
+        }), 202
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'Internal error: {str(e)}'}), 500
+
+
+def get_visible_job(job_id):
+    """Returns the job if it belongs to the current user (admins see every job)."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return None
+    if job.user_id != current_user.id and current_user.role.strip().lower() != 'admin':
+        return None
+    return job
+
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+def get_job(job_id):
+    job = get_visible_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/jobs/<job_id>/events')
+@login_required
+def stream_job_events(job_id):
+    """
+    Server-Sent Events stream of a job's status, ending once it finishes.
+    Note: each open stream occupies a worker; prefer polling under sync gunicorn workers.
+    """
+    if get_visible_job(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def generate():
+        last_sent = None
+        deadline = time.monotonic() + 600
+        while time.monotonic() < deadline:
+            db.session.expire_all()
+            job = job_queue.get(job_id)
+            snapshot = job.to_dict()
+            if snapshot != last_sent:
+                yield f"data: {json.dumps(snapshot)}\n\n"
+                last_sent = snapshot
+            if job.status in TERMINAL_STATUSES:
+                return
+            time.sleep(1)
+
+    return app.response_class(stream_with_context(generate()), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def load_app():
+    """
+    Returns this module's app with its services already built, for gunicorn
+    ("recipe_scraper_s3:load_app()") and the launcher, so a missing setting
+    stops the boot with a ValueError rather than failing the first request.
+    It does not touch the network or the database; the AI, S3 and YouTube
+    clients are created on first use. Run `flask init-db` before serving.
+    """
+    get_services()
+    return app
+
+
 if __name__ == '__main__':
-    app.run(debug=False, host='0.0.0.0', port=5000)
+    load_app().run(debug=False, host='0.0.0.0', port=5000)
@@ -0,0 +1,144 @@
+import re
+from collections import deque
+
+# Text processing for scraped pages and video transcripts. Patterns are
+# compiled once; each line is scanned by a single keyword regex instead of
+# one search per keyword group.
+
+# Every section keyword in one pass; the named group says which kind it is
+_SECTION_KEYWORD_RE = re.compile(
+    r'\b(?:(?P<ingredients>ingredients?)'
+    r'|(?P<instructions>instructions?|method|directions?|steps?)'
+    r'|(?P<end>nutrition|notes)'
+    r'|(?P<extras>tips|faq))\b',
+    re.IGNORECASE
+)
+_NUMBERED_STEP_RE = re.compile(r'\d+\.?\s+')
+_INGREDIENT_HINT_RE = re.compile('|'.join(map(re.escape, (
+    'g ', 'ml', 'tbsp', 'tsp', 'cup', 'oz', 'lb', 'clove', 'onion', 'garlic'
+))))
+_COOKING_ACTION_RE = re.compile('|'.join((
+    'cook', 'add', 'heat', 'stir', 'mix', 'drain', 'serve', 'fry', 'bake'
+)))
+_BULLETS = ('▢', '•', '-', '*')
+_HEADING_MAX_LENGTH = 100
+
+
+def extract_recipe_sections(content):
+    """
+    Picks likely ingredient and instruction lines out of page text by tracking
+    which section heading was seen last. Returns {"ingredients", "instructions"}.
+    """
+    ingredients = []
+    instructions = []
+    in_ingredients = False
+    in_instructions = False
+
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        kinds = {match.lastgroup for match in _SECTION_KEYWORD_RE.finditer(line)}
+        if kinds and len(line) < _HEADING_MAX_LENGTH:
+            if 'ingredients' in kinds:
+                in_ingredients, in_instructions = True, False
+                continue
+            if 'instructions' in kinds:
+                in_ingredients, in_instructions = False, True
+                continue
+
+        if in_ingredients:
+            if 'instructions' in kinds or 'end' in kinds:
+                lowered = line.lower()
+                in_ingredients = False
+                in_instructions = 'instructions' in lowered or 'method' in lowered
+                continue
+            if line.startswith(_BULLETS):
+                ingredients.append(line[1:].strip())
+            elif _INGREDIENT_HINT_RE.search(line.lower()):
+                ingredients.append(line)
+
+        if in_instructions:
+            if 'end' in kinds or 'extras' in kinds:
+                in_instructions = False
+                continue
+            if _NUMBERED_STEP_RE.match(line):
+                instructions.append(line)
+                continue
+            lowered = line.lower()
+            if lowered.startswith('step') or _COOKING_ACTION_RE.search(lowered):
+                instructions.append(line)
+
+    return {
+        'ingredients': ingredients,
+        'instructions': instructions
+    }
+
+
+_VTT_TAG_RE = re.compile(r'<[^>]+>')
+_VTT_ENTITY_RE = re.compile(r'&\w+;')
+_VTT_CUE_NUMBER_RE = re.compile(r'\d+')
+# Rolling captions repeat the previous line; compare against this many
+_RECENT_LINES = 3
+# Longest word overlap looked for between the transcript tail and a new line
+_MAX_OVERLAP_WORDS = 20
+_MIN_OVERLAP_WORDS = 3
+
+
+def _overlap(words, tokens):
+    """Length of the longest run that ends `words` and starts `tokens`."""
+    longest = min(len(words), len(tokens), _MAX_OVERLAP_WORDS)
+    for size in range(longest, _MIN_OVERLAP_WORDS - 1, -1):
+        if words[-size:] == tokens[:size]:
+            return size
+    return 0
+
+
+def parse_vtt(vtt_content):
+    """
+    Turns a WebVTT subtitle file into plain transcript text.
+
+    Header blocks, cue numbers, timings, NOTE lines, inline timestamp/styling
+    tags and entities are dropped. Auto-generated captions are "rolling":
+    each cue repeats the line before it and then adds a few words, so lines
+    already emitted are skipped, and a line that starts with the words the
+    transcript ends with contributes only its new words.
+    """
+    words = []
+    recent = deque(maxlen=_RECENT_LINES)
+    in_cues = False
+
+    for line in vtt_content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if '-->' in line:
+            in_cues = True
+            continue
+        if not in_cues or line.startswith('NOTE') or _VTT_CUE_NUMBER_RE.fullmatch(line):
+            continue
+        if '<' in line:
+            line = _VTT_TAG_RE.sub('', line)
+        if '&' in line:
+            line = _VTT_ENTITY_RE.sub('', line)
+        line = line.strip()
+        if not line or line in recent:
+            continue
+        recent.append(line)
+
+        tokens = line.split()
+        words.extend(tokens[_overlap(words, tokens):])
+
+    return ' '.join(words)
+
+
+def parse_json3(data):
+    """
+    Turns YouTube's json3 caption format into plain transcript text. Unlike
+    VTT it lists each caption segment once, so no de-duplication is needed.
+    """
+    # Segments within an event carry their own spacing; events do not
+    events = (''.join(segment.get('utf8', '') for segment in event.get('segs') or ())
+              for event in data.get('events') or ())
+    return ' '.join(' '.join(events).split())
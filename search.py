@@ -0,0 +1,164 @@
+import re
+from sqlalchemy import text, bindparam
+from models import Recipe, db
+
+MAX_QUERY_TERMS = 8
+# Relative weight of a match in each column: title, ingredients, method
+COLUMN_WEIGHTS = (10.0, 4.0, 1.0)
+
+_HEADING_RE = re.compile(r'^\s*\*\*\s*(ingredients|method|instructions)\s*:?\s*\*\*\s*:?\s*$', re.IGNORECASE)
+
+
+def split_recipe_markdown(content):
+    """
+    Splits recipe Markdown ("# Title", "**Ingredients:**", "**Method:**")
+    into (title, ingredients, method) text. Text outside those sections is
+    counted as method so it stays searchable.
+    """
+    title = ''
+    sections = {'ingredients': [], 'method': []}
+    current = 'method'
+    for line in (content or '').splitlines():
+        heading = _HEADING_RE.match(line)
+        if heading:
+            current = 'ingredients' if heading.group(1).lower() == 'ingredients' else 'method'
+            continue
+        if not title and line.startswith('# '):
+            title = line[2:].strip()
+            continue
+        if line.strip().startswith('**URL:**'):
+            continue
+        sections[current].append(line)
+    return title, '\n'.join(sections['ingredients']), '\n'.join(sections['method'])
+
+
+def query_terms(query):
+    """Lower-cased word tokens of a user query; punctuation and operators are dropped."""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_QUERY_TERMS]
+
+
+class RecipeSearchIndex:
+    """
+    Full-text index over recipe title, ingredients and method.
+
+    Uses an FTS5 virtual table on SQLite and a weighted tsvector with a GIN
+    index on PostgreSQL, both in a `recipe_search` table keyed by recipe id.
+    Every query term is matched as a prefix and all terms must match;
+    results are ranked with bm25 (SQLite) or ts_rank_cd (PostgreSQL). On
+    any other database search falls back to a title substring match.
+    """
+    def __init__(self, database=db):
+        self.db = database
+
+    @property
+    def dialect(self):
+        return self.db.engine.dialect.name
+
+    def ensure_schema(self):
+        """Creates the index table if it is missing (the migration creates it too)."""
+        if self.dialect == 'sqlite':
+            self.db.session.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5("
+                "title, ingredients, method, tokenize='porter unicode61 remove_diacritics 2')"
+            ))
+        elif self.dialect == 'postgresql':
+            self.db.session.execute(text(
+                "CREATE TABLE IF NOT EXISTS recipe_search ("
+                " recipe_id INTEGER PRIMARY KEY REFERENCES recipe (id) ON DELETE CASCADE,"
+                " document tsvector NOT NULL)"
+            ))
+            self.db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_recipe_search_document ON recipe_search USING GIN (document)"
+            ))
+        self.db.session.commit()
+
+    def update(self, recipe_id, content):
+        """(Re)indexes one recipe from its Markdown. Commits; failures are logged, not raised."""
+        title, ingredients, method = split_recipe_markdown(content)
+        params = {'id': recipe_id, 'title': title, 'ingredients': ingredients, 'method': method}
+        try:
+            if self.dialect == 'sqlite':
+                self.db.session.execute(text("DELETE FROM recipe_search WHERE rowid = :id"), params)
+                self.db.session.execute(text(
+                    "INSERT INTO recipe_search (rowid, title, ingredients, method)"
+                    " VALUES (:id, :title, :ingredients, :method)"
+                ), params)
+            elif self.dialect == 'postgresql':
+                self.db.session.execute(text(
+                    "INSERT INTO recipe_search (recipe_id, document) VALUES (:id,"
+                    " setweight(to_tsvector('english', :title), 'A') ||"
+                    " setweight(to_tsvector('english', :ingredients), 'B') ||"
+                    " setweight(to_tsvector('english', :method), 'C'))"
+                    " ON CONFLICT (recipe_id) DO UPDATE SET document = EXCLUDED.document"
+                ), params)
+            else:
+                return
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            print(f"Failed to update the search index for recipe {recipe_id}: {e}")
+
+    def remove(self, recipe_id, commit=True):
+        """
+        Drops one recipe from the index. With commit=False the delete joins the
+        caller's transaction and failures are raised instead of logged.
+        """
+        if self.dialect == 'sqlite':
+            statement = "DELETE FROM recipe_search WHERE rowid = :id"
+        elif self.dialect == 'postgresql':
+            statement = "DELETE FROM recipe_search WHERE recipe_id = :id"
+        else:
+            return
+        try:
+            self.db.session.execute(text(statement), {'id': recipe_id})
+            if commit:
+                self.db.session.commit()
+        except Exception as e:
+            if not commit:
+                raise
+            self.db.session.rollback()
+            print(f"Failed to remove recipe {recipe_id} from the search index: {e}")
+
+    def search(self, query, user_ids=None, limit=20):
+        """
+        Returns [(Recipe, score), ...] best match first, restricted to recipes
+        owned by `user_ids` (None searches every recipe). Higher scores are better.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        owner_filter = " AND r.user_id IN :user_ids" if user_ids is not None else ""
+        params = {'limit': limit}
+        if user_ids is not None:
+            params['user_ids'] = [int(uid) for uid in user_ids] or [-1]
+
+        if self.dialect == 'sqlite':
+            params['q'] = ' '.join(f'"{term}"*' for term in terms)
+            statement = text(
+                "SELECT r.id, -bm25(recipe_search, :w_title, :w_ingredients, :w_method) AS score"
+                " FROM recipe_search JOIN recipe r ON r.id = recipe_search.rowid"
+                " WHERE recipe_search MATCH :q" + owner_filter +
+                " ORDER BY score DESC LIMIT :limit"
+            )
+            params.update(zip(('w_title', 'w_ingredients', 'w_method'), COLUMN_WEIGHTS))
+        elif self.dialect == 'postgresql':
+            params['q'] = ' & '.join(f'{term}:*' for term in terms)
+            statement = text(
+                "SELECT r.id, ts_rank_cd(s.document, to_tsquery('english', :q)) AS score"
+                " FROM recipe_search s JOIN recipe r ON r.id = s.recipe_id"
+                " WHERE s.document @@ to_tsquery('english', :q)" + owner_filter +
+                " ORDER BY score DESC, r.created_at DESC LIMIT :limit"
+            )
+        else:
+            recipes = Recipe.query
+            for term in terms:
+                recipes = recipes.filter(Recipe.title.ilike(f'%{term}%'))
+            if user_ids is not None:
+                recipes = recipes.filter(Recipe.user_id.in_(params['user_ids']))
+            return [(recipe, 1.0) for recipe in recipes.order_by(Recipe.created_at.desc()).limit(limit)]
+
+        if user_ids is not None:
+            statement = statement.bindparams(bindparam('user_ids', expanding=True))
+        rows = self.db.session.execute(statement, params).fetchall()
+        recipes = {recipe.id: recipe for recipe in Recipe.query.filter(Recipe.id.in_([row[0] for row in rows]))}
+        return [(recipes[row[0]], float(row[1])) for row in rows if row[0] in recipes]
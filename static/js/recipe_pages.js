@@ -0,0 +1,49 @@
+// Listing endpoints are paginated: each page is a JSON array and the
+// cursor for the next page (if any) comes back in the X-Next-Cursor header.
+// RecipePages loads one page at a time, when the page asks for more, so the
+// first page renders without waiting for the rest of the collection.
+class RecipePages {
+    constructor(endpoint) {
+        this.endpoint = endpoint;
+        this.items = [];
+        this.cursor = null;
+        this.hasMore = true;
+        this.pending = null;
+        this.generation = 0;
+    }
+
+    // Drops what was loaded and fetches the first page again
+    async reset() {
+        this.items = [];
+        this.cursor = null;
+        this.hasMore = true;
+        this.pending = null;
+        this.generation += 1;
+        return await this.next();
+    }
+
+    // Appends the next page to `items` and returns it ([] once everything is loaded)
+    async next() {
+        if (!this.hasMore) return [];
+        if (!this.pending) {
+            const pending = this.fetchPage().finally(() => {
+                if (this.pending === pending) this.pending = null;
+            });
+            this.pending = pending;
+        }
+        return await this.pending;
+    }
+
+    async fetchPage() {
+        const generation = this.generation;
+        const url = this.cursor ? `${this.endpoint}?cursor=${encodeURIComponent(this.cursor)}` : this.endpoint;
+        const response = await fetch(url);
+        if (!response.ok) throw new Error('API Error');
+        const page = await response.json();
+        if (generation !== this.generation) return [];  // reset() while this page was loading
+        this.items = this.items.concat(page);
+        this.cursor = response.headers.get('X-Next-Cursor');
+        this.hasMore = Boolean(this.cursor);
+        return page;
+    }
+}
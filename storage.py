@@ -0,0 +1,722 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from metrics import external_timer
+
+
+# Default and maximum number of recipes returned per listing page.
+RECIPE_PAGE_SIZE = int(os.getenv('RECIPE_PAGE_SIZE', '100'))
+MAX_RECIPE_PAGE_SIZE = 500
+
+# Returned by fetch_recipe in place of the body when the caller's ETag still matches.
+NOT_MODIFIED = object()
+
+# HEAD requests issued in parallel when listing straight from the bucket.
+S3_METADATA_WORKERS = max(1, int(os.getenv('S3_METADATA_WORKERS', '16')))
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Returns the process-wide boto3 S3 client. boto3 clients are thread-safe, so
+    one client with a connection pool sized for the metadata fan-out is shared
+    by every request and worker thread. boto3 is imported here, with the
+    first S3 call, because it is slow to import and not every process
+    (CLI commands, local storage) needs it.
+    """
+    global _s3_client
+    if _s3_client is not None:
+        return _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            import boto3
+            from botocore.config import Config as BotoConfig
+            _s3_client = boto3.client(
+                's3',
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                region_name=os.getenv('AWS_REGION', 'us-east-1'),
+                config=BotoConfig(max_pool_connections=max(10, S3_METADATA_WORKERS))
+            )
+        return _s3_client
+
+
+class RecipeStorage:
+    """
+    Interface every recipe storage backend implements.
+    Recipes are addressed by (user_id, filename), i.e. "recipes/<user_id>/<filename>".
+
+    Listing methods return recipe dicts with 'filename', 'name', 'created',
+    'source' and 'user_id'. Backends that can enumerate their contents cheaply
+    only need to implement `_records`; the listing and paging methods below
+    are built on top of it.
+    """
+
+    def save_recipe(self, filename, content, recipe_name, user_id, source=None):
+        raise NotImplementedError
+
+    def get_recipe(self, filename, user_id):
+        raise NotImplementedError
+
+    def fetch_recipe(self, filename, user_id, if_none_match=None):
+        """
+        Returns (content, etag), or (None, None) when the recipe does not exist.
+        If `if_none_match` equals the current ETag, returns (NOT_MODIFIED, etag)
+        instead of the body. Backends that can validate without reading the
+        body override this.
+        """
+        content = self.get_recipe(filename, user_id)
+        if content is None:
+            return None, None
+        etag = '"' + hashlib.md5(content.encode('utf-8')).hexdigest() + '"'
+        if if_none_match and if_none_match == etag:
+            return NOT_MODIFIED, etag
+        return content, etag
+
+    def delete_recipe(self, filename, user_id):
+        raise NotImplementedError
+
+    def _records(self, user_id=None):
+        """Returns recipe dicts (for one user, or everyone) ordered by key."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _newest_first(recipes):
+        return sorted(recipes, key=lambda x: x['created'], reverse=True)
+
+    @staticmethod
+    def _page(records, limit, continuation_token=None):
+        # The token is the key of the last record on the previous page, so
+        # paging is stable while recipes are added or removed.
+        if continuation_token:
+            records = [r for r in records if f"{r['user_id']}/{r['filename']}" > continuation_token]
+        page = records[:limit]
+        next_token = None
+        if len(records) > limit:
+            next_token = f"{page[-1]['user_id']}/{page[-1]['filename']}"
+        return RecipeStorage._newest_first(page), next_token
+
+    def list_recipes(self, user_id):
+        return self._newest_first(self._records(user_id))
+
+    def list_recipes_page(self, user_id, limit=RECIPE_PAGE_SIZE, continuation_token=None):
+        return self._page(self._records(user_id), limit, continuation_token)
+
+    def list_all_recipes_admin(self):
+        recipes = self._records()
+        user_recipe_counts = {}
+        for recipe in recipes:
+            user_recipe_counts[recipe['user_id']] = user_recipe_counts.get(recipe['user_id'], 0) + 1
+        return self._newest_first(recipes), user_recipe_counts
+
+    def list_all_recipes_admin_page(self, limit=RECIPE_PAGE_SIZE, continuation_token=None):
+        return self._page(self._records(), limit, continuation_token)
+
+    def check(self):
+        """Verifies the backend is reachable; raises ValueError if it is not."""
+
+    def count_recipes(self):
+        """
+        Returns {'user_id': count} of the recipes actually in storage, or
+        None if storage could not be listed.
+        """
+        counts = {}
+        for recipe in self._records():
+            counts[recipe['user_id']] = counts.get(recipe['user_id'], 0) + 1
+        return counts
+
+    @staticmethod
+    def _is_safe_name(part):
+        part = str(part)
+        return bool(part) and '/' not in part and '\\' not in part and part not in ('.', '..')
+
+    @staticmethod
+    def _new_metadata(recipe_name, source):
+        metadata = {
+            'created': datetime.now().isoformat(),
+            'type': 'recipe',
+            'recipe-name': recipe_name
+        }
+        if source:
+            metadata['source'] = source
+        return metadata
+
+
+class S3Storage(RecipeStorage):
+    def __init__(self):
+        self.bucket_name = os.getenv('AWS_S3_BUCKET')
+        if not self.bucket_name:
+            raise ValueError("AWS_S3_BUCKET environment variable is required")
+        # botocore is only loaded for the S3 backend; local and memory storage never import it
+        from botocore.exceptions import ClientError, NoCredentialsError
+        self.ClientError = ClientError
+        self.NoCredentialsError = NoCredentialsError
+
+    @property
+    def s3_client(self):
+        # Created with the first S3 call, so building the storage never touches the network
+        return get_s3_client()
+
+    def check(self):
+        try:
+            with external_timer('s3', 'head_bucket'):
+                self.s3_client.head_bucket(Bucket=self.bucket_name)
+        except (self.NoCredentialsError, self.ClientError) as e:
+            raise ValueError(f"AWS S3 configuration error: {str(e)}")
+    
+# In class S3Storage:
+    def save_recipe(self, filename, content, recipe_name, user_id, source=None):
+        metadata = self._new_metadata(recipe_name, source)
+        try:
+            with external_timer('s3', 'put_object'):
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=f"recipes/{user_id}/{filename}",  # <--- Uses user_id
+                    Body=content.encode('utf-8'),
+                    ContentType='text/markdown',
+                    Metadata=metadata
+                )
+            return True
+        except self.ClientError:
+            return False
+        
+        
+    def get_recipe(self, filename, user_id):
+        try:
+            with external_timer('s3', 'get_object'):
+                response = self.s3_client.get_object(
+                    Bucket=self.bucket_name,
+                    Key=f"recipes/{user_id}/{filename}"  # <--- Uses user_id
+                )
+                return response['Body'].read().decode('utf-8')
+        except self.ClientError:
+            return None
+
+    def fetch_recipe(self, filename, user_id, if_none_match=None):
+        params = {
+            'Bucket': self.bucket_name,
+            'Key': f"recipes/{user_id}/{filename}"
+        }
+        if if_none_match:
+            params['IfNoneMatch'] = if_none_match
+        try:
+            with external_timer('s3', 'get_object'):
+                response = self.s3_client.get_object(**params)
+                return response['Body'].read().decode('utf-8'), response.get('ETag')
+        except self.ClientError as e:
+            # S3 answers a matching If-None-Match with 304 and no body
+            status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+            if status == 304 or e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+                return NOT_MODIFIED, if_none_match
+            return None, None
+        
+    def get_recipe_metadata(self, key):
+        """
+        Helper function to get just the metadata and last-modified time of an S3 object.
+        This uses a fast HEAD request instead of downloading the whole file.
+        """
+        try:
+            with external_timer('s3', 'head_object'):
+                response = self.s3_client.head_object(
+                    Bucket=self.bucket_name,
+                    Key=key
+                )
+            # S3 metadata keys are auto-lowercased, so 'recipe-name' is correct
+            return response.get('Metadata', {}), response.get('LastModified')
+        except self.ClientError:
+            return None, None
+
+    def _describe_object(self, obj):
+        """
+        Resolves the display name, creation time and source of one listed object.
+        Falls back to reading the title line for legacy files without 'recipe-name' metadata.
+        """
+        metadata, last_modified = self.get_recipe_metadata(obj['Key'])
+
+        if metadata and 'recipe-name' in metadata:
+            recipe_name = metadata.get('recipe-name', 'Unknown Recipe')
+            created = metadata.get('created', last_modified.isoformat() if last_modified else datetime.now().isoformat())
+        else:
+            # Slow fallback for old files (should be rare)
+            content = self.s3_client.get_object(Bucket=self.bucket_name, Key=obj['Key'])['Body'].read().decode('utf-8')
+            if content and content.startswith('# '):
+                recipe_name = content.split('\n')[0][2:].strip()
+            else:
+                recipe_name = "Unknown Recipe"
+            created = obj['LastModified'].isoformat()
+
+        return recipe_name, created, (metadata or {}).get('source')
+
+    def _describe_objects(self, objects):
+        """
+        Runs `_describe_object` for every object on a bounded thread pool.
+        Results come back in the same order as `objects`; failures are None.
+        """
+        def describe(obj):
+            try:
+                return self._describe_object(obj)
+            except Exception as e:
+                print(f"Failed to process {obj['Key']}: {e}")
+                return None
+
+        if len(objects) <= 1:
+            return [describe(obj) for obj in objects]
+        with ThreadPoolExecutor(max_workers=min(S3_METADATA_WORKERS, len(objects))) as executor:
+            return list(executor.map(describe, objects))
+
+    @staticmethod
+    def _is_recipe_key(key, markdown_only=False):
+        # Path is "recipes/USER_ID/recipe_*"; ignore "folders" and stray objects.
+        # A user's own listings have always shown only the .md files; the admin
+        # listing and counts include every recipe_ object.
+        parts = key.split('/')
+        if len(parts) != 3 or not parts[2].startswith('recipe_'):
+            return False
+        return parts[2].endswith('.md') or not markdown_only
+
+    def _build_recipe_list(self, objects):
+        """Describes `objects` (in parallel) and returns recipe dicts, newest first."""
+        recipes = []
+        for obj, described in zip(objects, self._describe_objects(objects)):
+            if described is None:
+                continue
+            _, user_id, filename = obj['Key'].split('/')
+            recipe_name, created, source = described
+            recipes.append({
+                'filename': filename,
+                'name': recipe_name,
+                'created': created,
+                'source': source,
+                'user_id': user_id
+            })
+        return sorted(recipes, key=lambda x: x['created'], reverse=True)
+
+    def _list_page(self, prefix, limit, continuation_token=None, markdown_only=False):
+        params = {
+            'Bucket': self.bucket_name,
+            'Prefix': prefix,
+            'MaxKeys': limit
+        }
+        if continuation_token:
+            params['ContinuationToken'] = continuation_token
+        with external_timer('s3', 'list_objects_v2'):
+            response = self.s3_client.list_objects_v2(**params)
+        objects = [obj for obj in response.get('Contents', []) if self._is_recipe_key(obj['Key'], markdown_only)]
+        return self._build_recipe_list(objects), response.get('NextContinuationToken')
+
+# In class S3Storage:
+    def list_recipes(self, user_id):
+        """Lists every recipe of one user, walking all list_objects_v2 pages."""
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            pages = paginator.paginate(
+                Bucket=self.bucket_name,
+                Prefix=f"recipes/{user_id}/recipe_"  # <--- Uses user_id
+            )
+            objects = [obj for page in pages for obj in page.get('Contents', [])
+                       if self._is_recipe_key(obj['Key'], markdown_only=True)]
+            return self._build_recipe_list(objects)
+        except self.ClientError:
+            return []
+
+    def list_recipes_page(self, user_id, limit=RECIPE_PAGE_SIZE, continuation_token=None):
+        """
+        Lists one page of a user's recipes.
+        Returns (recipes, next_continuation_token); the token is None on the last page.
+        Recipes are sorted newest first within the page only.
+        """
+        try:
+            return self._list_page(f"recipes/{user_id}/recipe_", limit, continuation_token, markdown_only=True)
+        except self.ClientError as e:
+            print(f"Recipe page listing failed: {e}")
+            return [], None
+        
+
+    # In class S3Storage:
+
+    def list_all_recipes_admin(self):
+        """
+        Admin-only function to list all recipes from all users.
+        """
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            pages = paginator.paginate(
+                Bucket=self.bucket_name,
+                Prefix="recipes/"
+            )
+            
+            objects = []
+            # This dict will store counts like {'user_id_1': 10, 'user_id_2': 5}
+            user_recipe_counts = {} 
+
+            for page in pages:
+                for obj in page.get('Contents', []):
+                    if not self._is_recipe_key(obj['Key']):
+                        continue
+                    user_id = obj['Key'].split('/')[1]
+                    user_recipe_counts[user_id] = user_recipe_counts.get(user_id, 0) + 1
+                    objects.append(obj)
+
+            # Return both the list and the counts dictionary
+            return self._build_recipe_list(objects), user_recipe_counts
+
+        except self.ClientError as e:
+            print(f"Admin recipe list failed: {e}")
+            return [], {}
+
+    def list_all_recipes_admin_page(self, limit=RECIPE_PAGE_SIZE, continuation_token=None):
+        """
+        Admin-only: one page of recipes across all users.
+        Returns (recipes, next_continuation_token).
+        """
+        try:
+            return self._list_page("recipes/", limit, continuation_token)
+        except self.ClientError as e:
+            print(f"Admin recipe page listing failed: {e}")
+            return [], None
+
+    def count_recipes(self):
+        """Counts recipe keys per user from the listing alone (one request per 1000 keys, no HEADs)."""
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            counts = {}
+            with external_timer('s3', 'count_recipes'):
+                pages = list(paginator.paginate(Bucket=self.bucket_name, Prefix="recipes/"))
+            for page in pages:
+                for obj in page.get('Contents', []):
+                    if self._is_recipe_key(obj['Key']):
+                        user_id = obj['Key'].split('/')[1]
+                        counts[user_id] = counts.get(user_id, 0) + 1
+            return counts
+        except self.ClientError as e:
+            print(f"Recipe count listing failed: {e}")
+            return None
+
+    def delete_recipe(self, filename, user_id):
+        try:
+            with external_timer('s3', 'delete_object'):
+                self.s3_client.delete_object(
+                    Bucket=self.bucket_name,
+                    Key=f"recipes/{user_id}/{filename}"  # <--- Uses user_id
+                )
+            return True
+        except self.ClientError:
+            return False
+
+
+class LocalStorage(RecipeStorage):
+    """
+    Stores recipes on the local filesystem under `root`:
+    "<root>/recipes/<user_id>/<filename>" plus a "<filename>.meta.json" sidecar.
+    Intended for development and for benchmarking the app without S3.
+    """
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(os.path.join(self.root, 'recipes'), exist_ok=True)
+
+    def _path(self, filename, user_id):
+        if not (self._is_safe_name(filename) and self._is_safe_name(user_id)):
+            return None
+        return os.path.join(self.root, 'recipes', str(user_id), filename)
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp_path = f"{path}.tmp.{threading.get_ident()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save_recipe(self, filename, content, recipe_name, user_id, source=None):
+        path = self._path(filename, user_id)
+        if not path:
+            return False
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            metadata = self._new_metadata(recipe_name, source)
+            self._write_atomic(path, content.encode('utf-8'))
+            self._write_atomic(f"{path}.meta.json", json.dumps(metadata).encode('utf-8'))
+            return True
+        except OSError as e:
+            print(f"Local save failed for {filename}: {e}")
+            return False
+
+    def get_recipe(self, filename, user_id):
+        path = self._path(filename, user_id)
+        if not path:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def fetch_recipe(self, filename, user_id, if_none_match=None):
+        # The ETag comes from stat(), so an unchanged file is validated without reading it
+        path = self._path(filename, user_id)
+        if not path:
+            return None, None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, None
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if if_none_match and if_none_match == etag:
+            return NOT_MODIFIED, etag
+        content = self.get_recipe(filename, user_id)
+        return (content, etag) if content is not None else (None, None)
+
+    def delete_recipe(self, filename, user_id):
+        path = self._path(filename, user_id)
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            os.remove(path)
+            if os.path.exists(f"{path}.meta.json"):
+                os.remove(f"{path}.meta.json")
+            return True
+        except OSError as e:
+            print(f"Local delete failed for {filename}: {e}")
+            return False
+
+    def _records(self, user_id=None):
+        base = os.path.join(self.root, 'recipes')
+        if user_id is not None:
+            user_dirs = [str(user_id)] if self._is_safe_name(user_id) else []
+        else:
+            user_dirs = sorted(os.listdir(base)) if os.path.isdir(base) else []
+
+        records = []
+        for uid in user_dirs:
+            user_dir = os.path.join(base, uid)
+            if not os.path.isdir(user_dir):
+                continue
+            for filename in sorted(os.listdir(user_dir)):
+                if not (filename.startswith('recipe_') and filename.endswith('.md')):
+                    continue
+                path = os.path.join(user_dir, filename)
+                try:
+                    with open(f"{path}.meta.json", 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
+                except (OSError, ValueError):
+                    metadata = {}
+                records.append({
+                    'filename': filename,
+                    'name': metadata.get('recipe-name', 'Unknown Recipe'),
+                    'created': metadata.get('created') or datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+                    'source': metadata.get('source'),
+                    'user_id': uid
+                })
+        return records
+
+
+class MemoryStorage(RecipeStorage):
+    """
+    Process-local, non-persistent storage. Useful for load tests and local
+    experiments; everything is lost when the worker exits.
+    """
+    def __init__(self):
+        self._objects = {}  # {(user_id, filename): (content, metadata)}
+        self._lock = threading.Lock()
+
+    def save_recipe(self, filename, content, recipe_name, user_id, source=None):
+        with self._lock:
+            self._objects[(str(user_id), filename)] = (content, self._new_metadata(recipe_name, source))
+        return True
+
+    def get_recipe(self, filename, user_id):
+        with self._lock:
+            stored = self._objects.get((str(user_id), filename))
+        return stored[0] if stored else None
+
+    def delete_recipe(self, filename, user_id):
+        with self._lock:
+            return self._objects.pop((str(user_id), filename), None) is not None
+
+    def _records(self, user_id=None):
+        with self._lock:
+            items = sorted(self._objects.items())
+        return [
+            {
+                'filename': filename,
+                'name': metadata['recipe-name'],
+                'created': metadata['created'],
+                'source': metadata.get('source'),
+                'user_id': uid
+            }
+            for (uid, filename), (_, metadata) in items
+            if user_id is None or uid == str(user_id)
+        ]
+
+
+class CachedStorage:
+    """
+    Read-through LRU cache of recipe bodies in front of any storage backend,
+    keyed by (user_id, filename) and bounded by total body size.
+
+    Every read is revalidated with a conditional fetch on the cached ETag,
+    which only downloads the body if it changed, so the cache saves transfer
+    rather than requests. Writes and deletes made through this wrapper
+    invalidate the entry immediately, but only in this process: a
+    `revalidate_after` above 0 serves entries younger than that many seconds
+    without asking the backend, at the cost of other workers returning the
+    old body (and ETag) for that long after a change.
+    Everything else is delegated to the backend.
+    """
+    def __init__(self, backend, max_bytes, revalidate_after=0):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self._entries = OrderedDict()  # {(user_id, filename): (content, etag, size, validated_at)}
+        # Only for keys with a backend fetch in flight: invalidation bumps the
+        # generation so that fetch can't store a stale body
+        self._fills = {}  # {key: fetches in flight}
+        self._generations = {}  # {key: generation}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _store(self, key, content, etag, generation):
+        size = len(content.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(key, 0) != generation:
+                return
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._bytes -= previous[2]
+            self._entries[key] = (content, etag, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[2]
+                self.evictions += 1
+
+    def invalidate(self, filename, user_id):
+        key = (str(user_id), filename)
+        with self._lock:
+            if key in self._fills:
+                self._generations[key] += 1
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._bytes -= entry[2]
+
+    def _end_fill(self, key):
+        with self._lock:
+            self._fills[key] -= 1
+            if not self._fills[key]:
+                del self._fills[key]
+                del self._generations[key]
+
+    def fetch_recipe(self, filename, user_id, if_none_match=None):
+        key = (str(user_id), filename)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+            fresh_hit = entry is not None and time.monotonic() - entry[3] < self.revalidate_after
+            if fresh_hit:
+                self.hits += 1
+            else:
+                self._fills[key] = self._fills.get(key, 0) + 1
+                generation = self._generations.setdefault(key, 0)
+
+        if fresh_hit:
+            content, etag = entry[0], entry[1]
+        else:
+            try:
+                content, etag = self._fill(key, entry, generation, filename, user_id)
+            finally:
+                self._end_fill(key)
+            if content is None:
+                return None, None
+
+        if if_none_match and if_none_match == etag:
+            return NOT_MODIFIED, etag
+        return content, etag
+
+    def _fill(self, key, entry, generation, filename, user_id):
+        """Revalidates `entry` (or fetches the body if there is none) and caches the result."""
+        if entry:
+            fresh, fresh_etag = self.backend.fetch_recipe(filename, user_id, if_none_match=entry[1])
+            with self._lock:
+                self.revalidations += 1
+            if fresh is NOT_MODIFIED:
+                with self._lock:
+                    self.hits += 1
+                    if self._entries.get(key) is entry:
+                        self._entries[key] = entry[:3] + (time.monotonic(),)
+                content, etag = entry[0], entry[1]
+            else:
+                with self._lock:
+                    self.misses += 1
+                if fresh is None:
+                    self.invalidate(filename, user_id)
+                    return None, None
+                self._store(key, fresh, fresh_etag, generation)
+                content, etag = fresh, fresh_etag
+        else:
+            with self._lock:
+                self.misses += 1
+            content, etag = self.backend.fetch_recipe(filename, user_id)
+            if content is None:
+                return None, None
+            self._store(key, content, etag, generation)
+        return content, etag
+
+    def get_recipe(self, filename, user_id):
+        content, _ = self.fetch_recipe(filename, user_id)
+        return content
+
+    def save_recipe(self, filename, content, recipe_name, user_id, source=None):
+        self.invalidate(filename, user_id)
+        saved = self.backend.save_recipe(filename, content, recipe_name, user_id, source=source)
+        self.invalidate(filename, user_id)
+        return saved
+
+    def delete_recipe(self, filename, user_id):
+        self.invalidate(filename, user_id)
+        return self.backend.delete_recipe(filename, user_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+def create_storage(backend=None):
+    """
+    Builds the storage backend named by STORAGE_BACKEND: 's3' (default),
+    'local' (files under LOCAL_STORAGE_DIR) or 'memory'.
+    Raises ValueError for an unknown backend or an invalid S3 configuration.
+    """
+    backend = (backend or os.getenv('STORAGE_BACKEND', 's3')).strip().lower()
+    if backend == 's3':
+        return S3Storage()
+    if backend == 'local':
+        return LocalStorage(os.getenv('LOCAL_STORAGE_DIR', os.path.join('instance', 'storage')))
+    if backend == 'memory':
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected s3, local or memory)")
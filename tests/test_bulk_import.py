@@ -0,0 +1,97 @@
+import threading
+import time
+
+from bulk_import import BulkImporter, DomainThrottle
+
+
+class FakeScraper:
+    def __init__(self):
+        self.fetched = []
+        self.saved = []
+        self.reports = []
+        self._lock = threading.Lock()
+
+    def scrape_url(self, url):
+        with self._lock:
+            self.fetched.append(url)
+        if 'broken' in url:
+            return None
+        return {'url': url, 'content': f'Recipe at {url}'}
+
+    def build_recipe(self, scraped):
+        name = scraped['url'].rsplit('/', 1)[-1]
+        return {'status': 'built', 'url': scraped['url'], 'content': f'# {name}\n', 'recipe_name': name}
+
+    def save_built_recipe(self, built, user_id):
+        # The item is reported as 'saving' before the save starts
+        assert self.reports[-1]['items'][self.index(built['url'])]['status'] == 'saving'
+        self.saved.append(built['url'])
+        return {'status': 'saved', 'filename': f"recipe_{built['recipe_name']}.md",
+                'recipe_name': built['recipe_name']}
+
+    def record_scrape(self, *args, **kwargs):
+        pass
+
+    def index(self, url):
+        return [item['url'] for item in self.reports[0]['items']].index(url)
+
+
+def run(urls, previous=None):
+    scraper = FakeScraper()
+    importer = BulkImporter(scraper, fetch_workers=4, ai_workers=2, per_domain=2, domain_interval=0)
+    summary = importer.run(urls, 1, report=scraper.reports.append, previous=previous)
+    return scraper, summary
+
+
+def test_fresh_import():
+    urls = ['https://a.example/soup', 'https://b.example/broken', 'https://c.example/stew']
+    scraper, summary = run(urls)
+    assert sorted(scraper.saved) == ['https://a.example/soup', 'https://c.example/stew']
+    assert (summary['status'], summary['succeeded'], summary['failed']) == ('completed', 2, 1)
+    assert [item['url'] for item in summary['items']] == urls
+
+
+def test_retried_job_resumes_from_its_partial_summary():
+    urls = ['https://a.example/soup', 'https://b.example/stew', 'https://c.example/pie',
+            'https://d.example/cake']
+    previous = {'status': 'running', 'items': [
+        {'url': urls[0], 'status': 'succeeded', 'filename': 'recipe_soup.md', 'recipe_name': 'soup'},
+        {'url': urls[1], 'status': 'saving'},
+        {'url': urls[2], 'status': 'parsing'},
+        {'url': urls[3], 'status': 'fetching'},
+    ]}
+    scraper, summary = run(urls, previous)
+
+    # Already saved: not fetched or saved again. Mid-save: failed rather than duplicated.
+    assert sorted(scraper.fetched) == urls[2:]
+    assert sorted(scraper.saved) == urls[2:]
+    items = summary['items']
+    assert items[0] == previous['items'][0]
+    assert items[1]['status'] == 'failed'
+    assert [item['status'] for item in items[2:]] == ['succeeded', 'succeeded']
+    assert (summary['succeeded'], summary['failed']) == (3, 1)
+
+
+def test_domain_throttle_spaces_and_limits_requests():
+    throttle = DomainThrottle(max_concurrent=1, min_interval=0.05)
+    starts, active, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def request():
+        with throttle('https://www.example.com/recipe'):
+            with lock:
+                starts.append(time.monotonic())
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    starts.sort()
+    assert peak[0] == 1
+    assert all(later - earlier >= 0.045 for earlier, later in zip(starts, starts[1:]))
@@ -0,0 +1,97 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from flask import Flask  # noqa: E402
+from jobs import JobQueue  # noqa: E402
+from models import Job, db  # noqa: E402
+
+
+@pytest.fixture
+def queue(tmp_path):
+    app = Flask(__name__)
+    # A file, not :memory:, so worker threads get connections of their own
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'jobs.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield JobQueue(app, worker_count=0, stale_after=60, max_attempts=3)
+        db.session.remove()
+        db.drop_all()
+
+
+def make_stale(job_id, attempts):
+    Job.query.filter_by(id=job_id).update({
+        'status': 'running',
+        'attempts': attempts,
+        'updated_at': datetime.utcnow() - timedelta(minutes=5),
+        'result': '{"items": []}'
+    })
+    db.session.commit()
+
+
+def test_a_queued_job_is_claimed_once(queue):
+    job_id = queue.enqueue('scrape', None, {'url': 'https://example.com'}).id
+    assert queue._claim_next() == job_id
+    assert queue._claim_next() is None
+    job = queue.get(job_id)
+    assert (job.status, job.attempts) == ('running', 1)
+
+
+def test_concurrent_workers_claim_a_job_exactly_once(queue):
+    job_id = queue.enqueue('scrape', None, {}).id
+    start = threading.Barrier(8)
+    claims = []
+
+    def worker():
+        with queue.app.app_context():
+            start.wait()
+            claims.append(queue._claim_next())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert claims.count(job_id) == 1
+    assert claims.count(None) == 7
+
+
+def test_stale_running_job_is_reclaimed(queue):
+    job_id = queue.enqueue('import', None, {}).id
+    make_stale(job_id, attempts=1)
+    assert queue._claim_next() == job_id
+    assert queue.get(job_id).attempts == 2
+
+
+def test_stale_job_out_of_attempts_fails_and_keeps_its_result(queue):
+    job_id = queue.enqueue('import', None, {}).id
+    make_stale(job_id, attempts=3)
+    assert queue._claim_next() is None
+    db.session.expire_all()
+    job = queue.get(job_id)
+    assert job.status == 'failed'
+    assert job.result == '{"items": []}'
+
+
+def test_a_schedule_slot_is_enqueued_once(queue):
+    assert queue.enqueue('reconcile-counts', None, {}, schedule_slot='reconcile-counts:42') is not None
+    assert queue.enqueue('reconcile-counts', None, {}, schedule_slot='reconcile-counts:42') is None
+    assert Job.query.filter_by(kind='reconcile-counts').count() == 1
+
+
+def test_prune_deletes_only_old_finished_jobs(queue):
+    old = datetime.utcnow() - timedelta(days=30)
+    finished = queue.enqueue('scrape', None, {}).id
+    queue._finish(finished, 'succeeded', result={'status': 'saved'})
+    Job.query.filter_by(id=finished).update({'finished_at': old})
+    recent = queue.enqueue('scrape', None, {}).id
+    queue._finish(recent, 'failed', error='boom')
+    waiting = queue.enqueue('scrape', None, {}).id
+    db.session.commit()
+
+    assert queue.prune(timedelta(days=7)) == {'deleted': 1}
+    assert {job.id for job in Job.query.all()} == {recent, waiting}
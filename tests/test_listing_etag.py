@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip('flask')
+
+# The app reads its settings at import time: no AWS, no network, no background workers
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('GROQ_API_KEY', 'test')
+os.environ.setdefault('SCRAPE_WORKERS', '0')
+os.environ.setdefault('PROFILER_DIR', tempfile.mkdtemp(prefix='profiling-'))
+
+import recipe_scraper_s3 as app_module  # noqa: E402
+from models import User, db  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    app = app_module.load_app()
+    with app.app_context():
+        db.create_all()
+        app_module.RecipeSearchIndex(db).ensure_schema()
+        user = User(username='cook', password='x', role='user')
+        db.session.add(user)
+        db.session.commit()
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+        yield client, user.id
+        db.session.remove()
+        db.drop_all()
+
+
+def test_listing_etag_changes_when_a_recipe_is_edited(client):
+    client, user_id = client
+    app_module.catalog.save_recipe('recipe_a.md', '# Soup\n\n- 1 cup water\n', 'Soup', user_id)
+
+    first = client.get('/api/recipes')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert client.get('/api/recipes', headers={'If-None-Match': etag}).status_code == 304
+
+    # Same title, new body: the page must not be served as unchanged
+    app_module.catalog.save_recipe('recipe_a.md', '# Soup\n\n- 2 cups water\n', 'Soup', user_id)
+
+    second = client.get('/api/recipes', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
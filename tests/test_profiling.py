@@ -0,0 +1,82 @@
+import cProfile
+import json
+import os
+import time
+
+import pytest
+
+pytest.importorskip('flask')
+
+from flask import Flask  # noqa: E402
+from profiling import RequestProfiler  # noqa: E402
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    app = Flask(__name__)
+
+    @app.route('/recipes')
+    def recipes():
+        return 'ok'
+
+    return RequestProfiler(app, str(tmp_path))
+
+
+def test_wsgi_app_is_only_wrapped_while_a_session_is_active(profiler):
+    original = profiler.app.wsgi_app
+    profiler.start(routes=['recipes'])
+    assert profiler.app.wsgi_app != original
+    assert profiler.app.test_client().get('/recipes').status_code == 200
+    assert profiler.status()['routes']['recipes']['requests'] == 1
+
+    profiler.stop()
+    assert profiler.app.wsgi_app == original
+
+
+def test_an_expired_session_unwraps_on_the_next_poll(profiler):
+    original = profiler.app.wsgi_app
+    profiler.start(duration=0.05)
+    assert profiler.app.wsgi_app != original
+    time.sleep(0.1)
+    profiler._poll()
+    assert profiler.app.wsgi_app == original
+
+
+def test_threaded_workers_sample_cprofile_sessions(profiler, monkeypatch):
+    config = profiler.start(mode='cprofile')
+    assert profiler.mode(config) == 'cprofile'
+    profiler.threaded = True
+    monkeypatch.setattr('sys.version_info', (3, 12, 0))
+    assert profiler.mode(config) == 'sample'
+    profiler.stop()
+
+
+def write_worker(session_dir, pid, stacks, profiled):
+    """One worker's flushed files: a summary and, for `profiled`, a pstats dump."""
+    profiles = {}
+    if profiled:
+        profile = cProfile.Profile()
+        profile.enable()
+        sum(range(1000))
+        profile.disable()
+        profile.dump_stats(os.path.join(session_dir, f'{pid}-0.prof'))
+        profiles = {'recipes': 0}
+    summary = {'routes': {'recipes': {'requests': 1, 'seconds': 0.01}}, 'profiles': profiles,
+               'stacks': {'recipes': stacks}}
+    with open(os.path.join(session_dir, f'{pid}.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+
+
+def test_results_are_merged_across_workers(profiler):
+    session = profiler.start()['session']
+    profiler.stop()
+    session_dir = os.path.join(profiler.directory, session)
+    write_worker(session_dir, 101, {'app.py:view:1;db.py:query:5': 3}, profiled=True)
+    write_worker(session_dir, 102, {'app.py:view:1;db.py:query:5': 2, 'app.py:view:1': 1}, profiled=True)
+
+    assert profiler.status()['routes']['recipes']['requests'] == 2
+    assert profiler.export_collapsed() == ('recipes;app.py:view:1 1\n'
+                                           'recipes;app.py:view:1;db.py:query:5 5\n')
+    merged = profiler.export_pstats('recipes')
+    assert merged is not None and len(merged) > 0
+    assert profiler.export_pstats('missing') is None
@@ -0,0 +1,30 @@
+from storage import CachedStorage, MemoryStorage, NOT_MODIFIED
+
+
+def make_cache():
+    backend = MemoryStorage()
+    return backend, CachedStorage(backend, max_bytes=1024 * 1024)
+
+
+def test_change_made_by_another_worker_is_seen_on_the_next_read():
+    backend, cache = make_cache()
+    cache.save_recipe('recipe_a.md', '# Soup\n', 'Soup', 1)
+    _, etag = cache.fetch_recipe('recipe_a.md', 1)
+
+    # Written straight to the backend, as another process would
+    backend.save_recipe('recipe_a.md', '# Stew\n', 'Stew', 1)
+
+    content, new_etag = cache.fetch_recipe('recipe_a.md', 1, if_none_match=etag)
+    assert content == '# Stew\n'
+    assert new_etag != etag
+    assert cache.fetch_recipe('recipe_a.md', 1, if_none_match=new_etag) == (NOT_MODIFIED, new_etag)
+
+
+def test_invalidation_bookkeeping_does_not_grow():
+    _, cache = make_cache()
+    for i in range(50):
+        cache.save_recipe(f'recipe_{i}.md', f'# Recipe {i}\n', f'Recipe {i}', 1)
+        cache.fetch_recipe(f'recipe_{i}.md', 1)
+        cache.delete_recipe(f'recipe_{i}.md', 1)
+    assert cache._fills == {}
+    assert cache._generations == {}
@@ -0,0 +1,43 @@
+import pytest
+from units import INGREDIENT_RE, canonical_unit, ingredient_to_metric
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('2 cups plain flour', '250g plain flour'),
+    ('1 cup brown sugar, packed', '220g brown sugar, packed'),
+    ('1/2 cup unsalted butter, softened', '115g unsalted butter, softened'),
+    ('1 cup peanut butter', '260g peanut butter'),
+    ('1 cup walnuts', '120g walnuts'),
+    ('1 cup chopped walnuts (toasted)', '120g chopped walnuts (toasted)'),
+    ('1 cup buttermilk', '240ml buttermilk'),
+    ('2 cups rice vinegar', '480ml rice vinegar'),
+    ('1 cup milk', '240ml milk'),
+    ('1 cup sugar snap peas', '240ml sugar snap peas'),
+    ('1 cup (240ml) milk', '240ml milk'),
+    ('1 lb ground beef (450g)', '1 lb ground beef (450g)'),
+    ('1 lb chicken', '455g chicken'),
+    ('3 eggs', '3 eggs'),
+    ('1 cup (2 sticks) butter', '225g (2 sticks) butter'),
+    ('2 Cups flour', '250g flour'),
+    ('8 OZ cream cheese', '225g cream cheese'),
+    ('1 Cup milk', '240ml milk'),
+    ('2-3 lb chuck roast', '0.9-1.4kg chuck roast'),
+    ('4-5 cups chicken stock', '1-1.2 litres chicken stock'),
+    ('1 cup cooked rice', '160g cooked rice'),
+    ('2 cups cooked white rice', '320g cooked white rice'),
+    ('1 cup rice, cooked', '160g rice, cooked'),
+    ('1 cup rice', '185g rice'),
+])
+def test_ingredient_to_metric(line, expected):
+    assert ingredient_to_metric(line) == expected
+
+
+@pytest.mark.parametrize('line, unit', [
+    ('1 Tbsp oil', 'tbsp'),
+    ('1 T sugar', 'tbsp'),
+    ('1 t salt', 'tsp'),
+    ('2 Cups flour', 'cup'),
+    ('2 Large eggs', None),
+])
+def test_units_match_in_any_case(line, unit):
+    assert canonical_unit(INGREDIENT_RE.match(line).group('unit')) == unit
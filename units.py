@@ -0,0 +1,208 @@
+import re
+
+# Quantities and units shared by the JSON-LD fast path and the ingredient index.
+
+UNICODE_FRACTIONS = {
+    '½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4',
+    '⅕': '1/5', '⅖': '2/5', '⅗': '3/5', '⅘': '4/5', '⅙': '1/6',
+    '⅚': '5/6', '⅛': '1/8', '⅜': '3/8', '⅝': '5/8', '⅞': '7/8'
+}
+_UNICODE_FRACTION_RE = re.compile('(\\d)?\\s*([' + ''.join(UNICODE_FRACTIONS) + '])')
+
+QUANTITY_PATTERN = r'(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?)'
+_RANGE_PATTERN = rf'{QUANTITY_PATTERN}(?:\s*(?:-|–|to)\s*{QUANTITY_PATTERN})?'
+
+# Canonical unit -> spellings. Metric spoon measures (tbsp = 15ml, tsp = 5ml)
+# are kept as they are; they are standard in metric recipes.
+UNIT_ALIASES = {
+    'g': ('g', 'gram', 'grams', 'gr'),
+    'kg': ('kg', 'kilo', 'kilos', 'kilogram', 'kilograms'),
+    'ml': ('ml', 'millilitre', 'millilitres', 'milliliter', 'milliliters'),
+    'l': ('l', 'L', 'litre', 'litres', 'liter', 'liters'),
+    'tbsp': ('tbsp', 'tbs', 'tbl', 'tablespoon', 'tablespoons', 'T'),
+    'tsp': ('tsp', 'teaspoon', 'teaspoons', 't'),
+    'fl oz': ('fl oz', 'fl. oz', 'fluid ounce', 'fluid ounces'),
+    'cup': ('cup', 'cups', 'c'),
+    'pint': ('pint', 'pints', 'pt'),
+    'quart': ('quart', 'quarts', 'qt'),
+    'gallon': ('gallon', 'gallons', 'gal'),
+    'oz': ('oz', 'ounce', 'ounces'),
+    'lb': ('lb', 'lbs', 'pound', 'pounds'),
+    'stick': ('stick', 'sticks'),
+    'inch': ('inch', 'inches', 'in'),
+    'clove': ('clove', 'cloves'),
+    'pinch': ('pinch', 'pinches'),
+    'can': ('can', 'cans', 'tin', 'tins'),
+    'bunch': ('bunch', 'bunches'),
+}
+_ALIAS_TO_UNIT = {alias.lower(): unit for unit, aliases in UNIT_ALIASES.items() for alias in aliases if alias not in ('T', 't')}
+_UNIT_PATTERN = '|'.join(sorted((re.escape(a) for aliases in UNIT_ALIASES.values() for a in aliases), key=len, reverse=True))
+
+# Units match in any case ('2 Cups', '1 Tbsp'); canonical_unit still tells 'T' from 't'
+INGREDIENT_RE = re.compile(
+    rf'^\s*(?P<qty>{_RANGE_PATTERN})\s*(?:(?P<unit>{_UNIT_PATTERN})\.?(?=[\s(]|$))?\s*(?P<rest>.*)$',
+    re.IGNORECASE
+)
+_PAREN_METRIC_RE = re.compile(r'\(\s*(?P<qty>\d+(?:[.,]\d+)?)\s*(?P<unit>g|grams|kg|ml|l|litres?|liters?)\s*\)\s*', re.IGNORECASE)
+_CELSIUS = r'(\d{2,3}\s*°?\s*C)\b'
+_F_VALUE = r'\d{2,3}\s*°?\s*F\b'
+_DUAL_TEMPERATURE_RES = (
+    # "180°C / 350°F" and "180C (350F)" -> keep the Celsius value
+    re.compile(_CELSIUS + r'\s*/\s*' + _F_VALUE, re.IGNORECASE),
+    re.compile(_CELSIUS + r'\s*\(\s*' + _F_VALUE + r'\s*\)', re.IGNORECASE),
+    # "350°F / 180°C" and "350F (180C)" -> keep the Celsius value
+    re.compile(_F_VALUE + r'\s*/\s*' + _CELSIUS, re.IGNORECASE),
+    re.compile(_F_VALUE + r'\s*\(\s*' + _CELSIUS + r'\s*\)', re.IGNORECASE),
+)
+_FAHRENHEIT_RE = re.compile(r'(\d{2,3})\s*(?:°\s*F\b|º\s*F\b|degrees?\s*F(?:ahrenheit)?\b|F\b(?=\s*(?:oven|/|\)|,|\.)))', re.IGNORECASE)
+
+# Millilitres per unit of volume; grams per unit of weight.
+_ML_PER_UNIT = {'cup': 240, 'fl oz': 30, 'pint': 473, 'quart': 946, 'gallon': 3785}
+_G_PER_UNIT = {'oz': 28.35, 'lb': 453.6, 'stick': 113}
+
+# What one US cup of an ingredient weighs, or 240ml for liquids. Looked up by
+# the end of the ingredient name (its head noun) as whole words, longest
+# first: 'peanut butter' is not butter and 'rice vinegar' is not rice.
+_PER_CUP = {
+    'brown sugar': (220, 'g'), 'icing sugar': (120, 'g'), "confectioners' sugar": (120, 'g'),
+    'confectioners sugar': (120, 'g'), 'powdered sugar': (120, 'g'), 'sugar': (200, 'g'),
+    'flour': (125, 'g'), 'cocoa': (85, 'g'), 'cocoa powder': (85, 'g'), 'butter': (227, 'g'),
+    'peanut butter': (260, 'g'), 'oats': (90, 'g'), 'rice': (185, 'g'), 'cooked rice': (160, 'g'),
+    'breadcrumbs': (110, 'g'),
+    'cheese': (100, 'g'), 'chocolate chips': (170, 'g'), 'nuts': (140, 'g'), 'almonds': (140, 'g'),
+    'walnuts': (120, 'g'), 'honey': (340, 'g'),
+    'milk': (240, 'ml'), 'buttermilk': (240, 'ml'), 'cream': (240, 'ml'), 'water': (240, 'ml'),
+    'vinegar': (240, 'ml'), 'stock': (240, 'ml'), 'broth': (240, 'ml'), 'oil': (240, 'ml'),
+    'juice': (240, 'ml'), 'wine': (240, 'ml')
+}
+_PER_CUP_RE = re.compile(
+    r'(?:^|\s)(' + '|'.join(sorted((re.escape(name) for name in _PER_CUP), key=len, reverse=True)) + r')$'
+)
+# A note before the name: '1 cup (2 sticks) butter'
+_LEADING_NOTE_RE = re.compile(r'^\([^)]*\)\s*')
+# Preparation notes after the name: ', softened', ' (packed)', ' for dusting'
+_NAME_NOTES_RE = re.compile(r'\s*(?:[,(]| for | to | or ).*$')
+_COOKED_RE = re.compile(r'\bcooked\b')
+
+
+def normalise_fractions(text):
+    """'1½' -> '1 1/2', '¾' -> '3/4'."""
+    return _UNICODE_FRACTION_RE.sub(
+        lambda m: (m.group(1) + ' ' if m.group(1) else '') + UNICODE_FRACTIONS[m.group(2)], text
+    )
+
+
+def parse_quantity(text):
+    """Parses '2', '1.5', '1,5', '3/4' or '1 1/2' to a float; None if unparseable."""
+    text = text.strip().replace(',', '.')
+    try:
+        if ' ' in text:
+            whole, fraction = text.split(None, 1)
+            return float(whole) + parse_quantity(fraction)
+        if '/' in text:
+            numerator, denominator = text.split('/', 1)
+            return float(numerator) / float(denominator)
+        return float(text)
+    except (ValueError, TypeError, ZeroDivisionError):
+        return None
+
+
+def parse_quantity_range(text):
+    """'2-3' -> (2.0, 3.0); '2' -> (2.0, 2.0)."""
+    parts = re.split(r'\s*(?:-|–|to)\s*', text.strip(), maxsplit=1)
+    low = parse_quantity(parts[0])
+    high = parse_quantity(parts[1]) if len(parts) > 1 else low
+    return low, high
+
+
+def canonical_unit(unit):
+    if not unit:
+        return None
+    if unit in ('T', 't'):
+        return 'tbsp' if unit == 'T' else 'tsp'
+    return _ALIAS_TO_UNIT.get(unit.lower().rstrip('.'))
+
+
+def format_amount(value):
+    """Rounds a converted metric amount the way a recipe would print it."""
+    if value >= 100:
+        return str(int(round(value / 5.0) * 5))
+    if value >= 10:
+        return str(int(round(value)))
+    return f"{value:.1f}".rstrip('0').rstrip('.')
+
+
+def _per_cup(rest):
+    """(amount, 'g' or 'ml') that one cup of the ingredient named by `rest` converts to."""
+    name = _LEADING_NOTE_RE.sub('', rest.lower())
+    known = _PER_CUP_RE.search(_NAME_NOTES_RE.sub('', name))
+    if not known:
+        return 240, 'ml'
+    key = known.group(1)
+    # '1 cup cooked white rice' and '1 cup rice, cooked' weigh less than dry rice
+    if _COOKED_RE.search(name) and f'cooked {key}' in _PER_CUP:
+        key = f'cooked {key}'
+    return _PER_CUP[key]
+
+
+def _format_metric(low, high, unit):
+    # The larger unit is chosen from the high end so both ends of a range share it
+    if unit == 'ml' and high >= 1000:
+        low, high, unit = low / 1000, high / 1000, ' litres'
+    elif unit == 'g' and high >= 1000:
+        low, high, unit = low / 1000, high / 1000, 'kg'
+    if low == high:
+        return f"{format_amount(low)}{unit}"
+    return f"{format_amount(low)}-{format_amount(high)}{unit}"
+
+
+def ingredient_to_metric(line):
+    """
+    Converts the leading US/imperial measure of an ingredient line to metric:
+    '2 cups plain flour' -> '250g plain flour', '1 lb chicken' -> '455g chicken',
+    '1 cup (240ml) milk' -> '240ml milk'. Lines without a convertible measure
+    are returned unchanged (apart from fraction normalisation).
+    """
+    line = normalise_fractions(line.strip())
+    match = INGREDIENT_RE.match(line)
+    if not match or not match.group('unit'):
+        return line
+    unit = canonical_unit(match.group('unit'))
+    rest = match.group('rest')
+
+    # Many sites already give the metric amount in brackets; prefer it
+    paren = _PAREN_METRIC_RE.match(rest)
+    if paren and unit in ('cup', 'oz', 'lb', 'fl oz', 'stick', 'pint', 'quart'):
+        metric_unit = paren.group('unit').lower()
+        metric_unit = {'grams': 'g', 'litre': 'l', 'litres': 'l', 'liter': 'l', 'liters': 'l'}.get(metric_unit, metric_unit)
+        return f"{paren.group('qty')}{metric_unit} {rest[paren.end():]}".strip()
+    if _PAREN_METRIC_RE.search(rest):
+        # '1 lb ground beef (450g)': the metric amount is already there
+        return line
+
+    low, high = parse_quantity_range(match.group('qty'))
+    if low is None:
+        return line
+
+    if unit == 'cup':
+        per_cup, metric_unit = _per_cup(rest)
+        return f"{_format_metric(low * per_cup, high * per_cup, metric_unit)} {rest}".strip()
+    if unit in _ML_PER_UNIT:
+        factor = _ML_PER_UNIT[unit]
+        return f"{_format_metric(low * factor, high * factor, 'ml')} {rest}".strip()
+    if unit in _G_PER_UNIT:
+        factor = _G_PER_UNIT[unit]
+        return f"{_format_metric(low * factor, high * factor, 'g')} {rest}".strip()
+    if unit == 'inch':
+        return f"{_format_metric(low * 2.5, high * 2.5, 'cm')} {rest}".strip()
+    return line
+
+
+def fahrenheit_to_celsius(text):
+    """Rewrites oven temperatures such as '375°F' or '350 degrees F' to Celsius (nearest 5)."""
+    def convert(match):
+        celsius = (int(match.group(1)) - 32) * 5 / 9
+        return f"{int(round(celsius / 5.0) * 5)}°C"
+    for dual in _DUAL_TEMPERATURE_RES:
+        text = dual.sub(lambda m: m.group(1), text)
+    return _FAHRENHEIT_RE.sub(convert, text)
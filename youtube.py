@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from recipe_text import parse_json3, parse_vtt
+from metrics import external_timer
+
+YOUTUBE_ID_RE = re.compile(r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|embed/|shorts/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})')
+SUBTITLE_LANGUAGES = ('en', 'en-US', 'en-GB', 'a.en')
+# Compact, non-rolling json3 first; VTT when a track has no json3 variant
+SUBTITLE_FORMATS = ('json3', 'vtt')
+
+
+class YouTubeTranscriber:
+    """
+    Fetches YouTube video transcripts with as few round trips as possible.
+
+    One yt-dlp extractor is kept per thread (YoutubeDL instances are not
+    thread-safe) and info extraction skips format processing, which the
+    transcript does not need. Caption tracks are downloaded through the
+    scraper's pooled requests session with a timeout: the preferred track
+    first, and the other candidates in parallel only if it fails. Results
+    are cached per video id for `ttl_seconds` (`fallback_ttl_seconds` when
+    the video had no captions and only its description was returned), so
+    repeated or shared links (youtu.be, watch?v=, shorts) do not contact
+    YouTube again; concurrent requests for one video share a single fetch.
+    """
+    def __init__(self, session, cookie_file='youtube_cookies.txt', ttl_seconds=6 * 3600,
+                 max_entries=256, timeout=10, parallel_tracks=3, fallback_ttl_seconds=300):
+        self.session = session
+        self.cookie_file = cookie_file
+        self.ttl_seconds = ttl_seconds
+        self.fallback_ttl_seconds = min(fallback_ttl_seconds, ttl_seconds)
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.parallel_tracks = parallel_tracks
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._video_locks = {}  # {video_id: [lock, threads using it]}
+        self._pool = ThreadPoolExecutor(max_workers=parallel_tracks, thread_name_prefix='subtitles')
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def video_id(url):
+        match = YOUTUBE_ID_RE.search(url)
+        return match.group(1) if match else None
+
+    def _extractor(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            # yt-dlp takes longer to import than the rest of the app; only load it for the first video
+            import yt_dlp
+            ydl_opts = {
+                'skip_download': True,
+                'quiet': True,
+                'no_warnings': True,
+            }
+            if os.path.exists(self.cookie_file):
+                ydl_opts['cookiefile'] = self.cookie_file
+            else:
+                print(f"Warning: Cookie file not found at {self.cookie_file}. Authentication may fail.")
+            ydl = self._local.ydl = yt_dlp.YoutubeDL(ydl_opts)
+        return ydl
+
+    def _cached(self, video_id):
+        with self._lock:
+            entry = self._cache.get(video_id)
+            if entry and entry[0] > time.monotonic():
+                self._cache.move_to_end(video_id)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._cache[video_id]
+            return None
+
+    def _store(self, video_id, result, ttl_seconds):
+        with self._lock:
+            self._cache[video_id] = (time.monotonic() + ttl_seconds, result)
+            self._cache.move_to_end(video_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def transcript(self, url):
+        """
+        Returns the scraped-data dict for a video ({"url", "title", "duration",
+        "content", "type": "youtube_video", "scraped_at"}) or None on failure.
+        """
+        video_id = self.video_id(url)
+        if not video_id:
+            return self._extract(url)[0]
+
+        cached = self._cached(video_id)
+        if cached is None:
+            with self._lock:
+                entry = self._video_locks.setdefault(video_id, [threading.Lock(), 0])
+                entry[1] += 1
+            try:
+                with entry[0]:
+                    # Another thread may have fetched it while we waited
+                    cached = self._cached(video_id)
+                    if cached is None:
+                        with self._lock:
+                            self.misses += 1
+                        cached, captioned = self._extract(f"https://www.youtube.com/watch?v={video_id}")
+                        if cached is None:
+                            return None
+                        self._store(video_id, cached,
+                                    self.ttl_seconds if captioned else self.fallback_ttl_seconds)
+            finally:
+                with self._lock:
+                    # The last thread out drops the lock, whether or not the fetch worked
+                    entry[1] -= 1
+                    if not entry[1]:
+                        del self._video_locks[video_id]
+        return dict(cached, url=url)
+
+    def _caption_candidates(self, info):
+        """Caption track URLs in preference order: manual before automatic, json3 before VTT."""
+        candidates = []
+        for tracks in (info.get('subtitles') or {}, info.get('automatic_captions') or {}):
+            for lang in SUBTITLE_LANGUAGES:
+                by_format = {track.get('ext'): track.get('url') for track in tracks.get(lang, ())}
+                for ext in SUBTITLE_FORMATS:
+                    if by_format.get(ext):
+                        candidates.append((ext, by_format[ext]))
+                        break
+        return candidates
+
+    def _download_caption(self, ext, caption_url):
+        with external_timer('youtube', 'subtitles'):
+            response = self.session.get(caption_url, timeout=self.timeout)
+            response.raise_for_status()
+        if ext == 'json3':
+            return parse_json3(response.json())
+        return parse_vtt(response.text)
+
+    def _fetch_transcript(self, info):
+        candidates = self._caption_candidates(info)[:self.parallel_tracks]
+        if not candidates:
+            return ""
+        # The preferred track almost always works; only fetch the fallbacks if it doesn't
+        try:
+            text = self._download_caption(*candidates[0])
+        except Exception as e:
+            print(f"Subtitle download failed: {e}")
+            text = ""
+        if text:
+            return text
+        futures = [self._pool.submit(self._download_caption, ext, caption_url) for ext, caption_url in candidates[1:]]
+        # Take the most preferred fallback that downloaded
+        for future in futures:
+            try:
+                text = future.result()
+            except Exception as e:
+                print(f"Subtitle download failed: {e}")
+                continue
+            if text:
+                return text
+        return ""
+
+    def _extract(self, url):
+        """(scraped-data dict or None, whether the content came from captions)."""
+        try:
+            with external_timer('youtube', 'extract_info'):
+                info = self._extractor().extract_info(url, download=False, process=False)
+            captions = self._fetch_transcript(info)
+            transcript_text = captions or info.get('description', '')
+            return {
+                "url": url,
+                "title": info.get('title', 'YouTube Recipe'),
+                "duration": info.get('duration', 0),
+                "content": transcript_text,
+                "type": "youtube_video",
+                "scraped_at": datetime.now().isoformat()
+            }, bool(captions)
+        except Exception as e:
+            print(f"YouTube extraction failed for {url}: {e}")
+            return None, False
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }